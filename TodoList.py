@@ -1,14 +1,32 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import calendar
+import queue
+import logging
+
+from doc_writer import BackgroundWriter
+from todo_model import TodoItem, TodoModel, PRIORITIES
+from todo_stats import TaskColumns, TaskStats, week_start
+from todo_store import TodoStore
+
+logger = logging.getLogger(__name__)
 
 
 class DateEntry(simpledialog.Dialog):
-    """日期选择对话框"""
-    def __init__(self, parent, title, initial_date=None):
+    """日期选择对话框
+
+    传入 due_index（todo_model.DueDateIndex）时，每天显示当天到期的未完成事项数，
+    按数量深浅着色，已逾期的日期用红色显示。
+    """
+    # 热度颜色，从少到多
+    HEAT_COLORS = ("#fff3e0", "#ffe0b2", "#ffb74d", "#fb8c00")
+    OVERDUE_COLOR = "#c00000"
+
+    def __init__(self, parent, title, initial_date=None, due_index=None):
         self.selected_date = initial_date or date.today()
         self.parent = parent
+        self.due_index = due_index
         super().__init__(parent, title)
     
     def body(self, master):
@@ -32,6 +50,9 @@ class DateEntry(simpledialog.Dialog):
         self.calendar_frame.pack()
         
         self.build_calendar()
+        
+        if self.due_index is not None:
+            ttk.Label(master, text="数字为当天到期的未完成事项数，红色表示已逾期").pack(pady=(5, 0))
         return self.calendar_frame
     
     def build_calendar(self):
@@ -47,20 +68,37 @@ class DateEntry(simpledialog.Dialog):
         # 获取当月第一天和最后一天
         cal = calendar.monthcalendar(self.year.get(), self.month.get())
         
+        # 只查询当月每一天的到期数
+        counts = {}
+        if self.due_index is not None:
+            for week in cal:
+                for day in week:
+                    if day != 0:
+                        counts[day] = self.due_index.count(date(self.year.get(), self.month.get(), day))
+        max_count = max(counts.values(), default=0)
+        today = date.today()
+        
         # 显示日期
         for r, week in enumerate(cal, start=1):
             for c, day in enumerate(week):
                 if day != 0:
+                    count = counts.get(day, 0)
                     btn = tk.Button(
                         self.calendar_frame, 
-                        text=day, 
+                        text=f"{day}\n{count}" if count else (f"{day}\n" if counts else day),
                         width=3, 
                         command=lambda d=day: self.select_date(d)
                     )
                     btn.grid(row=r, column=c, padx=1, pady=1)
                     
+                    # 按到期事项数着色，已逾期的日期用红色文字
+                    if count:
+                        level = min(len(self.HEAT_COLORS) - 1, (count * len(self.HEAT_COLORS) - 1) // max_count)
+                        btn.config(bg=self.HEAT_COLORS[level])
+                        if date(self.year.get(), self.month.get(), day) < today:
+                            btn.config(fg=self.OVERDUE_COLOR, activeforeground=self.OVERDUE_COLOR)
+                    
                     # 高亮今天
-                    today = date.today()
                     if (today.year == self.year.get() and 
                         today.month == self.month.get() and 
                         today.day == day):
@@ -98,8 +136,9 @@ class DateEntry(simpledialog.Dialog):
 
 class EditDialog(simpledialog.Dialog):
     """编辑待办事项对话框"""
-    def __init__(self, parent, title, todo_item):
+    def __init__(self, parent, title, todo_item, model):
         self.todo_item = todo_item
+        self.model = model
         self.result = None
         super().__init__(parent, title)
     
@@ -167,45 +206,98 @@ class EditDialog(simpledialog.Dialog):
                 messagebox.showerror("错误", "计划完成日期格式不正确，请使用 YYYY-MM-DD 格式")
                 return
         
-        # 更新任务对象
-        self.todo_item.text = text
-        self.todo_item.priority = priority
+        # 通过模型更新任务对象，以便同步更新索引
+        changes = {'text': text, 'priority': priority}
         if start_date:
-            self.todo_item.start_date = start_date
+            changes['start_date'] = start_date
         if due_date:
-            self.todo_item.due_date = due_date
+            changes['due_date'] = due_date
+        self.model.update(self.todo_item, **changes)
         
         self.result = self.todo_item
 
 
-class TodoItem:
-    def __init__(self, text, start_date=None, due_date=None, completed_date=None, priority="普通"):
-        self.text = text
-        self.start_date = start_date or date.today()
-        self.due_date = due_date
-        self.completed_date = completed_date
-        self.priority = priority  # "普通", "重要", "紧急", "重要紧急"
-    
-    def mark_completed(self):
-        self.completed_date = date.today()
-    
-    def mark_uncompleted(self):
-        self.completed_date = None
-
-
 class TodoApp:
+    # “下一步”视图显示的事项数
+    NEXT_UP_COUNT = 20
+    # 统计窗口中显示最近多少周
+    ANALYTICS_WEEKS = 26
+    # 完成超过多少天的事项在启动时归档
+    ARCHIVE_AFTER_DAYS = 90
+
     def __init__(self, root):
         self.root = root
         self.root.title("待办事项清单")
         self.root.geometry("1200x500")
         
+        # 后台线程的回调通过队列交给主线程执行
+        self._ui_queue = queue.Queue()
+        self.root.after(50, self._process_ui_queue)
+        
         # 初始化数据
-        self.todo_items = []
-        self.completed_items = []
+        self.writer = None
+        try:
+            store = TodoStore()
+            self.model = TodoModel(store)
+            self.has_saved_data = self.model.load()
+        except (OSError, ValueError, KeyError) as e:
+            # 数据无法读取时不保存，避免覆盖原有数据
+            messagebox.showerror("错误", f"无法读取保存的待办事项，本次修改不会被保存：\n{e}")
+            self.model = TodoModel()
+            self.has_saved_data = False
+        else:
+            # 读取成功后才启动写入线程：按模型发布的快照在后台线程中保存，界面线程不需要等待写入
+            self.writer = BackgroundWriter(lambda *args: self.run_in_ui(self._on_saved, *args),
+                                           write=store.write_snapshot)
+            self.model.writer = self.writer
+        self.model.archive_completed(date.today() - timedelta(days=self.ARCHIVE_AFTER_DAYS))
+        self.visible_items = []  # 表格中按序号显示的事项
+        # 统计用的按列数据，随模型增量更新（包括已归档的事项）
+        self.task_columns = TaskColumns()
+        try:
+            self.model.add_index(self.task_columns)
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("错误", f"无法读取归档事项的统计数据，统计结果中可能缺少部分已归档的事项：\n{e}")
+        self.task_stats = TaskStats(self.task_columns)
+        self.analytics_window = None
+        self.loading_segment = False
         
         # 创建界面
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
+    def _process_ui_queue(self):
+        """在主线程中执行后台线程提交的回调
+
+        某个回调出错时记录日志后继续执行其余的回调，轮询不会因此停止。
+        """
+        try:
+            while True:
+                try:
+                    func, args = self._ui_queue.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    func(*args)
+                except Exception:
+                    logger.exception('后台任务的回调 %r 执行出错', func)
+        finally:
+            self.root.after(50, self._process_ui_queue)
+    
+    def run_in_ui(self, func, *args):
+        """供后台线程调用：请求在主线程中执行 func"""
+        self._ui_queue.put((func, args))
+    
+    def _on_saved(self, path, elapsed_ms, error):
+        if error is not None:
+            messagebox.showerror("错误", f"保存待办事项失败：\n{error}")
+    
+    def on_close(self):
+        """关闭窗口前等待后台保存完成"""
+        if self.writer is not None:
+            self.writer.flush()
+        self.root.destroy()
+    
     def create_widgets(self):
         # 主框架
         main_frame = ttk.Frame(self.root)
@@ -236,6 +328,23 @@ class TodoApp:
         )
         self.completed_btn.pack(fill=tk.X, pady=2)
         
+        # 下一步按钮
+        self.next_up_btn = ttk.Button(
+            left_frame, 
+            text="下一步", 
+            command=self.show_next_up,
+            style="Left.TButton"
+        )
+        self.next_up_btn.pack(fill=tk.X, pady=2)
+        
+        # 统计分析按钮
+        ttk.Button(
+            left_frame, 
+            text="统计分析", 
+            command=self.show_analytics,
+            style="Left.TButton"
+        ).pack(fill=tk.X, pady=(12, 2))
+        
         # 右侧面板框架
         right_frame = ttk.Frame(main_frame)
         right_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
@@ -292,7 +401,7 @@ class TodoApp:
         
         # 创建表格视图
         columns = ("序号", "任务", "优先级", "开始日期", "计划完成日期", "完成日期", "状态")
-        self.tree = ttk.Treeview(right_frame, columns=columns, show="headings", height=15)
+        self.tree = ttk.Treeview(right_frame, columns=columns, show="headings", height=15, selectmode="extended")
         
         # 定义表头
         self.tree.heading("序号", text="序号")
@@ -316,19 +425,34 @@ class TodoApp:
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         # 滚动条
-        scrollbar = ttk.Scrollbar(right_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscroll=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.scrollbar = ttk.Scrollbar(right_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscroll=self.on_tree_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         # 绑定双击事件
         self.tree.bind('<Double-Button-1>', self.on_item_double_click)
         self.tree.bind('<ButtonRelease-1>', self.on_item_click)
+        self.tree.bind('<Button-3>', self.show_context_menu)
+        self.tree.bind('<Delete>', lambda event: self.delete_item())
+        
+        # 右键菜单，作用于所有选中的事项
+        self.context_menu = tk.Menu(self.root, tearoff=0)
+        self.context_menu.add_command(label="完成", command=self.complete_selected)
+        self.context_menu.add_command(label="标记为未完成", command=self.uncomplete_selected)
+        priority_menu = tk.Menu(self.context_menu, tearoff=0)
+        for priority in PRIORITIES:
+            priority_menu.add_command(label=priority, command=lambda p=priority: self.set_selected_priority(p))
+        self.context_menu.add_cascade(label="设置优先级", menu=priority_menu)
+        self.context_menu.add_command(label="调整计划完成日期...", command=self.shift_selected_due_dates)
+        self.context_menu.add_separator()
+        self.context_menu.add_command(label="删除", command=self.delete_item, accelerator="Delete")
         
         # 设置当前视图状态
         self.current_view = "todo"
         
-        # 添加一些示例数据
-        self.add_sample_data()
+        # 第一次运行时添加一些示例数据
+        if not self.has_saved_data:
+            self.add_sample_data()
         
         # 显示待办事项
         self.show_todo()
@@ -338,10 +462,10 @@ class TodoApp:
         # 创建带日期和优先级的待办事项
         item1 = TodoItem("完成项目报告", priority="重要")
         item1.due_date = date.today().replace(day=date.today().day+7)
-        self.todo_items.append(item1)
+        self.model.add(item1)
         
         item2 = TodoItem("购买日用品", due_date=date.today().replace(day=date.today().day+2), priority="普通")
-        self.todo_items.append(item2)
+        self.model.add(item2)
         
         # 修复日期计算，避免月份为0的情况
         today = date.today()
@@ -355,7 +479,7 @@ class TodoApp:
         item3 = TodoItem("预约医生", start_date=prev_month_date, priority="紧急")
         item3.due_date = date.today().replace(day=date.today().day+1)
         item3.completed_date = date.today()
-        self.completed_items.append(item3)
+        self.model.add(item3)
     
     def add_item(self):
         """添加新的待办事项"""
@@ -391,7 +515,7 @@ class TodoApp:
         
         # 创建待办事项对象
         item = TodoItem(text, start_date, due_date, priority=priority)
-        self.todo_items.append(item)
+        self.model.add(item)
         
         # 清空输入框
         self.entry.delete(0, tk.END)
@@ -402,29 +526,78 @@ class TodoApp:
         
         self.refresh_list()
     
+    def selected_items(self):
+        """返回表格中选中的事项（不包括未加载的归档分段摘要行）"""
+        items = []
+        for item_id in self.tree.selection():
+            if not self.tree.tag_has("segment", item_id):
+                items.append(self.visible_items[int(self.tree.item(item_id, "values")[0]) - 1])
+        return items
+    
+    def show_context_menu(self, event):
+        """显示右键菜单，右键点击未选中的行时只选中该行"""
+        item_id = self.tree.identify_row(event.y)
+        if not item_id:
+            return
+        if item_id not in self.tree.selection():
+            self.tree.selection_set(item_id)
+        self.context_menu.tk_popup(event.x_root, event.y_root)
+    
     def delete_item(self):
-        """删除待办事项"""
-        selection = self.tree.selection()
-        if not selection:
+        """删除选中的事项（只确认一次）"""
+        items = self.selected_items()
+        if not items:
             messagebox.showwarning("警告", "请选择要删除的待办事项")
             return
         
-        item_id = selection[0]
-        item_values = self.tree.item(item_id, "values")
-        item_idx = int(item_values[0]) - 1
-        
         # 确认删除
-        task_text = item_values[1]  # 获取任务文本
-        confirm = messagebox.askquestion("确认删除", f"确定要删除任务 '{task_text}' 吗？\n此操作不可恢复！")
+        if len(items) == 1:
+            message = f"确定要删除任务 '{items[0].text}' 吗？\n此操作不可恢复！"
+        else:
+            message = f"确定要删除选中的 {len(items)} 项任务吗？\n此操作不可恢复！"
+        confirm = messagebox.askquestion("确认删除", message)
         if confirm != 'yes':
             return
         
-        if self.current_view == "todo":
-            self.todo_items.pop(item_idx)
-        else:
-            self.completed_items.pop(item_idx)
+        self.model.delete_many(items)
         self.refresh_list()
     
+    def complete_selected(self):
+        """把选中的事项标记为完成"""
+        items = self.selected_items()
+        if items:
+            self.model.complete_many(items)
+            self.refresh_list()
+    
+    def uncomplete_selected(self):
+        """把选中的事项移回待办事项"""
+        items = self.selected_items()
+        if items:
+            self.model.uncomplete_many(items)
+            self.refresh_list()
+    
+    def set_selected_priority(self, priority):
+        """修改选中事项的优先级"""
+        items = self.selected_items()
+        if items:
+            self.model.update_many(items, priority=priority)
+            self.refresh_list()
+    
+    def shift_selected_due_dates(self):
+        """把选中事项的计划完成日期推迟或提前若干天"""
+        items = self.selected_items()
+        if not items:
+            return
+        days = simpledialog.askinteger("调整计划完成日期",
+                                       f"将选中的 {len(items)} 项推迟多少天（负数表示提前）：",
+                                       parent=self.root)
+        if not days:
+            return
+        changed = self.model.shift_due_dates(items, days)
+        self.refresh_list()
+        if changed < len(items):
+            messagebox.showinfo("提示", f"有 {len(items) - changed} 项没有设置计划完成日期，未调整")
+    
     def show_todo(self):
         """显示待办事项"""
         self.current_view = "todo"
@@ -434,6 +607,7 @@ class TodoApp:
         # 更新按钮样式
         self.todo_btn.state(['pressed'])
         self.completed_btn.state(['!pressed'])
+        self.next_up_btn.state(['!pressed'])
     
     def show_completed(self):
         """显示已完成事项"""
@@ -444,17 +618,42 @@ class TodoApp:
         # 更新按钮样式
         self.todo_btn.state(['!pressed'])
         self.completed_btn.state(['pressed'])
+        self.next_up_btn.state(['!pressed'])
     
-    def refresh_list(self):
-        """刷新列表显示"""
+    def show_next_up(self):
+        """显示接下来要做的事项：按优先级、计划完成日期、开始日期排在最前面的若干项"""
+        self.current_view = "next"
+        self.title_label.config(text=f"下一步（前 {self.NEXT_UP_COUNT} 项）")
+        self.refresh_list()
+        
+        # 更新按钮样式
+        self.todo_btn.state(['!pressed'])
+        self.completed_btn.state(['!pressed'])
+        self.next_up_btn.state(['pressed'])
+    
+    def refresh_list(self, keep_position=False):
+        """刷新列表显示，keep_position 为真时保持滚动位置（最上面显示的仍是原来的那一行）"""
+        rows = self.tree.get_children()
+        first_row = round(self.tree.yview()[0] * len(rows))
         # 清空现有数据
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self.tree.delete(*rows)
         
         if self.current_view == "todo":
-            items = self.todo_items
+            items = self.model.todo_items
+        elif self.current_view == "next":
+            # 从索引堆中读取，不需要对所有事项排序
+            items = self.model.next_up.top(self.NEXT_UP_COUNT)
         else:
-            items = self.completed_items
+            items = self.model.completed_items
+            # 已加载的归档分段按完成日期排在后面，未加载的只显示一行摘要
+            segment_rows = []
+            for summary in self.model.archive_summaries():
+                if summary.key in self.model.segments:
+                    items = items + sorted(self.model.segments[summary.key],
+                                           key=lambda item: item.completed_date, reverse=True)
+                else:
+                    segment_rows.append(summary)
+        self.visible_items = items
             
         for i, item in enumerate(items):
             # 格式化日期显示
@@ -463,7 +662,10 @@ class TodoApp:
             completed_str = item.completed_date.strftime("%Y-%m-%d") if item.completed_date and self.current_view == "completed" else ""
             
             # 确定状态
-            status = "已完成" if item.completed_date else "待办"
+            if self.model.is_archived(item):
+                status = "已归档"
+            else:
+                status = "已完成" if item.completed_date else "待办"
             
             # 插入数据到表格
             self.tree.insert("", tk.END, values=(
@@ -475,6 +677,110 @@ class TodoApp:
                 completed_str,
                 status
             ), tags=(f"item_{i}",))
+        
+        if self.current_view == "completed":
+            for summary in segment_rows:
+                self.tree.insert("", tk.END, iid=f"segment:{summary.key}", values=(
+                    "",
+                    f"▶ {summary.key} 已归档 {summary.count} 项（双击或滚动到此处加载）",
+                    "",
+                    "",
+                    "",
+                    f"{summary.first:%m-%d} ~ {summary.last:%m-%d}",
+                    "已归档"
+                ), tags=("segment",))
+        
+        if keep_position:
+            # 按行号而不是按比例恢复：加载的分段插在可见的行之后，总行数变化时最上面一行不变
+            rows = self.tree.get_children()
+            if rows:
+                self.tree.yview_moveto(first_row / len(rows))
+        
+        # 统计窗口打开时同步更新（数据未变化时直接使用缓存）
+        if self.analytics_window is not None and self.analytics_window.winfo_exists():
+            self.update_analytics()
+    
+    def on_tree_scroll(self, first, last):
+        """同步滚动条；已完成列表滚动到底部时加载下一个未加载的归档分段"""
+        self.scrollbar.set(first, last)
+        if (self.current_view == "completed" and float(first) > 0 and float(last) >= 1.0
+                and not self.loading_segment):
+            self.loading_segment = True
+            self.root.after_idle(self.load_next_segment)
+    
+    def load_next_segment(self):
+        """加载最新的一个未加载的归档分段"""
+        self.loading_segment = False
+        for summary in self.model.archive_summaries():
+            if summary.key not in self.model.segments:
+                self.load_segment(summary.key)
+                return
+    
+    def load_segment(self, key):
+        try:
+            self.model.load_segment(key)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("错误", f"无法读取归档分段 {key}：\n{e}")
+            return
+        self.refresh_list(keep_position=True)
+    
+    def show_analytics(self):
+        """打开统计分析窗口"""
+        if self.analytics_window is not None and self.analytics_window.winfo_exists():
+            self.analytics_window.lift()
+            self.update_analytics()
+            return
+        
+        win = tk.Toplevel(self.root)
+        win.title("统计分析")
+        win.geometry("900x450")
+        
+        self.analytics_summary = ttk.Label(win, justify=tk.LEFT)
+        self.analytics_summary.pack(anchor=tk.W, padx=10, pady=10)
+        
+        columns = ("周", "开始", "完成", "完成率") + tuple(f"未完成·{p}" for p in reversed(PRIORITIES))
+        self.analytics_tree = ttk.Treeview(win, columns=columns, show="headings")
+        for column in columns:
+            self.analytics_tree.heading(column, text=column)
+            self.analytics_tree.column(column, width=100, anchor="center")
+        scrollbar = ttk.Scrollbar(win, orient=tk.VERTICAL, command=self.analytics_tree.yview)
+        self.analytics_tree.configure(yscroll=scrollbar.set)
+        self.analytics_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 0), pady=(0, 10))
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=(0, 10))
+        
+        self.analytics_window = win
+        self.update_analytics()
+    
+    def update_analytics(self):
+        """按统计结果更新统计窗口"""
+        report = self.task_stats.report()
+        
+        lines = []
+        if report.lead_count:
+            percentiles = "，".join(f"P{p} {v:.1f} 天" for p, v in report.lead_percentiles.items())
+            lines.append(f"完成耗时（完成日期 - 开始日期）：平均 {report.lead_mean:.1f} 天，{percentiles}（共 {report.lead_count} 项）")
+        else:
+            lines.append("完成耗时：暂无已完成事项")
+        with_due = report.on_time + report.late
+        if with_due:
+            lines.append(f"按期完成 {report.on_time} 项，逾期完成 {report.late} 项（按期率 {report.on_time / with_due:.0%}），"
+                         f"未设置计划完成日期 {report.no_due} 项")
+        self.analytics_summary.config(text="\n".join(lines))
+        
+        self.analytics_tree.delete(*self.analytics_tree.get_children())
+        weeks = report.weeks[-self.ANALYTICS_WEEKS:]
+        previous = report.weeks[-len(weeks) - 1].backlog if len(report.weeks) > len(weeks) else [0] * len(PRIORITIES)
+        rows = []
+        for week in weeks:
+            # 各优先级的未完成数及相对上周的变化，优先级高的在前
+            backlog = tuple(f"{count} ({count - before:+d})"
+                            for count, before in reversed(list(zip(week.backlog, previous))))
+            rate = f"{week.rate:.0%}" if week.rate is not None else "-"
+            rows.append((week_start(week.week).strftime("%Y-%m-%d"), week.started, week.completed, rate) + backlog)
+            previous = week.backlog
+        # 最近的一周显示在最上面
+        for row in reversed(rows):
+            self.analytics_tree.insert("", tk.END, values=row)
     
     def on_due_date_click(self, event):
         """处理计划完成日期输入框的点击事件"""
@@ -492,7 +798,7 @@ class TodoApp:
             current_date = date.today()
         
         # 打开日期选择器
-        dialog = DateEntry(self.root, "选择计划完成日期", current_date)
+        dialog = DateEntry(self.root, "选择计划完成日期", current_date, self.model.due_index)
         if dialog.result:
             # 将选择的日期填入输入框
             formatted_date = dialog.result.strftime("%Y-%m-%d")
@@ -504,36 +810,34 @@ class TodoApp:
         region = self.tree.identify("region", event.x, event.y)
         column = self.tree.identify_column(event.x)
         
-        # 获取当前选择项
+        # 获取当前选择项；多选（按住 Shift/Ctrl 点击）时不打开编辑对话框
         selection = self.tree.selection()
-        if not selection:
+        if len(selection) != 1 or event.state & 0x0005:
             return
         item_id = selection[0]
+        if self.tree.tag_has("segment", item_id):
+            return
         item_values = self.tree.item(item_id, "values")
         item_idx = int(item_values[0]) - 1
         
         # 检查是否点击了"计划完成日期"列（第5列，索引为5）
         if region == "cell" and column == "#5":
-            # 根据当前视图获取对应的项目
-            if self.current_view == "todo":
-                todo_item = self.todo_items[item_idx]
-            else:
-                todo_item = self.completed_items[item_idx]
+            todo_item = self.visible_items[item_idx]
             
             # 打开日期选择器
-            dialog = DateEntry(self.root, "选择计划完成日期", todo_item.due_date)
+            dialog = DateEntry(self.root, "选择计划完成日期", todo_item.due_date, self.model.due_index)
             if dialog.result:
-                todo_item.due_date = dialog.result
+                self.model.update(todo_item, due_date=dialog.result)
                 self.refresh_list()
         
         # 检查是否点击了"完成日期"列（第6列，索引为6）且在已完成列表中
         elif region == "cell" and column == "#6" and self.current_view == "completed":
-            completed_item = self.completed_items[item_idx]
+            completed_item = self.visible_items[item_idx]
             
             # 打开日期选择器
             dialog = DateEntry(self.root, "选择完成日期", completed_item.completed_date)
             if dialog.result:
-                completed_item.completed_date = dialog.result
+                self.model.update(completed_item, completed_date=dialog.result)
                 self.refresh_list()
         
         # 检查是否点击了"任务"列（第2列，索引为2），触发编辑
@@ -551,17 +855,15 @@ class TodoApp:
             return
             
         item_id = selection[0]
+        if self.tree.tag_has("segment", item_id):
+            return
         item_values = self.tree.item(item_id, "values")
         item_idx = int(item_values[0]) - 1
         
-        # 根据当前视图获取对应的项目
-        if self.current_view == "todo":
-            todo_item = self.todo_items[item_idx]
-        else:
-            todo_item = self.completed_items[item_idx]
+        todo_item = self.visible_items[item_idx]
         
         # 创建编辑对话框
-        dialog = EditDialog(self.root, "编辑待办事项", todo_item)
+        dialog = EditDialog(self.root, "编辑待办事项", todo_item, self.model)
         if dialog.result:
             # 更新数据并刷新列表
             self.refresh_list()
@@ -577,20 +879,20 @@ class TodoApp:
             return
             
         item_id = selection[0]
+        if self.tree.tag_has("segment", item_id):
+            # 双击归档分段的摘要行时加载该分段
+            self.load_segment(item_id.split(":", 1)[1])
+            return
         item_values = self.tree.item(item_id, "values")
         item_idx = int(item_values[0]) - 1
         
-        if self.current_view == "todo":
-            # 从待办事项移到已完成事项
-            item = self.todo_items.pop(item_idx)
-            item.mark_completed()  # 设置完成日期
-            self.completed_items.append(item)
+        if self.current_view in ("todo", "next"):
+            # 从待办事项移到已完成事项，并设置完成日期；“下一步”视图会补上后面的事项
+            self.model.complete(self.visible_items[item_idx])
             self.refresh_list()
         elif self.current_view == "completed":
-            # 从已完成事项移到待办事项
-            item = self.completed_items.pop(item_idx)
-            item.mark_uncompleted()  # 清除完成日期
-            self.todo_items.append(item)
+            # 从已完成事项（包括已加载的归档事项）移到待办事项，并清除完成日期
+            self.model.uncomplete(self.visible_items[item_idx])
             self.refresh_list()
 
 
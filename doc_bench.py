@@ -0,0 +1,247 @@
+"""文档树的文件系统性能测试
+
+生成指定规模的模拟文件夹，然后用 DocumentTree（不依赖Tk）测量扫描、查找、打开和保存的耗时
+以及文件系统函数的调用次数（Linux上另外给出 read/write 系统调用数）。例如：
+
+    python doc_bench.py --entries 1000 100000 1000000 --width 10 --file-size 1024
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import builtins
+import tempfile
+
+from doc_cache import ContentCache
+from doc_model import DocumentTree, PackDocumentTree
+from doc_pack import write_pack, PACK_EXTENSION
+
+# 默认测试的目录项数量
+DEFAULT_ENTRIES = (1000, 100000, 1000000)
+# 查找、打开和保存各测试多少个随机抽取的文件
+SAMPLE_SIZE = 1000
+# 生成的文件使用的扩展名（轮流使用）
+FILE_EXTENSIONS = ('.txt', '.bas')
+
+# 统计调用次数的文件系统函数
+COUNTED_OS_FUNCTIONS = ('stat', 'lstat', 'scandir', 'listdir', 'open', 'replace', 'fsync', 'remove', 'mkdir')
+
+
+def plan_tree(entries, width):
+    """计算生成约 entries 个目录项所需的 (深度, 每个目录中的文件数)
+
+    每个目录有 width 个子目录（最深一层除外），目录数 d 满足 d * (width + 1) >= entries。
+    """
+    depth = 0
+    dirs = 1
+    while dirs * (width + 1) < entries:
+        depth += 1
+        dirs += width ** depth
+    files_per_dir = max(1, round((entries - (dirs - 1)) / dirs))
+    return depth, files_per_dir
+
+
+def generate_tree(root, width, depth, files_per_dir, file_size, seed=0):
+    """生成模拟文件夹：每个目录 width 个子目录（共 depth 层）、files_per_dir 个文件，
+    每个文件约 file_size 字节的多行文本。返回 (目录数, 文件数)"""
+    rng = random.Random(seed)
+    words = ['Sub', 'End', 'Dim', 'As', 'String', 'Integer', 'If', 'Then', 'Else', 'For', 'Next',
+             '数据', '工作表', '单元格', 'Range', 'Cells', 'Value', '0', '1', '42']
+    dir_count = file_count = 0
+    pending = [(root, 0)]
+    while pending:
+        path, level = pending.pop()
+        os.makedirs(path, exist_ok=True)
+        dir_count += 1
+        for i in range(files_per_dir):
+            lines, size = [], 0
+            while size < file_size:
+                line = ' '.join(rng.choice(words) for _ in range(8))
+                lines.append(line)
+                size += len(line.encode('utf-8')) + 1
+            name = f'file{i:04d}{FILE_EXTENSIONS[i % len(FILE_EXTENSIONS)]}'
+            with open(os.path.join(path, name), 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            file_count += 1
+        if level < depth:
+            for i in range(width):
+                pending.append((os.path.join(path, f'dir{i:03d}'), level + 1))
+    return dir_count, file_count
+
+
+class SyscallCounter:
+    """在上下文中统计文件系统函数的调用次数
+
+    通过临时替换 os 模块中的函数和内置 open 计数（counts）；Linux上另外读取 /proc/self/io
+    中的 read/write 系统调用数（io，含 syscr、syscw）。两者分别统计：open 等函数本身也会产生
+    read/write 系统调用，相加会重复计算。
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.io = None  # {'syscr': 次数, 'syscw': 次数}，无法读取 /proc/self/io 时为 None
+        self._originals = {}
+        self._io_start = None
+
+    def _wrap(self, name, func):
+        def counted(*args, **kwargs):
+            self.counts[name] = self.counts.get(name, 0) + 1
+            return func(*args, **kwargs)
+        return counted
+
+    def __enter__(self):
+        self._io_start = _read_proc_io()
+        for name in COUNTED_OS_FUNCTIONS:
+            func = getattr(os, name, None)
+            if func is not None:
+                self._originals[name] = func
+                setattr(os, name, self._wrap('os.' + name, func))
+        self._originals['builtins.open'] = builtins.open
+        builtins.open = self._wrap('open', builtins.open)
+        return self
+
+    def __exit__(self, *exc):
+        builtins.open = self._originals.pop('builtins.open')
+        for name, func in self._originals.items():
+            setattr(os, name, func)
+        self._originals.clear()
+        io_end = _read_proc_io()
+        if self._io_start is not None and io_end is not None:
+            self.io = {key: io_end[key] - self._io_start[key] for key in ('syscr', 'syscw')}
+        return False
+
+    def total(self):
+        """被替换的文件系统函数的调用总数（不含 io 中的系统调用数）"""
+        return sum(self.counts.values())
+
+
+def _read_proc_io():
+    try:
+        with open('/proc/self/io', 'r') as f:
+            return {key: int(value) for key, value in (line.split(': ') for line in f)}
+    except (OSError, ValueError):
+        return None
+
+
+def measure(name, func, operations=1):
+    """执行 func 并返回一条测试结果"""
+    with SyscallCounter() as counter:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+    return {'name': name, 'seconds': elapsed, 'operations': operations,
+            'calls': counter.total(), 'detail': dict(counter.counts), 'io': counter.io}
+
+
+def run_benchmark(folder, sample_size=SAMPLE_SIZE, seed=0):
+    """对一个文件夹运行所有测试，返回测试结果列表"""
+    rng = random.Random(seed)
+    results = []
+    model = DocumentTree(folder, ContentCache(256 * 1024 * 1024))
+    results.append(measure('扫描（无快照）', lambda: model.load(use_snapshot=False)))
+    results.append(measure('加载快照', lambda: DocumentTree(folder).load()))
+    results.append(measure('检查快照（无变化）', lambda: model.check(model.snapshot)))
+
+    files = list(model.iter_files())
+    sample = [os.path.join(folder, rel) for rel in rng.sample(files, min(sample_size, len(files)))]
+    dirs = sorted({os.path.dirname(path) for path in sample})
+
+    def lookup():
+        for path in sample:
+            model.is_file(path)
+
+    def list_dirs():
+        for path in dirs:
+            model.children(path)
+
+    def open_files():
+        for path in sample:
+            model.read_text(path)
+
+    contents = {}
+
+    def save_files():
+        for path in sample:
+            model.save_text(path, contents[path])
+
+    results.append(measure('查找文件', lookup, len(sample)))
+    results.append(measure('列出目录', list_dirs, len(dirs)))
+    model.content_cache.clear()
+    results.append(measure('打开文件（未缓存）', open_files, len(sample)))
+    results.append(measure('打开文件（已缓存）', open_files, len(sample)))
+    for path in sample:
+        contents[path] = model.read_text(path) + 'Rem saved\n'
+    results.append(measure('保存文件', save_files, len(sample)))
+
+    # 同一文件夹打包后，加载目录结构和打开文件的开销
+    pack_path = folder + PACK_EXTENSION
+    write_pack(folder, pack_path, model.snapshot)
+    pack_sample = [pack_path + path[len(folder):] for path in sample]
+    packs = []
+
+    def load_pack():
+        pack = PackDocumentTree(pack_path)
+        pack.load()
+        packs.append(pack)
+
+    def open_packed_files():
+        for path in pack_sample:
+            packs[0].read_text(path)
+
+    results.append(measure('加载打包文件', load_pack))
+    results.append(measure('打开文件（打包）', open_packed_files, len(pack_sample)))
+    packs[0].reader.close()
+    os.remove(pack_path)
+    return results
+
+
+def format_results(title, results):
+    lines = [title, f'{"测试":<18}{"总耗时(ms)":>12}{"次数":>8}{"每次(us)":>12}{"函数调用":>10}'
+                    f'{"读/写系统调用":>16}  函数调用明细']
+    for r in results:
+        per_op = r['seconds'] / r['operations'] * 1e6 if r['operations'] else 0
+        detail = ' '.join(f'{k}={v}' for k, v in sorted(r['detail'].items()))
+        io = f'{r["io"]["syscr"]}/{r["io"]["syscw"]}' if r['io'] is not None else '-'
+        lines.append(f'{r["name"]:<18}{r["seconds"] * 1000:>12.1f}{r["operations"]:>8}{per_op:>12.1f}'
+                     f'{r["calls"]:>10}{io:>16}  {detail}')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='文档树的文件系统性能测试')
+    parser.add_argument('--entries', type=int, nargs='+', default=list(DEFAULT_ENTRIES), help='每个测试的目录项数量')
+    parser.add_argument('--width', type=int, default=10, help='每个目录的子目录数')
+    parser.add_argument('--file-size', type=int, default=1024, help='每个文件的字节数')
+    parser.add_argument('--samples', type=int, default=SAMPLE_SIZE, help='查找、打开和保存测试的文件数')
+    parser.add_argument('--dir', help='生成模拟文件夹的位置（默认使用临时目录，测试后删除）')
+    parser.add_argument('--keep', action='store_true', help='测试后保留生成的文件夹')
+    args = parser.parse_args(argv)
+
+    base = args.dir or tempfile.mkdtemp(prefix='docmenu-bench-')
+    # 快照等缓存写到单独的目录，不影响真实的 ~/.docmenu
+    os.environ.setdefault('DOCMENU_CACHE_DIR', os.path.join(base, '.cache'))
+    try:
+        for entries in args.entries:
+            depth, files_per_dir = plan_tree(entries, args.width)
+            folder = os.path.join(base, f'tree-{entries}')
+            start = time.perf_counter()
+            if not os.path.isdir(folder):
+                dir_count, file_count = generate_tree(folder, args.width, depth, files_per_dir, args.file_size)
+            else:
+                dir_count = file_count = None  # 复用已生成的文件夹
+            generated = time.perf_counter() - start
+            if dir_count is None:
+                title = f'\n== {entries} 个目录项（复用 {folder}）=='
+            else:
+                title = (f'\n== {entries} 个目录项：{dir_count} 个目录、{file_count} 个文件，'
+                         f'深度 {depth}，生成耗时 {generated:.1f} 秒 ==')
+            print(format_results(title, run_benchmark(folder, args.samples)), flush=True)
+    finally:
+        if not args.dir and not args.keep:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+
+def read_text_file(path):
+    """以UTF-8读取文本文件"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+class ContentCache:
+    """已解码文件内容的LRU缓存
+
+    以 (路径, mtime, size) 作为键，文件被外部修改后会自动重新读取；
+    总占用超过 max_bytes 时淘汰最久未使用的条目。可以在后台线程中预取。
+    """
+
+    def __init__(self, max_bytes, loader=read_text_file):
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # 路径 -> (mtime, size, 内容, 占用字节数)
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """返回文件内容，缓存未命中或已过期时从磁盘读取"""
+        st = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == st.st_mtime and entry[1] == st.st_size:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        content = self.loader(path)
+        self._put(path, st, content)
+        return content
+
+    def prefetch(self, path):
+        """预先读取文件到缓存（供后台线程调用，忽略读取错误）"""
+        try:
+            st = os.stat(path)
+            with self._lock:
+                entry = self._entries.get(path)
+                if entry is not None and entry[0] == st.st_mtime and entry[1] == st.st_size:
+                    return
+            self._put(path, st, self.loader(path))
+        except (OSError, UnicodeDecodeError):
+            pass
+
+    def _put(self, path, st, content):
+        nbytes = sys.getsizeof(content)
+        with self._lock:
+            self._discard(path)
+            if nbytes > self.max_bytes:
+                return
+            self._entries[path] = (st.st_mtime, st.st_size, content, nbytes)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self.total_bytes -= old[3]
+
+    def _discard(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self.total_bytes -= entry[3]
+
+    def invalidate(self, path):
+        """使单个文件的缓存失效"""
+        with self._lock:
+            self._discard(path)
+
+    def invalidate_prefix(self, prefix):
+        """使某个目录下所有文件的缓存失效"""
+        with self._lock:
+            for path in [p for p in self._entries if p.startswith(prefix)]:
+                self._discard(path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
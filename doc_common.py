@@ -0,0 +1,33 @@
+import os
+import hashlib
+
+# 目录树中显示的文件类型
+SUPPORTED_EXTENSIONS = ('.txt', '.rtf', '.xlsx', '.bas')
+
+# 可以按文本方式读取（并建立全文索引）的文件类型
+TEXT_EXTENSIONS = ('.txt', '.rtf', '.bas')
+
+# 打开的文件夹下的回收站目录，不显示在目录树中，也不建立索引
+TRASH_DIR_NAME = '.docmenu-trash'
+
+
+def is_supported_file(name):
+    """判断文件名是否为目录树支持的类型"""
+    return name.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def is_text_file(name):
+    """判断文件名是否可以按文本方式读取"""
+    return name.lower().endswith(TEXT_EXTENSIONS)
+
+
+def cache_dir(folder_path):
+    """返回某个文件夹对应的本地缓存目录（不存在时自动创建）
+
+    缓存放在用户目录下，按文件夹路径的哈希区分，避免往共享文件夹里写东西。
+    """
+    base = os.environ.get('DOCMENU_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.docmenu')
+    key = hashlib.sha1(os.path.abspath(folder_path).encode('utf-8')).hexdigest()[:16]
+    path = os.path.join(base, key)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,83 @@
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+# 部分哈希读取文件开头和结尾各一块
+PARTIAL_BLOCK = 64 * 1024
+# 完整哈希每次读取的字节数
+READ_CHUNK = 1024 * 1024
+
+
+def partial_hash(path, size):
+    """文件开头和结尾各一块的哈希；文件不超过两块时就是完整哈希"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        if size <= 2 * PARTIAL_BLOCK:
+            h.update(f.read())
+        else:
+            h.update(f.read(PARTIAL_BLOCK))
+            f.seek(size - PARTIAL_BLOCK)
+            h.update(f.read(PARTIAL_BLOCK))
+    return h.digest()
+
+
+def full_hash(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b''):
+            h.update(chunk)
+    return h.digest()
+
+
+def _regroup(groups, key_func, executor):
+    """用 key_func 计算每组中各文件的键并按键重新分组，只保留仍有多个文件的组"""
+    jobs = [(key, path) for key, paths in groups.items() for path in paths]
+    keys = executor.map(lambda job: _safe_key(key_func, job), jobs)
+    regrouped = {}
+    for (key, path), new_key in zip(jobs, keys):
+        if new_key is not None:
+            regrouped.setdefault((key, new_key), []).append(path)
+    return {key: paths for key, paths in regrouped.items() if len(paths) > 1}
+
+
+def _safe_key(key_func, job):
+    try:
+        return key_func(job)
+    except OSError:
+        return None
+
+
+def find_duplicates(paths, workers=None, progress=None):
+    """查找内容相同的文件，返回 [(文件大小, [路径, ...]), ...]，按浪费的空间从大到小排列
+
+    先按文件大小分组，再比较开头和结尾的部分哈希，只有仍然相同的文件才计算完整哈希。
+    空文件不参与比较。progress(阶段, 剩余候选文件数) 用于报告进度。
+    """
+    by_size = {}
+    for path in paths:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            continue
+        if size > 0:
+            by_size.setdefault(size, []).append(path)
+    groups = {size: group for size, group in by_size.items() if len(group) > 1}
+    if progress:
+        progress('size', sum(len(g) for g in groups.values()))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        groups = _regroup(groups, lambda job: partial_hash(job[1], job[0]), executor)
+        if progress:
+            progress('partial', sum(len(g) for g in groups.values()))
+
+        # 不超过两块的文件部分哈希就是完整哈希，无需再读
+        small = {key: group for key, group in groups.items() if key[0] <= 2 * PARTIAL_BLOCK}
+        large = {key: group for key, group in groups.items() if key[0] > 2 * PARTIAL_BLOCK}
+        large = _regroup(large, lambda job: full_hash(job[1]), executor)
+        if progress:
+            progress('full', sum(len(g) for g in large.values()))
+
+    result = [(key[0], sorted(group)) for key, group in small.items()]
+    result += [(key[0][0], sorted(group)) for key, group in large.items()]
+    result.sort(key=lambda item: item[0] * (len(item[1]) - 1), reverse=True)
+    return result
@@ -0,0 +1,275 @@
+import os
+import time
+import uuid
+import queue
+import shutil
+import threading
+
+# 两次进度报告之间的最短间隔（秒）
+PROGRESS_INTERVAL = 0.1
+
+# 回收站中每一项记录原路径的文件名
+ORIGIN_FILE = '.origin'
+
+
+class OperationCancelled(Exception):
+    pass
+
+
+class FileOperation:
+    """一次文件操作（删除、移入回收站、复制或移动）
+
+    kind 为 'delete'、'trash'、'copy' 或 'move'；copy 和 move 把 source 放到 target 目录下，
+    trash 把 source 移到 target（回收站目录）下。进度和错误由工作线程更新。
+    """
+
+    LABELS = {'delete': '删除', 'trash': '删除', 'copy': '复制', 'move': '移动'}
+
+    def __init__(self, kind, source, target=None):
+        self.kind = kind
+        self.source = source
+        self.target = target
+        self.result_path = None  # 复制或移动后的新路径
+        self.done = 0
+        self.total = 0
+        self.errors = []  # [(路径, 错误信息)]
+        self.finished = False
+        self._cancel = threading.Event()
+        self._last_report = 0
+
+    @property
+    def label(self):
+        return f'{self.LABELS[self.kind]} {os.path.basename(self.source)}'
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+
+def _count_files(path):
+    if not os.path.isdir(path) or os.path.islink(path):
+        return 1
+    total = 0
+    for dir_path, dir_names, file_names in os.walk(path):
+        total += len(file_names) + 1
+    return total
+
+
+def _remove_path(path):
+    """删除文件或目录（用于清理未完成的复制），忽略错误"""
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _unique_path(path):
+    """目标已存在时在名称后加序号"""
+    if not os.path.exists(path):
+        return path
+    base, ext = os.path.splitext(path)
+    i = 2
+    while os.path.exists(f'{base} ({i}){ext}'):
+        i += 1
+    return f'{base} ({i}){ext}'
+
+
+class FileOperationQueue:
+    """由工作线程执行的文件操作队列
+
+    on_progress(操作) 和 on_done(操作) 在工作线程中调用，调用者负责转交给界面线程。
+    """
+
+    def __init__(self, on_progress, on_done, workers=2):
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self._queue = queue.Queue()
+        self.active = []
+        self._lock = threading.Lock()
+        for _ in range(workers):
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, operation):
+        with self._lock:
+            self.active.append(operation)
+        self._queue.put(operation)
+        return operation
+
+    def cancel_all(self):
+        with self._lock:
+            for operation in self.active:
+                operation.cancel()
+
+    def _run(self):
+        while True:
+            operation = self._queue.get()
+            try:
+                self._execute(operation)
+            except OperationCancelled:
+                pass
+            except Exception as e:
+                operation.errors.append((operation.source, str(e)))
+            operation.finished = True
+            with self._lock:
+                self.active.remove(operation)
+            self.on_done(operation)
+
+    def _execute(self, operation):
+        if operation.kind in ('copy', 'move'):
+            source = os.path.abspath(operation.source)
+            target = os.path.abspath(operation.target)
+            if target == source or target.startswith(source + os.sep):
+                raise ValueError('不能把文件夹复制或移动到其自身内部')
+            if operation.kind == 'move' and target == os.path.dirname(source):
+                return
+        # 移入回收站和同一文件系统上的移动只是一次重命名，不需要先遍历统计文件数
+        operation.total = _count_files(operation.source) if operation.kind in ('delete', 'copy') else 1
+        self._report(operation, force=True)
+        if operation.kind == 'delete':
+            self._delete(operation, operation.source)
+        elif operation.kind == 'trash':
+            self._trash(operation)
+        elif operation.kind == 'copy':
+            target = _unique_path(os.path.join(operation.target, os.path.basename(operation.source)))
+            operation.result_path = target
+            self._copy_new(operation, operation.source, target)
+        elif operation.kind == 'move':
+            self._move(operation)
+
+    def _report(self, operation, force=False):
+        now = time.monotonic()
+        if force or now - operation._last_report >= PROGRESS_INTERVAL:
+            operation._last_report = now
+            self.on_progress(operation)
+
+    def _step(self, operation):
+        if operation.cancelled:
+            raise OperationCancelled()
+        operation.done += 1
+        self._report(operation)
+
+    def _delete(self, operation, path):
+        """逐个删除文件，出错的项记录下来后继续"""
+        if os.path.isdir(path) and not os.path.islink(path):
+            for dir_path, dir_names, file_names in os.walk(path, topdown=False):
+                for name in file_names:
+                    file_path = os.path.join(dir_path, name)
+                    try:
+                        os.remove(file_path)
+                    except OSError as e:
+                        operation.errors.append((file_path, str(e)))
+                    self._step(operation)
+                try:
+                    os.rmdir(dir_path)
+                except OSError as e:
+                    # 目录中有删除失败的文件时，这里的错误不再重复记录
+                    if not any(p.startswith(dir_path + os.sep) for p, _ in operation.errors):
+                        operation.errors.append((dir_path, str(e)))
+                self._step(operation)
+        else:
+            try:
+                os.remove(path)
+            except OSError as e:
+                operation.errors.append((path, str(e)))
+            self._step(operation)
+
+    def _trash(self, operation):
+        """移入回收站：同一文件系统上只需一次重命名，否则由 shutil.move 复制后删除"""
+        entry_dir = os.path.join(operation.target, f'{time.strftime("%Y%m%d%H%M%S")}-{uuid.uuid4().hex[:8]}')
+        os.makedirs(entry_dir)
+        try:
+            with open(os.path.join(entry_dir, ORIGIN_FILE), 'w', encoding='utf-8') as f:
+                f.write(operation.source)
+            shutil.move(operation.source, os.path.join(entry_dir, os.path.basename(operation.source)))
+        except OSError:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            raise
+        operation.result_path = entry_dir
+        operation.done = operation.total
+        self._report(operation, force=True)
+
+    def _copy_new(self, operation, source, target):
+        """复制到新的目标路径，取消时删除已复制的部分"""
+        try:
+            self._copy(operation, source, target)
+        except OperationCancelled:
+            _remove_path(target)
+            operation.result_path = None
+            raise
+
+    def _copy(self, operation, source, target):
+        if os.path.isdir(source) and not os.path.islink(source):
+            for dir_path, dir_names, file_names in os.walk(source):
+                target_dir = os.path.join(target, os.path.relpath(dir_path, source))
+                try:
+                    os.makedirs(target_dir, exist_ok=True)
+                except OSError as e:
+                    operation.errors.append((dir_path, str(e)))
+                    dir_names[:] = []
+                    continue
+                self._step(operation)
+                for name in file_names:
+                    try:
+                        shutil.copy2(os.path.join(dir_path, name), os.path.join(target_dir, name))
+                    except OSError as e:
+                        operation.errors.append((os.path.join(dir_path, name), str(e)))
+                    self._step(operation)
+        else:
+            try:
+                shutil.copy2(source, target)
+            except OSError as e:
+                operation.errors.append((source, str(e)))
+            self._step(operation)
+
+    def _move(self, operation):
+        target = _unique_path(os.path.join(operation.target, os.path.basename(operation.source)))
+        operation.result_path = target
+        try:
+            # 同一文件系统上直接重命名
+            os.rename(operation.source, target)
+            operation.done = operation.total
+            self._report(operation, force=True)
+            return
+        except OSError:
+            pass
+        # 跨文件系统：先复制，全部成功后再删除源文件；复制和删除各计一次进度
+        operation.total = 2 * _count_files(operation.source)
+        self._report(operation, force=True)
+        self._copy_new(operation, operation.source, target)
+        if not operation.errors:
+            self._delete(operation, operation.source)
+        else:
+            operation.done = operation.total
+
+
+def list_trash(trash_dir):
+    """列出回收站中的项目，返回 [(项目目录, 原路径)]，最近删除的在前"""
+    items = []
+    try:
+        names = sorted(os.listdir(trash_dir), reverse=True)
+    except OSError:
+        return items
+    for name in names:
+        entry_dir = os.path.join(trash_dir, name)
+        try:
+            with open(os.path.join(entry_dir, ORIGIN_FILE), encoding='utf-8') as f:
+                items.append((entry_dir, f.read()))
+        except OSError:
+            continue
+    return items
+
+
+def restore_from_trash(entry_dir, original_path):
+    """把回收站中的项目移回原位置，原位置已被占用时加序号，返回恢复后的路径"""
+    target = _unique_path(original_path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # 原位置可能在另一个文件系统上，shutil.move 会在重命名失败时复制后删除
+    shutil.move(os.path.join(entry_dir, os.path.basename(original_path)), target)
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    return target
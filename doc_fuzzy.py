@@ -0,0 +1,104 @@
+import os
+import time
+import heapq
+
+# 路径分隔符、下划线等之后的字符视为词首
+BOUNDARY_CHARS = frozenset('/\\_-. ')
+
+
+def fuzzy_score(text, query, name_start=0):
+    """按子序列匹配为 text 打分，query 和 text 都应为小写；不匹配时返回 None
+
+    匹配越紧凑、越靠近文件名、起点位于词首时得分越高。
+    """
+    pos = -1
+    for ch in query:
+        pos = text.find(ch, pos + 1)
+        if pos < 0:
+            return None
+    end = pos
+
+    # 从匹配末尾向前收紧，得到最短的匹配区间
+    start = end + 1
+    for ch in reversed(query):
+        start = text.rfind(ch, 0, start)
+
+    span = end - start + 1
+    score = len(query) * 16 - (span - len(query)) * 2
+    if start >= name_start:
+        score += 24  # 完全落在文件名中
+    if start == 0 or text[start - 1] in BOUNDARY_CHARS:
+        score += 8
+    if start == name_start:
+        score += 8
+    return score - len(text) // 8
+
+
+class FuzzyFinder:
+    """在预先建立的路径列表上做增量的模糊匹配
+
+    每次输入都基于上一次完成的查询结果继续筛选（新查询以旧查询开头时），
+    匹配分批进行，由调用者按时间预算反复调用 step()，避免阻塞界面。
+    """
+
+    def __init__(self, paths, top_k=50):
+        self.paths = paths
+        self.lower = [p.lower() for p in paths]
+        self.name_starts = [len(p) - len(os.path.basename(p)) for p in paths]
+        self.top_k = top_k
+        self.query = ''
+        self._base_query = ''
+        self._base_candidates = range(len(paths))
+        self._candidates = self._base_candidates
+        self._position = 0
+        self._matches = []
+        self._heap = []
+
+    def start(self, query):
+        """开始新的查询"""
+        query = query.lower().replace(' ', '')
+        self.query = query
+        if self._base_query and query.startswith(self._base_query):
+            self._candidates = self._base_candidates
+        else:
+            self._candidates = range(len(self.paths))
+        self._position = 0
+        self._matches = []
+        self._heap = []
+
+    def step(self, budget=0.008):
+        """在 budget 秒内尽量多处理候选路径，全部处理完时返回 True"""
+        if not self.query:
+            return True
+        deadline = time.perf_counter() + budget
+        candidates = self._candidates
+        lower, name_starts = self.lower, self.name_starts
+        query, heap, top_k, matches = self.query, self._heap, self.top_k, self._matches
+        total = len(candidates)
+        position = self._position
+        while position < total:
+            chunk_end = min(total, position + 2000)
+            for i in candidates[position:chunk_end]:
+                score = fuzzy_score(lower[i], query, name_starts[i])
+                if score is None:
+                    continue
+                matches.append(i)
+                entry = (score, -i)
+                if len(heap) < top_k:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+            position = chunk_end
+            if time.perf_counter() >= deadline:
+                break
+        self._position = position
+        if position < total:
+            return False
+        # 完成后作为下一次输入的候选集合
+        self._base_query = query
+        self._base_candidates = matches
+        return True
+
+    def results(self):
+        """当前得分最高的路径，按得分从高到低排列"""
+        return [self.paths[-neg_i] for score, neg_i in sorted(self._heap, reverse=True)]
@@ -0,0 +1,224 @@
+import re
+
+# 行首的分词状态
+STATE_NORMAL = 0
+STATE_COMMENT = 1  # 上一行的注释以续行符 " _" 结尾，本行仍是注释
+
+KEYWORDS = frozenset('''
+    alias and as attribute base binary boolean byref byte byval call case cbool cbyte ccur cdate cdbl cdec
+    cint clng clnglng clngptr close compare const csng cstr currency cvar date debug declare defbool defbyte
+    defcur defdate defdbl defint deflng defobj defsng defstr defvar dim do double each else elseif empty end
+    enum eqv erase error event exit explicit false for friend function get global gosub goto if imp implements
+    in input integer is let lib like line lock long longlong longptr loop lset me mod module new next not
+    nothing null object on open option optional or paramarray preserve print private property ptrsafe public
+    put raiseevent randomize redim resume return rset seek select set single static step stop string sub then
+    to true type typeof until variant wend while with withevents write xor
+'''.split())
+
+TOKEN_RE = re.compile(r'''
+    (?P<string>"(?:[^"]|"")*"?)
+  | (?P<comment>'.*)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<number>&[HhOo][0-9A-Fa-f]+&?|\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+''', re.VERBOSE)
+
+PROC_RE = re.compile(
+    r'^\s*(?:(?:Public|Private|Friend|Global)\s+)?(?:Static\s+)?'
+    r'(?:Sub|Function|Property\s+(?:Get|Let|Set))\s+([A-Za-z_][A-Za-z0-9_]*)',
+    re.IGNORECASE)
+
+# 重新分词时每次从Text组件中取出的行数
+RESCAN_BLOCK = 200
+
+TAG_STYLES = {
+    'hl_keyword': {'foreground': '#0000c0'},
+    'hl_string': {'foreground': '#a31515'},
+    'hl_comment': {'foreground': '#008000'},
+    'hl_number': {'foreground': '#098658'},
+    'hl_proc': {'foreground': '#795e26', 'underline': True},
+}
+
+
+def _continues(text):
+    """注释是否以VBA续行符结尾"""
+    stripped = text.rstrip()
+    return stripped == '_' or stripped.endswith(' _')
+
+
+def tokenize_line(line, state):
+    """对一行VBA代码分词，返回 ([(标签, 起始列, 结束列), ...], 下一行的起始状态)"""
+    if state == STATE_COMMENT:
+        end_state = STATE_COMMENT if _continues(line) else STATE_NORMAL
+        return [('hl_comment', 0, len(line))], end_state
+
+    spans = []
+    proc = PROC_RE.match(line)
+    if proc:
+        spans.append(('hl_proc', proc.start(1), proc.end(1)))
+
+    for match in TOKEN_RE.finditer(line):
+        kind = match.lastgroup
+        start, end = match.span()
+        if kind == 'word':
+            word = match.group().lower()
+            if word == 'rem':
+                # Rem 语句：该行剩余部分都是注释
+                spans.append(('hl_comment', start, len(line)))
+                if _continues(line):
+                    return spans, STATE_COMMENT
+                break
+            if word in KEYWORDS and not (proc and start == proc.start(1)):
+                spans.append(('hl_keyword', start, end))
+        elif kind == 'comment':
+            spans.append(('hl_comment', start, end))
+            if _continues(match.group()):
+                return spans, STATE_COMMENT
+        else:
+            spans.append(('hl_' + kind, start, end))
+    return spans, STATE_NORMAL
+
+
+class VbaHighlighter:
+    """Text组件的增量VBA语法高亮
+
+    通过代理Text组件的Tcl命令捕获插入和删除，只对被编辑的行和可见行重新分词。
+    每行缓存行首的分词状态，编辑后向下重新扫描，直到某行的结束状态与缓存一致为止。
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.enabled = False
+        self.states = [STATE_NORMAL]  # 每行行首的分词状态（下标为行号-1）
+        self.known = 1                # states[:known] 都是有效的
+        self.tagged = bytearray(1)    # 每行的高亮是否是最新的
+
+        for tag, style in TAG_STYLES.items():
+            text.tag_configure(tag, **style)
+        text.tag_raise('sel')
+
+        self._orig = text._w + '_orig'
+        text.tk.call('rename', text._w, self._orig)
+        text.tk.createcommand(text._w, self._proxy)
+
+    def _call(self, *args):
+        return self.text.tk.call((self._orig,) + args)
+
+    def _line_of(self, index):
+        return int(self._call('index', index).split('.')[0])
+
+    def _line_count(self):
+        return self._line_of('end-1c')
+
+    def _proxy(self, cmd, *args):
+        if not self.enabled or cmd not in ('insert', 'delete', 'replace'):
+            return self._call(cmd, *args)
+        old_count = self._line_count()
+        # 在 end 处插入时实际插入到最后一行末尾
+        first_line = min(self._line_of(args[0]), old_count)
+        result = self._call(cmd, *args)
+        self._on_edit(first_line - 1, self._line_count() - old_count)
+        return result
+
+    def reset(self, enabled):
+        """加载新内容后重置缓存，enabled 为 False 时关闭高亮"""
+        self.enabled = enabled
+        for tag in TAG_STYLES:
+            self._call('tag', 'remove', tag, '1.0', 'end')
+        count = self._line_count()
+        self.states = [STATE_NORMAL] * count
+        self.known = 1
+        self.tagged = bytearray(count)
+        if enabled:
+            self.text.after_idle(self.highlight_visible)
+
+    def _on_edit(self, first, delta):
+        """编辑从第 first 行（从0开始）开始，行数变化了 delta"""
+        if delta > 0:
+            self.states[first + 1:first + 1] = [STATE_NORMAL] * delta
+            self.tagged[first + 1:first + 1] = bytes(delta)
+            if self.known > first + 1:
+                self.known += delta
+        elif delta < 0:
+            del self.states[first + 1:first + 1 - delta]
+            del self.tagged[first + 1:first + 1 - delta]
+            if self.known > first + 1:
+                self.known = max(first + 1, self.known + delta)
+        last_edited = first + max(delta, 0)
+
+        if first >= self.known:
+            # 该行之前的状态还未计算过，等到它可见时再处理
+            for line in range(first, last_edited + 1):
+                self.tagged[line] = 0
+            self.highlight_visible()
+            return
+        self._rescan(first, last_edited)
+
+    def _get_lines(self, start, end):
+        """一次取出第 start 到 end-1 行（从0开始）的文本"""
+        return self._call('get', f'{start + 1}.0', f'{end}.end').split('\n')
+
+    def _rescan(self, first, last_edited):
+        """从第 first 行开始重新分词，直到行首状态与缓存一致"""
+        visible_first, visible_last = self._visible_lines()
+        count = len(self.states)
+        state = self.states[first]
+        line = first
+        block, block_start = [], first
+        while line < count:
+            if line - block_start >= len(block):
+                block_start = line
+                block = self._get_lines(line, min(count, line + RESCAN_BLOCK))
+            spans, state = tokenize_line(block[line - block_start], state)
+            if visible_first <= line <= visible_last:
+                self._apply(line, spans)
+            else:
+                # 不可见的行只记录状态，等滚动到可见时再加高亮
+                self.tagged[line] = 0
+            line += 1
+            if line >= count:
+                break
+            if line > last_edited and line < self.known and self.states[line] == state:
+                # 状态与缓存一致，后面的行不受影响
+                return
+            self.states[line] = state
+            if line >= self.known:
+                self.known = line + 1
+                if line > last_edited:
+                    return
+
+    def _visible_lines(self):
+        first = self._line_of('@0,0') - 1
+        last = self._line_of(f'@0,{self.text.winfo_height()}') - 1
+        return first, last
+
+    def _ensure_states(self, upto):
+        """计算到第 upto 行（从0开始）为止每行的起始状态"""
+        while self.known <= upto:
+            start = self.known - 1
+            end = min(upto, start + RESCAN_BLOCK)
+            state = self.states[start]
+            for offset, text_line in enumerate(self._get_lines(start, end)):
+                _, state = tokenize_line(text_line, state)
+                self.states[start + offset + 1] = state
+            self.known = end + 1
+
+    def _apply(self, line, spans):
+        start, end = f'{line + 1}.0', f'{line + 1}.end'
+        for tag in TAG_STYLES:
+            self._call('tag', 'remove', tag, start, end)
+        for tag, col_start, col_end in spans:
+            self._call('tag', 'add', tag, f'{line + 1}.{col_start}', f'{line + 1}.{col_end}')
+        self.tagged[line] = 1
+
+    def highlight_visible(self):
+        """为可见范围内尚未更新的行加上高亮"""
+        if not self.enabled:
+            return
+        first, last = self._visible_lines()
+        last = min(last, len(self.states) - 1)
+        self._ensure_states(last)
+        for line in range(first, last + 1):
+            if not self.tagged[line]:
+                content = self._call('get', f'{line + 1}.0', f'{line + 1}.end')
+                spans, _ = tokenize_line(content, self.states[line])
+                self._apply(line, spans)
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import threading
+
+from doc_common import cache_dir
+
+# 每个文件始终保留的最新版本数
+KEEP_LAST = 20
+# 在此天数内，每个文件每天额外保留当天的最后一个版本
+KEEP_DAYS = 30
+# 日志中新增多少条记录后自动整理一次
+COMPACT_EVERY = 500
+
+
+class Version:
+    def __init__(self, path, digest, saved_at, size):
+        self.path = path          # 相对于打开的文件夹的路径
+        self.digest = digest      # 内容的SHA-256
+        self.saved_at = saved_at  # 保存时间（时间戳）
+        self.size = size          # 未压缩的字节数
+
+    def to_json(self):
+        return json.dumps({'path': self.path, 'digest': self.digest, 'time': self.saved_at, 'size': self.size},
+                          ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, line):
+        data = json.loads(line)
+        return cls(data['path'], data['digest'], data['time'], data['size'])
+
+
+class VersionStore:
+    """保存文档历史版本的内容寻址存储
+
+    内容用zlib压缩后以SHA-256为键保存为对象文件，相同内容（无论属于哪个文件、哪个版本）
+    只保存一份。每次保存追加一条记录到日志中，整理时按保留策略删除旧记录，
+    并清理不再被引用的对象。
+    """
+
+    def __init__(self, folder_path, store_path=None):
+        self.folder_path = folder_path
+        self.store_path = store_path or os.path.join(cache_dir(folder_path), 'history')
+        self.objects_path = os.path.join(self.store_path, 'objects')
+        self.log_path = os.path.join(self.store_path, 'log.jsonl')
+        os.makedirs(self.objects_path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._versions = {}  # 相对路径 -> [Version, ...]（从旧到新）
+        self._appended = 0
+        self._load_log()
+
+    def _load_log(self):
+        try:
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        version = Version.from_json(line)
+                    except (ValueError, KeyError):
+                        continue  # 忽略写了一半的最后一行
+                    self._versions.setdefault(version.path, []).append(version)
+        except FileNotFoundError:
+            pass
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_path, digest[:2], digest[2:])
+
+    def _rel_path(self, path):
+        return os.path.relpath(path, self.folder_path)
+
+    def _store_blob(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            tmp_path = object_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(zlib.compress(data, 6))
+            os.replace(tmp_path, object_path)
+        return digest
+
+    def add_version(self, path, data, saved_at=None):
+        """保存一个版本，内容与该文件的最新版本相同时跳过，返回是否新增了版本"""
+        rel_path = self._rel_path(path)
+        with self._lock:
+            versions = self._versions.get(rel_path)
+            digest = hashlib.sha256(data).hexdigest()
+            if versions and versions[-1].digest == digest:
+                return False
+            self._store_blob(data)
+            version = Version(rel_path, digest, saved_at or time.time(), len(data))
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(version.to_json() + '\n')
+            self._versions.setdefault(rel_path, []).append(version)
+            self._appended += 1
+            need_compact = self._appended >= COMPACT_EVERY
+        if need_compact:
+            self.compact()
+        return True
+
+    def record_save(self, path, data):
+        """保存文件前调用：第一次保存时先把磁盘上的原内容记为基准版本"""
+        if not self.versions(path) and os.path.isfile(path):
+            try:
+                with open(path, 'rb') as f:
+                    original = f.read()
+                self.add_version(path, original, os.path.getmtime(path))
+            except OSError:
+                pass
+        self.add_version(path, data)
+
+    def versions(self, path):
+        """某个文件的所有版本，最新的在前"""
+        with self._lock:
+            return list(reversed(self._versions.get(self._rel_path(path), [])))
+
+    def read(self, version):
+        with open(self._object_path(version.digest), 'rb') as f:
+            return zlib.decompress(f.read())
+
+    def _retained(self, versions, now):
+        """按保留策略筛选一个文件的版本（从旧到新）"""
+        keep = set(range(max(0, len(versions) - KEEP_LAST), len(versions)))
+        seen_days = set()
+        for i in range(len(versions) - 1, -1, -1):
+            saved_at = versions[i].saved_at
+            if now - saved_at > KEEP_DAYS * 86400:
+                break
+            day = time.strftime('%Y-%m-%d', time.localtime(saved_at))
+            if day not in seen_days:
+                seen_days.add(day)
+                keep.add(i)
+        return [v for i, v in enumerate(versions) if i in keep]
+
+    def compact(self):
+        """按保留策略整理日志，并删除不再被引用的对象，返回删除的对象数"""
+        now = time.time()
+        with self._lock:
+            self._versions = {path: self._retained(versions, now) for path, versions in self._versions.items()}
+            self._versions = {path: versions for path, versions in self._versions.items() if versions}
+            tmp_path = self.log_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for versions in self._versions.values():
+                    for version in versions:
+                        f.write(version.to_json() + '\n')
+            os.replace(tmp_path, self.log_path)
+            self._appended = 0
+            referenced = {v.digest for versions in self._versions.values() for v in versions}
+
+            removed = 0
+            for prefix in os.listdir(self.objects_path):
+                prefix_path = os.path.join(self.objects_path, prefix)
+                for name in os.listdir(prefix_path):
+                    if prefix + name not in referenced:
+                        os.remove(os.path.join(prefix_path, name))
+                        removed += 1
+        return removed
+
+    def disk_usage(self):
+        """返回 (对象占用的字节数, 所有版本未压缩的总字节数)"""
+        stored = 0
+        for dir_path, dir_names, file_names in os.walk(self.objects_path):
+            stored += sum(os.path.getsize(os.path.join(dir_path, name)) for name in file_names)
+        with self._lock:
+            logical = sum(v.size for versions in self._versions.values() for v in versions)
+        return stored, logical
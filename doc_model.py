@@ -0,0 +1,208 @@
+import io
+import os
+
+from doc_cache import ContentCache
+from doc_xlsx import XlsxReader
+from doc_search import SearchIndex
+from doc_pack import PackReader, PackSearchIndex, is_pack_file
+from doc_writer import atomic_write_text, WriteTask
+from doc_rules import ScanStats, load_rules
+from doc_tree import (scan_tree, refresh_tree, find_node, rescan_path, iter_files, load_snapshot, save_snapshot,
+                      snapshot_path)
+
+# 没有传入共享缓存时，文件内容缓存的内存上限（字节）
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class DocumentTree:
+    """一个文件夹的文档树模型，不依赖Tk
+
+    负责目录快照的加载、检查和查找，以及文件内容的读取和保存。DocMenu只负责把它显示在
+    目录树和编辑器中，性能测试（doc_bench）也直接使用该类。扫描时按该文件夹的过滤规则
+    （doc_rules）跳过不需要的文件和目录，rules 为 None 时读取保存的规则。
+    """
+    read_only = False
+
+    def __init__(self, folder_path, content_cache=None, rules=None):
+        self.folder_path = folder_path
+        self.content_cache = content_cache or ContentCache(DEFAULT_CACHE_BYTES)
+        self.rules = rules or load_rules(folder_path)
+        self.snapshot = None  # 目录快照（doc_tree.DirNode）
+        self.dirty = False    # 快照修改后是否尚未保存
+        self.stats = None     # 最近一次完整扫描的统计（doc_rules.ScanStats）
+
+    # 目录快照
+    def load(self, use_snapshot=True, writer=None):
+        """加载目录结构，优先使用保存的快照，返回是否来自快照（writer 见 save）"""
+        snapshot = load_snapshot(self.folder_path, self.rules) if use_snapshot else None
+        if snapshot is not None:
+            self.snapshot = snapshot
+            return True
+        self.stats = ScanStats()
+        self.snapshot = scan_tree(self.folder_path, self.rules, self.stats)
+        self.save(writer)
+        return False
+
+    def check(self, snapshot):
+        """按目录mtime检查快照（可在后台线程中调用），返回 (新快照, 变化了的目录列表, 扫描统计)
+
+        不修改模型本身，由调用方确认快照期间未被替换后再用 apply 更新。
+        """
+        changed = []
+        stats = ScanStats()
+        return refresh_tree(self.folder_path, snapshot, changed, self.rules, stats), changed, stats
+
+    def apply(self, snapshot):
+        self.snapshot = snapshot
+        self.dirty = True
+
+    def rescan(self, path):
+        """文件或文件夹被新建、删除后，重新读取快照中的该目录"""
+        if self.snapshot is not None:
+            self.snapshot = rescan_path(self.snapshot, self.folder_path, path, self.rules)
+            self.dirty = True
+
+    def save(self, writer=None):
+        """保存目录快照；传入 writer（doc_writer.BackgroundWriter）时在写入线程中序列化和写入
+
+        快照是不可变的（修改时生成新的节点），提交后模型继续修改也不影响正在写入的快照。
+        """
+        if writer is None:
+            if self._write_snapshot(self.snapshot, self.rules):
+                self.dirty = False
+            return
+        snapshot, rules = self.snapshot, self.rules
+        self.dirty = False
+        writer.submit(snapshot_path(self.folder_path), WriteTask(lambda: self._write_snapshot(snapshot, rules)))
+
+    def _write_snapshot(self, snapshot, rules):
+        try:
+            save_snapshot(self.folder_path, snapshot, rules)
+            return True
+        except OSError:
+            return False  # 快照只是缓存，保存失败不影响使用
+
+    # 查找
+    def node(self, path):
+        """返回目录 path 对应的 DirNode，不在快照中时返回 None"""
+        return find_node(self.snapshot, self.folder_path, path)
+
+    def children(self, path):
+        """列出目录 path 的内容，返回 [(名称, 完整路径, 是否为目录, 是否有子项), ...]"""
+        node = self.node(path)
+        if node is None:
+            return []
+        result = []
+        for name, is_dir in node.entries:
+            child = node.children.get(name) if is_dir else None
+            result.append((name, os.path.join(path, name), is_dir, bool(child is not None and child.entries)))
+        return result
+
+    def entry(self, path):
+        """返回快照中 path 的 (名称, 是否为目录)，不存在时返回 None"""
+        if path == self.folder_path:
+            return os.path.basename(path), True
+        parent = self.node(os.path.dirname(path))
+        if parent is None:
+            return None
+        name = os.path.basename(path)
+        for entry in parent.entries:
+            if entry[0] == name:
+                return entry
+        return None
+
+    def is_file(self, path):
+        entry = self.entry(path)
+        return entry is not None and not entry[1]
+
+    def is_dir(self, path):
+        entry = self.entry(path)
+        return entry is not None and entry[1]
+
+    def iter_files(self):
+        """列出所有文件相对于文件夹的路径"""
+        return iter_files(self.snapshot) if self.snapshot is not None else iter(())
+
+    def count(self):
+        return self.snapshot.count() if self.snapshot is not None else 0
+
+    # 文件内容
+    def read_text(self, path):
+        return self.content_cache.get(path)
+
+    def prefetch(self, path):
+        self.content_cache.prefetch(path)
+
+    def open_xlsx(self, path):
+        return XlsxReader(path)
+
+    def save_text(self, path, content):
+        """原子地保存文本文件"""
+        atomic_write_text(path, content)
+        self.content_cache.invalidate(path)
+
+    def is_text_file(self, path):
+        """按过滤规则判断文件是否按文本方式读取和保存（见 doc_rules.RuleSet.is_text）"""
+        return self.rules.is_text(os.path.relpath(path, self.folder_path).replace(os.sep, '/'))
+
+    def create_search_index(self):
+        return SearchIndex(self.folder_path, rules=self.rules)
+
+    def close(self):
+        """不再使用该模型时调用，释放占用的资源"""
+        pass
+
+
+class PackDocumentTree(DocumentTree):
+    """以打包文件（doc_pack）为只读根目录的文档树
+
+    目录结构来自打包文件的索引，文件内容通过内存映射读取；路径形如 打包文件路径/相对路径，
+    与普通文件夹一样用于目录树、打开和搜索。
+    """
+    read_only = True
+
+    def __init__(self, pack_path, content_cache=None):
+        super().__init__(pack_path, content_cache)
+        self.reader = PackReader(pack_path)
+
+    def _rel(self, path):
+        return os.path.relpath(path, self.folder_path).replace(os.sep, '/')
+
+    def load(self, use_snapshot=True):
+        self.snapshot = self.reader.snapshot()
+        return False
+
+    def check(self, snapshot):
+        return snapshot, [], ScanStats()
+
+    def rescan(self, path):
+        pass
+
+    def save(self, writer=None):
+        self.dirty = False
+
+    def read_text(self, path):
+        return self.reader.read_text(self._rel(path))
+
+    def prefetch(self, path):
+        pass  # 内存映射读取不需要预取
+
+    def open_xlsx(self, path):
+        return XlsxReader(io.BytesIO(self.reader.read_bytes(self._rel(path))))
+
+    def save_text(self, path, content):
+        raise PermissionError('打包文件是只读的，不能保存修改')
+
+    def create_search_index(self):
+        return PackSearchIndex(self.reader)
+
+    def close(self):
+        # 释放内存映射，Windows上打包文件才能被替换或删除
+        self.reader.close()
+
+
+def open_document_tree(path, content_cache=None):
+    """按路径打开文件夹或打包文件对应的文档树"""
+    if is_pack_file(path):
+        return PackDocumentTree(path, content_cache)
+    return DocumentTree(path, content_cache)
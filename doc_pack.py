@@ -0,0 +1,169 @@
+import os
+import mmap
+import json
+import zlib
+import struct
+
+from doc_common import is_text_file
+from doc_tree import DirNode, scan_tree
+from doc_search import SearchIndex, index_bytes, _decode_line
+
+# 打包文件的扩展名
+PACK_EXTENSION = '.docpack'
+
+# 文件头：标识、索引的偏移和长度
+PACK_MAGIC = b'DOCPACK1'
+HEADER = struct.Struct('<8sQQ')
+
+# 打包时每次复制的字节数
+COPY_CHUNK = 1024 * 1024
+
+
+class PackError(Exception):
+    """打包文件格式错误"""
+
+
+def is_pack_file(path):
+    return path.lower().endswith(PACK_EXTENSION) and os.path.isfile(path)
+
+
+def write_pack(folder_path, pack_path, root_node=None):
+    """把文件夹（只含目录树中显示的文件）写成一个打包文件，返回打包的文件数
+
+    文件内容依次存放在文件头之后，最后是压缩的索引：每个目录的目录项，以及每个文件的
+    (偏移, 长度, mtime)。先写入临时文件再替换，root_node 为已有的目录快照时不再扫描。
+    """
+    if root_node is None:
+        root_node = scan_tree(folder_path)
+    dirs = {}
+    files = {}
+    tmp_path = pack_path + '.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(HEADER.pack(PACK_MAGIC, 0, 0))
+        pending = [('', root_node)]
+        while pending:
+            rel_dir, node = pending.pop()
+            dirs[rel_dir] = [[name, is_dir] for name, is_dir in node.entries]
+            for name, is_dir in node.entries:
+                rel_path = rel_dir + '/' + name if rel_dir else name
+                if is_dir:
+                    child = node.children.get(name)
+                    if child is not None:
+                        pending.append((rel_path, child))
+                    continue
+                full_path = os.path.join(folder_path, *rel_path.split('/'))
+                offset = out.tell()
+                with open(full_path, 'rb') as f:
+                    mtime = os.fstat(f.fileno()).st_mtime
+                    while True:
+                        chunk = f.read(COPY_CHUNK)
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                files[rel_path] = [offset, out.tell() - offset, mtime]
+        index = zlib.compress(json.dumps({'dirs': dirs, 'files': files}, ensure_ascii=False).encode('utf-8'))
+        index_offset = out.tell()
+        out.write(index)
+        out.seek(0)
+        out.write(HEADER.pack(PACK_MAGIC, index_offset, len(index)))
+    os.replace(tmp_path, pack_path)
+    return len(files)
+
+
+class PackReader:
+    """只读地打开打包文件，文件内容通过内存映射读取
+
+    整个打包文件只打开一次，读取文件时不再产生文件系统调用。路径使用 / 分隔的相对路径。
+    """
+
+    def __init__(self, pack_path):
+        self.pack_path = pack_path
+        with open(pack_path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:  # 空文件无法映射
+                raise PackError(f'不是打包文件: {pack_path}') from e
+        try:
+            magic, index_offset, index_size = HEADER.unpack_from(self._mmap, 0)
+            if magic != PACK_MAGIC:
+                raise PackError(f'不是打包文件: {pack_path}')
+            index = json.loads(zlib.decompress(self._mmap[index_offset:index_offset + index_size]))
+        except (struct.error, zlib.error, ValueError) as e:
+            self._mmap.close()
+            raise PackError(f'打包文件已损坏: {pack_path}') from e
+        except PackError:
+            self._mmap.close()
+            raise
+        self.dirs = {rel: [tuple(entry) for entry in entries] for rel, entries in index['dirs'].items()}
+        self.files = {rel: tuple(entry) for rel, entry in index['files'].items()}
+
+    def close(self):
+        self._mmap.close()
+
+    def _entry(self, rel_path):
+        entry = self.files.get(rel_path)
+        if entry is None:
+            raise FileNotFoundError(f'打包文件中没有该文件: {rel_path}')
+        return entry
+
+    def read_bytes(self, rel_path):
+        offset, size, mtime = self._entry(rel_path)
+        return self._mmap[offset:offset + size]
+
+    def read_lines(self, rel_path, offsets):
+        """返回文件中从各个字节偏移开始的一行（不含 \\n）
+
+        直接在内存映射中该文件的范围内查找换行，只复制这些行，不复制整个文件。
+        """
+        start, size, mtime = self._entry(rel_path)
+        end = start + size
+        lines = []
+        for offset in offsets:
+            line_start = start + offset
+            line_end = self._mmap.find(b'\n', line_start, end)
+            lines.append(self._mmap[line_start:line_end if line_end != -1 else end])
+        return lines
+
+    def read_text(self, rel_path):
+        return self.read_bytes(rel_path).decode('utf-8')
+
+    def snapshot(self):
+        """按索引构造目录快照（doc_tree.DirNode），mtime 均为 None"""
+        def build(rel_dir):
+            entries = self.dirs.get(rel_dir, [])
+            children = {}
+            for name, is_dir in entries:
+                if is_dir:
+                    children[name] = build(rel_dir + '/' + name if rel_dir else name)
+            return DirNode(None, entries, children)
+        return build('')
+
+
+class PackSearchIndex(SearchIndex):
+    """打包文件的全文索引，直接从内存映射中读取文件内容"""
+
+    def __init__(self, reader, index_path=None):
+        super().__init__(reader.pack_path, index_path)
+        self.reader = reader
+
+    def _rel(self, full_path):
+        return os.path.relpath(full_path, self.folder_path).replace(os.sep, '/')
+
+    def scan(self):
+        return {rel.replace('/', os.sep): (entry[2], entry[1])
+                for rel, entry in self.reader.files.items() if is_text_file(rel)}
+
+    def stat_file(self, rel_path):
+        rel = rel_path.replace(os.sep, '/')
+        entry = self.reader.files.get(rel)
+        if entry is None or not is_text_file(rel):
+            return None
+        return entry[2], entry[1]
+
+    def index_files(self, changed, found, max_workers=None):
+        # 内容已在内存映射中，读取没有额外开销，不需要进程池
+        results = (index_bytes(self.reader.read_bytes(rel.replace(os.sep, '/'))) for rel in changed)
+        self._apply_results(changed, found, results)
+
+    def read_lines(self, full_path, offsets):
+        return [_decode_line(line) for line in self.reader.read_lines(self._rel(full_path), offsets)]
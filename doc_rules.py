@@ -0,0 +1,183 @@
+import os
+import re
+import hashlib
+
+from doc_common import SUPPORTED_EXTENSIONS, TRASH_DIR_NAME, cache_dir, is_text_file
+
+# 过滤规则保存在该文件夹的本地缓存目录中，不往共享文件夹里写东西
+RULES_FILE_NAME = 'rules.txt'
+
+DEFAULT_RULES = '\n'.join(
+    ['# 以 + 开头的是包含规则：只显示匹配的文件（没有包含规则时显示所有文件）']
+    + ['+*' + ext for ext in SUPPORTED_EXTENSIONS]
+    + ['',
+       '# 其余是忽略规则（与 .gitignore 相同）：以 / 结尾只匹配目录，含 / 时相对于打开的文件夹，',
+       '# ** 匹配任意层目录，以 ! 开头表示重新包含。被忽略的目录不会被读取。',
+       '.git/',
+       '.svn/',
+       '.hg/',
+       '__pycache__/',
+       'node_modules/',
+       'build/',
+       'dist/',
+       '~$*',
+       ]) + '\n'
+
+
+def _glob_to_regex(pattern):
+    """把 gitignore 风格的通配符转换为正则表达式（不含锚定）"""
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+        elif c == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif c == '?':
+            parts.append('[^/]')
+            i += 1
+        elif c == '[':
+            end = pattern.find(']', i + 2)
+            if end == -1:
+                parts.append(re.escape(c))
+                i += 1
+                continue
+            body = pattern[i + 1:end]
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            parts.append('[' + body.replace('\\', '\\\\') + ']')
+            i = end + 1
+        else:
+            parts.append(re.escape(c))
+            i += 1
+    return ''.join(parts)
+
+
+def _rule_regex(pattern):
+    """单条规则的正则表达式，匹配的对象是 相对路径（目录末尾加 /）"""
+    dir_only = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    anchored = '/' in pattern
+    body = _glob_to_regex(pattern.lstrip('/'))
+    prefix = '' if anchored else '(?:.*/)?'
+    suffix = '/' if dir_only else '/?'
+    return prefix + body + suffix
+
+
+class RuleSet:
+    """编译后的包含/忽略规则
+
+    所有忽略规则合并为一个正则表达式：按倒序排列成分支，fullmatch 时最先匹配的分支
+    就是最后一条匹配的规则，与 .gitignore 的“后面的规则优先”一致。
+    包含规则只作用于文件，同样合并为一个正则表达式。
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        ignore, negate, include = [], [], []
+        for line in text.splitlines():
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('+'):
+                include.append(_rule_regex(line[1:].strip()))
+            elif line.startswith('!'):
+                ignore.append(_rule_regex(line[1:].strip()))
+                negate.append(True)
+            else:
+                ignore.append(_rule_regex(line))
+                negate.append(False)
+
+        branches = []
+        self._negate = {}
+        for index in range(len(ignore) - 1, -1, -1):
+            name = f'r{index}'
+            branches.append(f'(?P<{name}>{ignore[index]})')
+            self._negate[name] = negate[index]
+        self._ignore_re = re.compile('|'.join(branches), re.IGNORECASE) if branches else None
+        self._include_re = re.compile('|'.join(include), re.IGNORECASE) if include else None
+
+    def ignored(self, rel_path, is_dir):
+        """rel_path 为 / 分隔的相对路径，判断该目录项是否被忽略"""
+        if is_dir and rel_path.rsplit('/', 1)[-1] == TRASH_DIR_NAME:
+            return True  # 回收站目录始终不显示
+        if self._ignore_re is None:
+            return False
+        match = self._ignore_re.fullmatch(rel_path + '/' if is_dir else rel_path)
+        return match is not None and not self._negate[match.lastgroup]
+
+    def accepts(self, rel_path, is_dir):
+        """判断该目录项是否显示在目录树中"""
+        if self.ignored(rel_path, is_dir):
+            return False
+        if is_dir or self._include_re is None:
+            return True
+        return self._include_re.fullmatch(rel_path) is not None
+
+    def is_text(self, rel_path):
+        """判断文件是否按文本方式读取、自动保存和建立索引
+
+        除了常见的文本类型，被包含规则显式列出的文件（Excel文件除外）也按文本处理。
+        """
+        if is_text_file(rel_path):
+            return True
+        if self._include_re is None or rel_path.lower().endswith('.xlsx'):
+            return False
+        return self._include_re.fullmatch(rel_path) is not None
+
+
+class ScanStats:
+    """一次扫描读取和跳过的目录项统计"""
+
+    def __init__(self):
+        self.dirs_read = 0
+        self.read_seconds = 0.0
+        self.dirs_skipped = 0     # 被忽略、没有读取的目录
+        self.entries_skipped = 0  # 被忽略或不匹配包含规则的文件
+
+    def estimated_saving(self):
+        """按平均每个目录的读取时间估计跳过的目录节省的秒数（被跳过目录的子目录未计入）"""
+        if not self.dirs_read:
+            return 0.0
+        return self.read_seconds / self.dirs_read * self.dirs_skipped
+
+    def summary(self):
+        return (f'跳过 {self.entries_skipped} 个文件和 {self.dirs_skipped} 个目录，'
+                f'约节省 {self.estimated_saving() * 1000:.0f} 毫秒')
+
+
+def rules_path(folder_path):
+    return os.path.join(cache_dir(folder_path), RULES_FILE_NAME)
+
+
+def load_rules(folder_path):
+    """读取文件夹的过滤规则，没有保存过或无法解析时使用默认规则
+
+    规则按打开的文件夹保存，只对该文件夹有效；单独打开它的子文件夹时使用子文件夹自己的规则。
+    """
+    try:
+        with open(rules_path(folder_path), 'r', encoding='utf-8') as f:
+            return RuleSet(f.read())
+    except (OSError, re.error):
+        return RuleSet(DEFAULT_RULES)
+
+
+def save_rules(folder_path, text):
+    """先编译规则（有错误时抛出 re.error），再保存到文件，返回 RuleSet"""
+    rules = RuleSet(text)
+    path = rules_path(folder_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return rules
+
+
+DEFAULT_RULE_SET = RuleSet(DEFAULT_RULES)
@@ -0,0 +1,326 @@
+import os
+import re
+import stat
+import pickle
+import bisect
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from doc_common import cache_dir
+from doc_rules import DEFAULT_RULE_SET
+
+# 索引文件格式版本，结构变化时递增，旧索引会被丢弃重建
+INDEX_VERSION = 2
+
+# 变化的文件少于该数量时直接在当前进程中建立索引，省去进程池的启动开销
+POOL_THRESHOLD = 32
+
+# 少于该长度的查询词只匹配完整的词元，不按前缀展开
+MIN_PREFIX_LENGTH = 3
+# 一个查询词最多按前缀展开为多少个词元
+MAX_PREFIX_TOKENS = 64
+
+# 英文/数字按整词切分，中文按单字切分
+TOKEN_RE = re.compile(r'[A-Za-z0-9_]+|[一-鿿]')
+
+
+def tokenize(text):
+    """把文本切分为小写的词元列表"""
+    return [t.lower() for t in TOKEN_RE.findall(text)]
+
+
+def index_file(path):
+    """为单个文件建立索引（在子进程中运行），见 index_bytes"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    return index_bytes(data)
+
+
+def index_bytes(data):
+    """为文件内容建立 (词元 -> 行号列表, 各行起始字节偏移)
+
+    按 \\n 分行（与编辑器的行号一致），每行以UTF-8解码，无法解码的字节用替换字符代替。
+    保存行偏移后，显示搜索结果时只需定位读取匹配的行，不必读取整个文件。
+    """
+    postings = {}
+    offsets = array('I' if len(data) < 2 ** 32 else 'Q')
+    offset = 0
+    for line_no, line in enumerate(data.split(b'\n'), start=1):
+        offsets.append(offset)
+        offset += len(line) + 1
+        for token in set(tokenize(line.decode('utf-8', errors='replace'))):
+            postings.setdefault(token, []).append(line_no)
+    return postings, offsets
+
+
+def _decode_line(line):
+    return line.rstrip(b'\r').decode('utf-8', errors='replace')
+
+
+class SearchResult:
+    def __init__(self, path, line_no, snippet):
+        self.path = path
+        self.line_no = line_no
+        self.snippet = snippet
+
+
+class SearchIndex:
+    """文件夹全文搜索的持久化倒排索引
+
+    按 (mtime, size) 判断文件是否变化，只对新增或修改过的文件重新建立索引。
+    只索引过滤规则（doc_rules）接受并按文本处理的文件，被忽略的目录不会被遍历。
+    已知哪些文件变化时（例如刚保存的文件）用 update_paths 只更新这些文件，不遍历文件夹。
+    dirty 表示索引有尚未写入缓存文件的修改。
+    """
+
+    def __init__(self, folder_path, index_path=None, rules=DEFAULT_RULE_SET):
+        self.folder_path = folder_path
+        self.index_path = index_path or os.path.join(cache_dir(folder_path), 'search.idx')
+        self.rules = rules
+        self.files = {}        # 相对路径 -> (mtime, size, 文件编号)
+        self.paths = {}        # 文件编号 -> 相对路径
+        self.file_tokens = {}  # 文件编号 -> 该文件包含的词元
+        self.postings = {}     # 词元 -> {文件编号: [行号, ...]}
+        self.line_offsets = {}  # 文件编号 -> 各行起始字节偏移
+        self.next_id = 0
+        self.dirty = False
+        self._sorted_tokens = None
+
+    def load(self):
+        """从缓存文件加载索引，失败时保持为空索引"""
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return False
+        if data.get('version') != INDEX_VERSION or data.get('folder') != self.folder_path:
+            return False
+        self.files = data['files']
+        self.paths = data['paths']
+        self.file_tokens = data['file_tokens']
+        self.postings = data['postings']
+        self.line_offsets = data['line_offsets']
+        self.next_id = data['next_id']
+        self.dirty = False
+        self._sorted_tokens = None
+        return True
+
+    def save(self):
+        """把索引写入缓存文件（先写临时文件再替换，避免留下半个文件）"""
+        data = {
+            'version': INDEX_VERSION,
+            'folder': self.folder_path,
+            'files': self.files,
+            'paths': self.paths,
+            'file_tokens': self.file_tokens,
+            'postings': self.postings,
+            'line_offsets': self.line_offsets,
+            'next_id': self.next_id,
+        }
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+
+    def scan(self):
+        """遍历文件夹，返回 相对路径 -> (mtime, size)"""
+        found = {}
+        for dir_path, dir_names, file_names in os.walk(self.folder_path):
+            rel_dir = os.path.relpath(dir_path, self.folder_path).replace(os.sep, '/')
+            prefix = '' if rel_dir == '.' else rel_dir + '/'
+            dir_names[:] = [name for name in dir_names if not self.rules.ignored(prefix + name, True)]
+            for name in file_names:
+                if not self.rules.accepts(prefix + name, False) or not self.rules.is_text(prefix + name):
+                    continue
+                full_path = os.path.join(dir_path, name)
+                try:
+                    st = os.stat(full_path)
+                except OSError:
+                    continue
+                rel_path = os.path.relpath(full_path, self.folder_path)
+                found[rel_path] = (st.st_mtime, st.st_size)
+        return found
+
+    def stat_file(self, rel_path):
+        """返回单个文件的 (mtime, size)，文件不存在或按过滤规则不应索引时返回 None（与 scan 的判断相同）"""
+        rel = rel_path.replace(os.sep, '/')
+        parts = rel.split('/')
+        for i in range(1, len(parts)):
+            if self.rules.ignored('/'.join(parts[:i]), True):
+                return None
+        if not self.rules.accepts(rel, False) or not self.rules.is_text(rel):
+            return None
+        try:
+            st = os.stat(os.path.join(self.folder_path, rel_path))
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        return st.st_mtime, st.st_size
+
+    def update_paths(self, full_paths):
+        """只更新指定的文件（新增、修改或已删除），返回 (重新索引的文件数, 移除的文件数)"""
+        found = {}
+        removed = 0
+        for full_path in full_paths:
+            rel = os.path.relpath(full_path, self.folder_path)
+            if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+                continue
+            file_stat = self.stat_file(rel)
+            if file_stat is None:
+                if rel in self.files:
+                    self._remove_file(rel)
+                    removed += 1
+            elif rel not in self.files or self.files[rel][:2] != file_stat:
+                found[rel] = file_stat
+        if found:
+            self.index_files(list(found), found)
+        if found or removed:
+            self._sorted_tokens = None
+            self.dirty = True
+        return len(found), removed
+
+    def update(self, max_workers=None):
+        """增量更新索引，返回 (重新索引的文件数, 移除的文件数)"""
+        found = self.scan()
+
+        removed = [rel for rel in self.files if rel not in found]
+        for rel in removed:
+            self._remove_file(rel)
+
+        changed = [rel for rel, file_stat in found.items()
+                   if rel not in self.files or self.files[rel][:2] != file_stat]
+        if changed:
+            self.index_files(changed, found, max_workers)
+
+        if changed or removed:
+            self._sorted_tokens = None
+            self.dirty = True
+        return len(changed), len(removed)
+
+    def index_files(self, changed, found, max_workers=None):
+        """为变化了的文件（相对路径列表）建立索引"""
+        full_paths = [os.path.join(self.folder_path, rel) for rel in changed]
+        if len(changed) < POOL_THRESHOLD:
+            results = map(index_file, full_paths)
+            self._apply_results(changed, found, results)
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                results = executor.map(index_file, full_paths, chunksize=16)
+                self._apply_results(changed, found, results)
+
+    def read_lines(self, full_path, offsets):
+        """按字节偏移读取搜索结果所在的行"""
+        lines = []
+        with open(full_path, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                lines.append(_decode_line(f.readline()))
+        return lines
+
+    def _apply_results(self, changed, found, results):
+        for rel, result in zip(changed, results):
+            self._remove_file(rel)
+            if result is None:
+                continue
+            postings, offsets = result
+            file_id = self.next_id
+            self.next_id += 1
+            mtime, size = found[rel]
+            self.files[rel] = (mtime, size, file_id)
+            self.paths[file_id] = rel
+            self.file_tokens[file_id] = tuple(postings)
+            self.line_offsets[file_id] = offsets
+            for token, lines in postings.items():
+                self.postings.setdefault(token, {})[file_id] = lines
+
+    def _remove_file(self, rel):
+        entry = self.files.pop(rel, None)
+        if entry is None:
+            return
+        file_id = entry[2]
+        self.paths.pop(file_id, None)
+        self.line_offsets.pop(file_id, None)
+        for token in self.file_tokens.pop(file_id, ()):
+            files = self.postings.get(token)
+            if files is not None:
+                files.pop(file_id, None)
+                if not files:
+                    del self.postings[token]
+
+    def _tokens_with_prefix(self, prefix, limit):
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self.postings)
+        tokens = self._sorted_tokens
+        start = bisect.bisect_left(tokens, prefix)
+        result = []
+        for i in range(start, min(start + limit, len(tokens))):
+            if not tokens[i].startswith(prefix):
+                break
+            result.append(tokens[i])
+        return result
+
+    def _term_files(self, term):
+        """返回 文件编号 -> 行号 的映射，包含与查询词匹配的词元的行
+
+        短于 MIN_PREFIX_LENGTH 的词只匹配完整的词元，其余按前缀展开，最多 MAX_PREFIX_TOKENS 个词元。
+        """
+        if len(term) < MIN_PREFIX_LENGTH:
+            tokens = [term] if term in self.postings else []
+        else:
+            tokens = self._tokens_with_prefix(term, MAX_PREFIX_TOKENS)
+        if len(tokens) == 1:
+            return self.postings[tokens[0]]
+        files = {}
+        for token in tokens:
+            for file_id, lines in self.postings[token].items():
+                files.setdefault(file_id, set()).update(lines)
+        return files
+
+    def search(self, query, limit=200):
+        """搜索同时包含查询中所有词的行，返回 SearchResult 列表
+
+        先按文件求交集，再按路径顺序逐个文件求行号交集，结果够 limit 条后不再处理其余文件；
+        匹配行的内容按索引中的行偏移直接读取。
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        # 先处理匹配文件最少的词，缩小交集
+        term_files = sorted((self._term_files(t) for t in set(terms)), key=len)
+        file_ids = set(term_files[0])
+        for other in term_files[1:]:
+            if not file_ids:
+                break
+            file_ids.intersection_update(other)
+
+        results = []
+        needle = query.strip().lower()
+        for file_id in sorted(file_ids, key=lambda fid: self.paths[fid]):
+            line_nos = set(term_files[0][file_id])
+            for other in term_files[1:]:
+                line_nos.intersection_update(other[file_id])
+            if not line_nos:
+                continue
+            line_nos = sorted(line_nos)
+            full_path = os.path.join(self.folder_path, self.paths[file_id])
+            offsets = self.line_offsets[file_id]
+            try:
+                lines = self.read_lines(full_path, [offsets[n - 1] for n in line_nos])
+            except OSError:
+                continue
+            exact, partial = [], []
+            for line_no, line in zip(line_nos, lines):
+                snippet = line.strip()
+                result = SearchResult(full_path, line_no, snippet[:200])
+                # 完整包含查询字符串的行排在前面
+                (exact if needle in snippet.lower() else partial).append(result)
+            results.extend(exact + partial)
+            if len(results) >= limit:
+                break
+        return results[:limit]
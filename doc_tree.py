@@ -0,0 +1,203 @@
+import os
+import time
+import pickle
+
+from doc_common import cache_dir
+from doc_rules import DEFAULT_RULE_SET
+
+# 快照文件格式版本，结构变化时递增，旧快照会被丢弃
+SNAPSHOT_VERSION = 2
+
+
+class DirNode:
+    """目录快照中的一个目录
+
+    entries 按列出顺序保存 (名称, 是否为目录)，只包含过滤规则接受的子目录和文件；
+    children 保存子目录名称到 DirNode 的映射。
+    """
+    __slots__ = ('mtime', 'entries', 'children')
+
+    def __init__(self, mtime, entries, children):
+        self.mtime = mtime
+        self.entries = entries
+        self.children = children
+
+    def __getstate__(self):
+        return self.mtime, self.entries, self.children
+
+    def __setstate__(self, state):
+        self.mtime, self.entries, self.children = state
+
+    def count(self):
+        """子树中的目录项总数"""
+        return len(self.entries) + sum(child.count() for child in self.children.values())
+
+
+def _dir_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _child_rel(rel_dir, name):
+    return rel_dir + '/' + name if rel_dir else name
+
+
+def _list_dir(path, rules, rel_dir, stats):
+    """列出一个目录，返回过滤规则接受的 (名称, 是否为目录) 列表
+
+    rel_dir 为该目录相对于打开的文件夹的路径（/ 分隔）。被忽略的子目录不会被读取。
+    """
+    start = time.perf_counter()
+    entries = []
+    skipped_dirs = skipped_files = 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if rules.accepts(_child_rel(rel_dir, entry.name), is_dir):
+                    entries.append((entry.name, is_dir))
+                elif is_dir:
+                    skipped_dirs += 1
+                else:
+                    skipped_files += 1
+    except (PermissionError, FileNotFoundError, NotADirectoryError):
+        pass  # 忽略无权限访问的目录
+    if stats is not None:
+        stats.dirs_read += 1
+        stats.read_seconds += time.perf_counter() - start
+        stats.dirs_skipped += skipped_dirs
+        stats.entries_skipped += skipped_files
+    return entries
+
+
+def scan_tree(path, rules=DEFAULT_RULE_SET, stats=None, rel_dir=''):
+    """完整扫描一个目录，返回其 DirNode，stats（doc_rules.ScanStats）用于统计跳过的目录项"""
+    mtime = _dir_mtime(path)
+    entries = _list_dir(path, rules, rel_dir, stats)
+    children = {name: scan_tree(os.path.join(path, name), rules, stats, _child_rel(rel_dir, name))
+                for name, is_dir in entries if is_dir}
+    return DirNode(mtime, entries, children)
+
+
+def refresh_tree(path, node, changed, rules=DEFAULT_RULE_SET, stats=None, rel_dir=''):
+    """按目录mtime检查快照，只重新列出mtime变化了的目录
+
+    不修改原有节点：子树有变化时返回新节点，否则返回原节点。
+    变化了的目录路径追加到 changed 列表中。
+    """
+    mtime = _dir_mtime(path)
+    if mtime != node.mtime:
+        entries = _list_dir(path, rules, rel_dir, stats)
+        changed.append(path)
+    else:
+        entries = node.entries
+
+    children = {}
+    modified = entries is not node.entries
+    for name, is_dir in entries:
+        if not is_dir:
+            continue
+        child_path = os.path.join(path, name)
+        child_rel = _child_rel(rel_dir, name)
+        old_child = node.children.get(name)
+        if old_child is None:
+            child = scan_tree(child_path, rules, stats, child_rel)
+        else:
+            child = refresh_tree(child_path, old_child, changed, rules, stats, child_rel)
+        modified = modified or child is not old_child
+        children[name] = child
+
+    if not modified:
+        return node
+    return DirNode(mtime, entries, children)
+
+
+def iter_files(node, prefix=''):
+    """按快照列出子树中所有文件的相对路径"""
+    for name, is_dir in node.entries:
+        rel_path = os.path.join(prefix, name) if prefix else name
+        if not is_dir:
+            yield rel_path
+        else:
+            child = node.children.get(name)
+            if child is not None:
+                yield from iter_files(child, rel_path)
+
+
+def find_node(root_node, root_path, path):
+    """返回 path 对应的 DirNode，不在快照中时返回 None"""
+    if path == root_path:
+        return root_node
+    if not path.startswith(root_path + os.sep):
+        return None
+    node = root_node
+    for part in os.path.relpath(path, root_path).split(os.sep):
+        node = node.children.get(part)
+        if node is None:
+            return None
+    return node
+
+
+def rescan_path(root_node, root_path, path, rules=DEFAULT_RULE_SET):
+    """重新列出快照中的某个目录（其子目录沿用已有快照），返回新的根节点"""
+    if path != root_path and not path.startswith(root_path + os.sep):
+        return root_node
+    parts = [] if path == root_path else os.path.relpath(path, root_path).split(os.sep)
+
+    def rebuild(node, node_path, rel_dir, remaining):
+        if not remaining:
+            entries = _list_dir(node_path, rules, rel_dir, None)
+            old_children = node.children if node is not None else {}
+            children = {}
+            for name, is_dir in entries:
+                if is_dir:
+                    child = old_children.get(name)
+                    if child is None:
+                        child = scan_tree(os.path.join(node_path, name), rules, None, _child_rel(rel_dir, name))
+                    children[name] = child
+            return DirNode(_dir_mtime(node_path), entries, children)
+        if node is None:
+            return None
+        child = node.children.get(remaining[0])
+        new_child = rebuild(child, os.path.join(node_path, remaining[0]), _child_rel(rel_dir, remaining[0]),
+                            remaining[1:])
+        if new_child is None:
+            return node
+        children = dict(node.children)
+        children[remaining[0]] = new_child
+        return DirNode(node.mtime, node.entries, children)
+
+    return rebuild(root_node, root_path, '', parts) or root_node
+
+
+def snapshot_path(folder_path):
+    return os.path.join(cache_dir(folder_path), 'tree.snapshot')
+
+
+def load_snapshot(folder_path, rules=DEFAULT_RULE_SET):
+    """加载文件夹的目录快照，不存在、已失效或过滤规则已改变时返回 None"""
+    try:
+        with open(snapshot_path(folder_path), 'rb') as f:
+            data = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    if data.get('version') != SNAPSHOT_VERSION or data.get('folder') != folder_path:
+        return None
+    if data.get('rules') != rules.digest:
+        return None
+    return data['root']
+
+
+def save_snapshot(folder_path, root_node, rules=DEFAULT_RULE_SET):
+    """保存目录快照（先写临时文件再替换）"""
+    path = snapshot_path(folder_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'version': SNAPSHOT_VERSION, 'folder': folder_path, 'rules': rules.digest, 'root': root_node},
+                    f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
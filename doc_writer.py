@@ -0,0 +1,111 @@
+import os
+import time
+import queue
+import shutil
+import tempfile
+import threading
+
+
+def atomic_write_text(path, content, encoding='utf-8'):
+    """以文本方式原子地写入文件"""
+    atomic_write_bytes(path, content.encode(encoding))
+
+
+def atomic_write_bytes(path, data):
+    """先写入同目录下的临时文件再替换原文件，保证文件不会只写了一半"""
+    dir_name, base_name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + base_name + '.', suffix='.tmp', dir=dir_name or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class WriteTask:
+    """提交给 BackgroundWriter 的自定义写入（例如目录快照）
+
+    写入线程直接调用 func()，不经过 before_write 和 write；完成后调用 on_done(路径, 耗时毫秒, 异常或None)
+    （如果提供），而不是写入器的 on_done。
+    """
+
+    def __init__(self, func, on_done=None):
+        self.func = func
+        self.on_done = on_done
+
+
+class BackgroundWriter:
+    """在后台线程中保存文件
+
+    同一文件在写入前被多次提交时只写最后一次的内容。每次写入前在写入线程中调用
+    before_write(路径, 内容)（如果提供），然后用 write(路径, 内容) 写入，
+    写入完成后调用 on_done(路径, 耗时毫秒, 异常或None)。内容为 WriteTask 时按该任务写入。
+    """
+
+    def __init__(self, on_done, before_write=None, write=atomic_write_text):
+        self.on_done = on_done
+        self.before_write = before_write
+        self.write = write
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._writing = None  # 正在写入的文件
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, path, content):
+        with self._lock:
+            already_queued = path in self._pending
+            self._pending[path] = content
+        if not already_queued:
+            self._queue.put(path)
+
+    def flush(self):
+        """等待所有已提交的写入完成"""
+        self._queue.join()
+
+    def wait(self, path):
+        """等待该文件已提交的写入完成（没有时立即返回）"""
+        with self._idle:
+            while path in self._pending or self._writing == path:
+                self._idle.wait()
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            with self._lock:
+                content = self._pending.pop(path)
+                self._writing = path
+            start = time.perf_counter()
+            error = None
+            task = content if isinstance(content, WriteTask) else None
+            try:
+                if task is not None:
+                    task.func()
+                else:
+                    if self.before_write is not None:
+                        self.before_write(path, content)
+                    self.write(path, content)
+            except Exception as e:
+                error = e
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._idle:
+                self._writing = None
+                self._idle.notify_all()
+            try:
+                if task is None:
+                    self.on_done(path, elapsed, error)
+                elif task.on_done is not None:
+                    task.on_done(path, elapsed, error)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,338 @@
+import re
+import zipfile
+import tempfile
+import posixpath
+from array import array
+import xml.etree.ElementTree as ET
+from xml.parsers import expat
+from xml.sax.saxutils import escape, quoteattr
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+_TEXT = f'{{{NS_MAIN}}}t'
+_SHARED_ITEM = f'{{{NS_MAIN}}}si'
+
+# 每次从压缩包中读取并解析的字节数
+CHUNK_SIZE = 64 * 1024
+
+# 共享字符串的总长度超过该字符数后改为保存在临时文件中
+SHARED_STRINGS_MEMORY = 8 * 1024 * 1024
+
+# 单元格类型：数字、字符串、布尔值
+NUMBER, STRING, BOOLEAN = 'n', 's', 'b'
+
+# 单元格中出现这些字符时无法按制表符分隔的文本编辑
+SEPARATORS = ('\t', '\n', '\r')
+
+_CELL_REF_RE = re.compile(r'([A-Z]+)')
+# 带前导零的数字（如编号 007）按字符串保存，避免丢失前导零
+_NUMBER_RE = re.compile(r'^-?(0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?$')
+
+
+def column_index(cell_ref):
+    """把单元格引用（如 'C5'）转换为从0开始的列号"""
+    match = _CELL_REF_RE.match(cell_ref)
+    index = 0
+    for ch in match.group(1):
+        index = index * 26 + (ord(ch) - ord('A') + 1)
+    return index - 1
+
+
+def column_letter(index):
+    """把从0开始的列号转换为列字母（如 2 -> 'C'）"""
+    letters = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return letters
+
+
+class SharedStrings:
+    """共享字符串表
+
+    总长度不超过 SHARED_STRINGS_MEMORY 时保存在内存中，超过后全部写入临时文件，
+    内存中只保留每个字符串的结束偏移（每项8字节），按编号读取时定位读取。
+    """
+
+    def __init__(self):
+        self._strings = []
+        self._size = 0
+        self._file = None
+        self._offsets = None
+
+    def __len__(self):
+        return len(self._strings) if self._file is None else len(self._offsets) - 1
+
+    def append(self, text):
+        if self._file is not None:
+            self._write(text)
+            return
+        self._strings.append(text)
+        self._size += len(text)
+        if self._size > SHARED_STRINGS_MEMORY:
+            self._file = tempfile.TemporaryFile()
+            self._offsets = array('Q', [0])
+            strings, self._strings = self._strings, None
+            for text in strings:
+                self._write(text)
+
+    def _write(self, text):
+        data = text.encode('utf-8')
+        self._file.seek(self._offsets[-1])
+        self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+    def __getitem__(self, index):
+        if self._file is None:
+            return self._strings[index]
+        start = self._offsets[index]
+        self._file.seek(start)
+        return self._file.read(self._offsets[index + 1] - start).decode('utf-8')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class XlsxReader:
+    """流式读取xlsx文件的第一个工作表
+
+    增量解析共享字符串和工作表XML，不在内存中保留整个工作表，
+    即使工作表有上百万行，内存占用也保持稳定；共享字符串较多时保存在临时文件中（见 SharedStrings）。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path)
+        self.shared_strings = self._read_shared_strings()
+        self.sheet_name = self._first_sheet_part()
+
+    def close(self):
+        self.shared_strings.close()
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _read_shared_strings(self):
+        strings = SharedStrings()
+        try:
+            stream = self._zip.open('xl/sharedStrings.xml')
+        except KeyError:
+            return strings
+        with stream:
+            events = ET.iterparse(stream, events=('start', 'end'))
+            _, root = next(events)
+            for event, elem in events:
+                if event == 'end' and elem.tag == _SHARED_ITEM:
+                    strings.append(''.join(t.text or '' for t in elem.iter(_TEXT)))
+                    # 清除已处理的项，根元素下不保留任何子元素
+                    root.clear()
+        return strings
+
+    def _first_sheet_part(self):
+        """根据 workbook.xml 和其关系文件找到第一个工作表的路径"""
+        default = 'xl/worksheets/sheet1.xml'
+        try:
+            workbook = ET.fromstring(self._zip.read('xl/workbook.xml'))
+            rels = ET.fromstring(self._zip.read('xl/_rels/workbook.xml.rels'))
+        except KeyError:
+            return default
+        sheet = workbook.find(f'{{{NS_MAIN}}}sheets/{{{NS_MAIN}}}sheet')
+        if sheet is None:
+            return default
+        rel_id = sheet.get(f'{{{NS_REL}}}id')
+        for rel in rels.iter(f'{{{NS_PKG_REL}}}Relationship'):
+            if rel.get('Id') == rel_id:
+                target = rel.get('Target')
+                if target.startswith('/'):
+                    return target.lstrip('/')
+                return posixpath.normpath(posixpath.join('xl', target))
+        return default
+
+    def iter_rows(self, typed=False):
+        """逐行产出单元格文本列表，空行和空单元格按位置补齐
+
+        typed 为真时每个单元格为 (文本, 类型)，类型为 NUMBER、STRING 或 BOOLEAN，
+        保存时可以按原来的类型写回（见 write_xlsx）。
+        使用 expat 分块解析工作表XML，每块解析出的行产出后即被丢弃，内存占用有上限。
+        """
+        padding = ('', STRING) if typed else ''
+        parser = expat.ParserCreate(namespace_separator=' ')
+        parser.buffer_text = True
+        rows = []
+        state = {'row': None, 'next_row': 1, 'col': 0, 'type': None, 'text': None, 'in_value': False}
+
+        def start(name, attrs):
+            tag = name.rpartition(' ')[2]
+            if tag == 'row':
+                row_number = int(attrs.get('r', state['next_row']))
+                while state['next_row'] < row_number:
+                    rows.append([])
+                    state['next_row'] += 1
+                state['next_row'] = row_number + 1
+                state['row'] = []
+            elif tag == 'c':
+                ref = attrs.get('r')
+                state['col'] = column_index(ref) if ref else len(state['row'])
+                state['type'] = attrs.get('t')
+                state['text'] = []
+            elif tag in ('v', 't') and state['text'] is not None:
+                state['in_value'] = True
+
+        def end(name):
+            tag = name.rpartition(' ')[2]
+            if tag in ('v', 't'):
+                state['in_value'] = False
+            elif tag == 'c':
+                row = state['row']
+                if state['col'] > len(row):
+                    row.extend([padding] * (state['col'] - len(row)))
+                value = self._cell_value(state['type'], ''.join(state['text']))
+                row.append((value, _cell_kind(state['type'])) if typed else value)
+                state['text'] = None
+            elif tag == 'row':
+                rows.append(state['row'])
+                state['row'] = None
+
+        def chars(data):
+            if state['in_value']:
+                state['text'].append(data)
+
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        parser.CharacterDataHandler = chars
+
+        with self._zip.open(self.sheet_name) as stream:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                parser.Parse(chunk, not chunk)
+                if rows:
+                    yield from rows
+                    rows.clear()
+                if not chunk:
+                    break
+
+    def _cell_value(self, cell_type, text):
+        if cell_type == 's':
+            return self.shared_strings[int(text)] if text else ''
+        if cell_type == 'b':
+            return 'TRUE' if text == '1' else 'FALSE'
+        return text
+
+
+def _cell_kind(cell_type):
+    """工作表XML中单元格的 t 属性对应的类型"""
+    if cell_type in (None, 'n'):
+        return NUMBER
+    if cell_type == 'b':
+        return BOOLEAN
+    return STRING
+
+
+def _cell_xml(ref, cell):
+    if isinstance(cell, tuple):
+        value, kind = cell
+    else:
+        value, kind = cell, None
+    if value == '':
+        return ''
+    if kind == BOOLEAN and value in ('TRUE', 'FALSE'):
+        return f'<c r="{ref}" t="b"><v>{1 if value == "TRUE" else 0}</v></c>'
+    if kind in (None, NUMBER) and _NUMBER_RE.match(value):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{escape(value)}</t></is></c>'
+
+
+def has_separator(row):
+    """判断一行（文本或 (文本, 类型) 的列表）中是否有单元格包含制表符或换行"""
+    for cell in row:
+        value = cell[0] if isinstance(cell, tuple) else cell
+        if any(ch in value for ch in SEPARATORS):
+            return True
+    return False
+
+
+def rows_to_text(rows):
+    """把行转换为制表符分隔的文本，每行以换行结尾"""
+    return ''.join('\t'.join(cell[0] if isinstance(cell, tuple) else cell for cell in row) + '\n'
+                   for row in rows)
+
+
+def text_to_rows(text, original=()):
+    """把 rows_to_text 格式的文本转换回行，行数和列位置保持不变
+
+    original 为转换成文本前的 (文本, 类型) 行：内容未变的单元格保留原来的类型，修改过的原字符串单元格
+    仍按字符串保存，其余（包括原来为空的）单元格在写入时按内容判断是否为数字。
+    """
+    if text.endswith('\n'):
+        text = text[:-1]
+    if not text:
+        return []
+    rows = []
+    for index, line in enumerate(text.split('\n')):
+        before = original[index] if index < len(original) else ()
+        row = []
+        for col, value in enumerate(line.split('\t')):
+            cell = before[col] if col < len(before) else None
+            if cell is not None and cell[0] and (cell[0] == value or cell[1] == STRING):
+                row.append((value, cell[1]))
+            else:
+                row.append(value)
+        rows.append(row)
+    return rows
+
+
+def write_xlsx(path, rows, sheet_name='Sheet1'):
+    """把行逐行写入只含一个工作表的xlsx文件
+
+    每个单元格为文本或 (文本, 类型)（见 XlsxReader.iter_rows）：带类型的按原类型写回，
+    只有文本的按内容判断是否为数字。字符串使用内联字符串保存，不需要先收集共享字符串表。
+    path 也可以是可写的文件对象。
+    """
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>'))
+        zf.writestr('_rels/.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<Relationships xmlns="{NS_PKG_REL}">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/>'
+            '</Relationships>'))
+        zf.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<workbook xmlns="{NS_MAIN}" xmlns:r="{NS_REL}">'
+            f'<sheets><sheet name={quoteattr(sheet_name)} sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'))
+        zf.writestr('xl/_rels/workbook.xml.rels', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<Relationships xmlns="{NS_PKG_REL}">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            'Target="worksheets/sheet1.xml"/>'
+            '</Relationships>'))
+
+        with zf.open('xl/worksheets/sheet1.xml', 'w') as stream:
+            stream.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                f'<worksheet xmlns="{NS_MAIN}"><sheetData>').encode('utf-8'))
+            for row_number, row in enumerate(rows, start=1):
+                cells = ''.join(_cell_xml(f'{column_letter(col)}{row_number}', value)
+                                for col, value in enumerate(row))
+                stream.write(f'<row r="{row_number}">{cells}</row>'.encode('utf-8'))
+            stream.write(b'</sheetData></worksheet>')
@@ -1,10 +1,52 @@
+import io
 import sys
 import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
 import base64
+import time
+import re
+import hashlib
+import difflib
+import queue
+import threading
+import itertools
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from doc_common import TRASH_DIR_NAME
+from doc_cache import ContentCache
+from doc_xlsx import write_xlsx, has_separator, rows_to_text, text_to_rows
+from doc_writer import BackgroundWriter, atomic_write_bytes
+from doc_highlight import VbaHighlighter
+from doc_model import open_document_tree
+from doc_pack import write_pack, PackError, PACK_EXTENSION
+from doc_rules import save_rules, DEFAULT_RULES
+from doc_fuzzy import FuzzyFinder
+from doc_fileops import FileOperation, FileOperationQueue, list_trash, restore_from_trash
+from doc_duplicates import find_duplicates
+from doc_history import VersionStore
+
+logger = logging.getLogger(__name__)
 
 class DocMenu:
+    # 文件内容缓存的内存上限（字节）
+    CONTENT_CACHE_BYTES = 64 * 1024 * 1024
+    # 选中文件时预取的前后相邻文件数
+    PREFETCH_NEIGHBOURS = 2
+    # Excel预览首次显示的行数，以及滚动到底部时每次追加的行数
+    XLSX_PREVIEW_ROWS = 200
+    XLSX_CHUNK_ROWS = 200
+    # 停止输入多久（毫秒）后自动保存
+    AUTOSAVE_DELAY_MS = 1500
+    # 全文索引有变化后最多推迟多久（毫秒）写入缓存文件，关闭文件夹时总是写入
+    SEARCH_INDEX_SAVE_DELAY_MS = 30000
+    # 目录项总数不超过该值时，加载后自动展开所有目录
+    EXPAND_ALL_LIMIT = 2000
+    # 删除时移入打开的文件夹下的回收站（可恢复），为 False 时直接删除
+    USE_TRASH = True
+
     def __init__(self, root):
         self.root = root
         self.root.title('文档菜单')
@@ -36,7 +78,9 @@ class DocMenu:
         # 文本编辑区域
         self.text_edit = tk.Text(right_frame, wrap=tk.WORD)
         text_scrollbar = ttk.Scrollbar(right_frame, orient=tk.VERTICAL, command=self.text_edit.yview)
-        self.text_edit.configure(yscrollcommand=text_scrollbar.set)
+        self.text_edit.configure(yscrollcommand=self.on_text_scroll)
+        self.text_scrollbar = text_scrollbar
+        self.highlighter = VbaHighlighter(self.text_edit)
         
         self.text_edit.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         text_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -50,19 +94,31 @@ class DocMenu:
         
         # 添加菜单项
         file_menu.add_command(label='选择文件夹', command=self.browse_folder)
+        file_menu.add_command(label='打开打包文件', command=self.browse_pack)
+        file_menu.add_command(label='导出为打包文件...', command=self.export_pack)
         file_menu.add_command(label='新建文件', command=self.new_file, accelerator='Ctrl+N')
         file_menu.add_command(label='保存', command=self.save_current_file, accelerator='Ctrl+S')
+        file_menu.add_command(label='历史版本', command=self.open_history_window)
         file_menu.add_command(label='粘贴图片', command=self.paste_image, accelerator='Ctrl+V')
         file_menu.add_separator()
         file_menu.add_command(label='删除文件', command=self.delete_file, accelerator='Delete')
         file_menu.add_command(label='删除文件夹', command=self.delete_folder)
         file_menu.add_command(label='新建文件夹', command=self.new_folder)
+        file_menu.add_command(label='复制到...', command=self.copy_selected)
+        file_menu.add_command(label='移动到...', command=self.move_selected)
+        file_menu.add_command(label='回收站', command=self.open_trash_window)
+        file_menu.add_separator()
+        file_menu.add_command(label='在文件夹中搜索', command=self.open_search_window, accelerator='Ctrl+Shift+F')
+        file_menu.add_command(label='快速打开', command=self.open_quick_open, accelerator='Ctrl+P')
         
         # 添加视图菜单
         view_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label='视图', menu=view_menu)
         view_menu.add_command(label='展开所有', command=self.expand_all)
         view_menu.add_command(label='折叠所有', command=self.collapse_all)
+        view_menu.add_separator()
+        view_menu.add_command(label='查找重复文件', command=self.find_duplicate_files)
+        view_menu.add_command(label='过滤规则...', command=self.open_rules_window)
         
         # 添加工具栏
         toolbar = ttk.Frame(root)
@@ -71,17 +127,62 @@ class DocMenu:
         ttk.Button(toolbar, text='展开目录', command=self.expand_all).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text='折叠目录', command=self.collapse_all).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text='新建文件夹', command=self.new_folder).pack(side=tk.LEFT, padx=2)
+        self.cancel_ops_button = ttk.Button(toolbar, text='取消文件操作', command=self.cancel_file_operations, state=tk.DISABLED)
+        self.cancel_ops_button.pack(side=tk.LEFT, padx=2)
+        
+        # 状态栏
+        self.status_var = tk.StringVar()
+        ttk.Label(root, textvariable=self.status_var, anchor=tk.W).pack(side=tk.BOTTOM, fill=tk.X, padx=5)
         
         # 初始化变量
         self.current_folder = ""
         self.current_file_path = ""
+        self.search_index = None
+        self.search_window = None
+        self._search_updating = False
+        self._search_update_pending = False  # 更新期间又有文件变化，完成后需要再完整更新一次
+        self._search_pending_paths = set()  # 更新期间保存的文件，完成后只更新这些文件
+        self._search_save_job = None
+        # 索引的更新和写入都在这一个线程中依次进行，不会同时修改和保存
+        self._search_executor = ThreadPoolExecutor(max_workers=1)
+        self.content_cache = ContentCache(self.CONTENT_CACHE_BYTES)
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=2)
+        self._xlsx_reader = None
+        self._xlsx_rows = None
+        self._xlsx_loaded = []  # 已加载到编辑器中的Excel行（带单元格类型），保存时用来保留类型
+        self._xlsx_editable = True  # 已加载的单元格中没有制表符和换行，可以按文本保存
+        self.editor_path = None  # 编辑器中当前显示的文件，读取失败时为None
+        self.model = None  # 当前文件夹的文档树模型（doc_model.DocumentTree）
+        self.fuzzy_finder = None
+        self._path_index_snapshot = None
+        self.quick_open_window = None
+        self._quick_open_job = None
+        self.trash_window = None
+        self._duplicates_running = False
+        self.file_ops = FileOperationQueue(
+            lambda op: self.run_in_ui(self._on_file_operation_progress, op),
+            lambda op: self.run_in_ui(self._on_file_operation_done, op))
+        self._saved_hash = None
+        self._autosave_job = None
+        self.history = None  # 当前文件夹的历史版本存储（doc_history.VersionStore）
+        self.writer = BackgroundWriter(lambda *args: self.run_in_ui(self._on_file_written, *args),
+                                       before_write=self._record_history, write=self._write_file)
+        
+        # 后台线程通过该队列把回调交给主线程执行
+        self._ui_queue = queue.Queue()
+        self.root.after(50, self._process_ui_queue)
         
         # 绑定事件
         self.tree.bind('<<TreeviewSelect>>', self.on_tree_select)
+        self.tree.bind('<<TreeviewOpen>>', self.on_tree_open)
         self.root.bind('<Control-n>', lambda e: self.new_file())
         self.root.bind('<Control-s>', lambda e: self.save_current_file())
         self.root.bind('<Delete>', lambda e: self.delete_file())
         self.root.bind('<Control-v>', lambda e: self.paste_image())
+        self.root.bind('<Control-Shift-F>', lambda e: self.open_search_window())
+        self.root.bind('<Control-p>', lambda e: self.open_quick_open())
+        self.text_edit.bind('<<Modified>>', self.on_text_modified)
+        self.root.protocol('WM_DELETE_WINDOW', self.on_close)
         
         # 添加右键菜单
         self.tree.bind('<Button-3>', self.show_context_menu)
@@ -93,6 +194,9 @@ class DocMenu:
         self.context_menu.add_separator()
         self.context_menu.add_command(label='新建文件', command=self.new_file_from_context)
         self.context_menu.add_command(label='删除文件', command=self.delete_file_from_context)
+        self.context_menu.add_separator()
+        self.context_menu.add_command(label='复制到...', command=self.copy_selected)
+        self.context_menu.add_command(label='移动到...', command=self.move_selected)
 
     def show_context_menu(self, event):
         """显示右键菜单"""
@@ -123,6 +227,7 @@ class DocMenu:
 
     def _expand_recursive(self, item):
         """递归展开子节点"""
+        self.populate_item(item)
         self.tree.item(item, open=True)
         for child in self.tree.get_children(item):
             self._expand_recursive(child)
@@ -134,11 +239,138 @@ class DocMenu:
             self.current_folder = folder_path
             self.load_directory_tree(folder_path)
 
+    def browse_pack(self):
+        """打开打包文件，以只读方式浏览"""
+        pack_path = filedialog.askopenfilename(
+            title='打开打包文件',
+            filetypes=[('打包文件', '*' + PACK_EXTENSION), ('所有文件', '*.*')]
+        )
+        if pack_path:
+            self.current_folder = os.path.normpath(pack_path)
+            self.load_directory_tree(self.current_folder)
+
+    def export_pack(self):
+        """把当前文件夹写成一个打包文件（在后台线程中执行）"""
+        if self.model is None or self.model.read_only:
+            messagebox.showwarning("警告", "请先选择一个文件夹")
+            return
+        pack_path = filedialog.asksaveasfilename(
+            title='导出为打包文件',
+            initialfile=os.path.basename(self.current_folder) + PACK_EXTENSION,
+            defaultextension=PACK_EXTENSION,
+            filetypes=[('打包文件', '*' + PACK_EXTENSION)]
+        )
+        if not pack_path:
+            return
+        folder_path = self.current_folder
+        snapshot = self.model.snapshot
+        self.status_var.set("正在导出打包文件...")
+
+        def worker():
+            start = time.perf_counter()
+            try:
+                count = write_pack(folder_path, pack_path, snapshot)
+                message = f"已导出 {count} 个文件到 {os.path.basename(pack_path)}（{time.perf_counter() - start:.1f} 秒）"
+                self.run_in_ui(self.status_var.set, message)
+            except OSError as e:
+                self.run_in_ui(self.status_var.set, "")
+                self.run_in_ui(messagebox.showerror, "错误", f"导出打包文件失败: {str(e)}")
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def open_rules_window(self):
+        """编辑当前文件夹的包含/忽略规则，保存后重新扫描目录树"""
+        if self.model is None or self.model.read_only:
+            messagebox.showwarning("警告", "请先选择一个文件夹")
+            return
+        win = tk.Toplevel(self.root)
+        win.title(f'过滤规则 - {self.current_folder}')
+        win.geometry('600x400')
+        rules_text = tk.Text(win, wrap=tk.NONE, undo=True)
+        rules_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        rules_text.insert(tk.END, self.model.rules.text)
+        folder_path = self.current_folder
+
+        def save():
+            text = rules_text.get(1.0, 'end-1c')
+            try:
+                save_rules(folder_path, text)
+            except (OSError, re.error) as e:
+                messagebox.showerror("错误", f"无法保存过滤规则: {str(e)}", parent=win)
+                return
+            win.destroy()
+            if folder_path == self.current_folder:
+                # 规则变化后快照会失效，重新扫描；搜索索引也按新规则重建
+                self.search_index = None
+                self.load_directory_tree(folder_path)
+
+        def reset():
+            rules_text.delete(1.0, tk.END)
+            rules_text.insert(tk.END, DEFAULT_RULES)
+
+        button_frame = ttk.Frame(win)
+        button_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        ttk.Button(button_frame, text='保存并重新扫描', command=save).pack(side=tk.RIGHT)
+        ttk.Button(button_frame, text='恢复默认', command=reset).pack(side=tk.RIGHT, padx=5)
+
+    def check_writable(self):
+        """当前打开的是只读的打包文件时提示用户，返回是否可以修改"""
+        if self.model is not None and self.model.read_only:
+            messagebox.showinfo("提示", "当前打开的是只读的打包文件，不能修改")
+            return False
+        return True
+
+    def close_model(self):
+        """保存并关闭当前的文档树模型（切换文件夹或退出时调用）"""
+        self.flush_autosave()
+        self.writer.flush()
+        self.close_xlsx_preview()
+        if self.model is None:
+            return
+        if self.model.dirty:
+            # 在写入线程中保存，退出前 on_close 会等待写入完成
+            self.model.save(self.writer)
+        self.model.close()
+        self.model = None
+        self.save_search_index()
+        # 打包文件的搜索索引从模型的内存映射中读取内容，不能继续使用
+        self.search_index = None
+
     def load_directory_tree(self, folder_path):
-        """加载目录树"""
+        """加载目录树
+
+        优先使用上次保存的目录快照立即显示，然后在后台只重新读取mtime变化了的目录。
+        子目录的内容在展开时才添加到目录树中。folder_path 也可以是打包文件，此时只读。
+        """
         # 清空现有项目
         for item in self.tree.get_children():
             self.tree.delete(item)
+        self.close_model()
+        if self.current_file_path and not self.current_file_path.startswith(folder_path + os.sep):
+            # 编辑中的文件不属于新打开的文件夹，清空编辑区域
+            self.highlighter.reset(False)
+            self.text_edit.delete(1.0, tk.END)
+            self.current_file_path = ""
+            self.mark_editor_clean(None)
+        
+        try:
+            self.model = open_document_tree(folder_path, self.content_cache)
+        except (OSError, PackError) as e:
+            self.model = None
+            self.highlighter.reset(False)
+            self.text_edit.delete(1.0, tk.END)
+            self.current_file_path = ""
+            self.mark_editor_clean(None)
+            messagebox.showerror("错误", f"无法打开: {str(e)}")
+            return
+        if self.model.read_only:
+            self.history = None
+        elif self.history is None or self.history.folder_path != folder_path:
+            self.history = VersionStore(folder_path)
+        
+        from_cache = self.model.load(writer=self.writer)
+        if self.model.stats is not None:
+            self.status_var.set(f"已扫描 {self.model.count()} 个目录项，{self.model.stats.summary()}")
         
         # 添加根目录
         root_name = os.path.basename(folder_path)
@@ -147,25 +379,98 @@ class DocMenu:
         
         self.add_directory_items(root_item, folder_path)
         
-        # 展开所有项
-        self.expand_all()
+        # 目录不大时展开所有项
+        if self.model.count() <= self.EXPAND_ALL_LIMIT:
+            self.expand_all()
+        
+        if from_cache:
+            self.refresh_tree_snapshot()
 
     def add_directory_items(self, parent_item, path):
-        """递归添加目录项"""
-        try:
-            for item in os.listdir(path):
-                item_path = os.path.join(path, item)
-                
-                # 如果是目录，添加目录节点
-                if os.path.isdir(item_path):
-                    dir_item = self.tree.insert(parent_item, 'end', text=item, values=[item_path])
-                    self.add_directory_items(dir_item, item_path)  # 递归添加子项
-                
-                # 如果是txt、rtf或xlsx文件，添加文件节点
-                elif item.lower().endswith(('.txt', '.rtf', '.xlsx', '.bas')):
-                    file_item = self.tree.insert(parent_item, 'end', text=item, values=[item_path])
-        except PermissionError:
-            pass  # 忽略无权限访问的目录
+        """按目录快照添加一层目录项，子目录先放一个占位项，展开时再添加其内容"""
+        for name, item_path, is_dir, has_children in self.model.children(path):
+            # 如果是目录，添加目录节点
+            if is_dir:
+                dir_item = self.tree.insert(parent_item, 'end', text=name, values=[item_path])
+                if has_children:
+                    self.tree.insert(dir_item, 'end', text='', values=[''], tags=('placeholder',))
+            
+            # 如果是txt、rtf或xlsx文件，添加文件节点
+            else:
+                self.tree.insert(parent_item, 'end', text=name, values=[item_path])
+
+    def populate_item(self, item):
+        """如果目录项的内容还未添加，则按快照添加"""
+        children = self.tree.get_children(item)
+        if len(children) == 1 and self.tree.tag_has('placeholder', children[0]):
+            self.tree.delete(children[0])
+            self.add_directory_items(item, self.tree.item(item, 'values')[0])
+
+    def on_tree_open(self, event):
+        """展开目录时添加其内容"""
+        item = self.tree.focus()
+        if item:
+            self.populate_item(item)
+
+    def refresh_tree_snapshot(self):
+        """在后台按目录mtime检查快照，完成后只更新变化了的目录"""
+        model = self.model
+        snapshot = model.snapshot
+
+        def worker():
+            new_snapshot, changed, stats = model.check(snapshot)
+            self.run_in_ui(self._on_tree_snapshot_refreshed, model, snapshot, new_snapshot, changed, stats)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_tree_snapshot_refreshed(self, model, old_snapshot, new_snapshot, changed, stats):
+        if model is not self.model:
+            return
+        if model.snapshot is not old_snapshot:
+            # 检查期间目录树被修改过，基于最新的快照重新检查
+            self.refresh_tree_snapshot()
+            return
+        if not changed:
+            return
+        model.apply(new_snapshot)
+        for path in changed:
+            item = self.find_tree_item_by_path(path, populate=False)
+            if item:
+                self.rerender_item(item, path)
+        model.save(self.writer)
+        self.status_var.set(f"已更新 {len(changed)} 个目录，{stats.summary()}")
+
+    def rerender_item(self, item, path):
+        """按快照更新某个目录项的子项：只删除消失的、添加新出现的，保留其余子项的展开状态"""
+        entries = self.model.children(path)
+        children = self.tree.get_children(item)
+        if len(children) == 1 and self.tree.tag_has('placeholder', children[0]):
+            # 尚未展开过的目录只需确认占位项是否还需要
+            if not entries:
+                self.tree.delete(children[0])
+            return
+        if not children and entries and not self.tree.item(item, 'open'):
+            self.tree.insert(item, 'end', text='', values=[''], tags=('placeholder',))
+            return
+
+        existing = {self.tree.item(child, 'text'): child for child in children}
+        names = {entry[0] for entry in entries}
+        for name, child in existing.items():
+            if name not in names:
+                self.tree.delete(child)
+        for index, (name, item_path, is_dir, has_children) in enumerate(entries):
+            child = existing.get(name)
+            if child is not None:
+                self.tree.move(child, item, index)
+                continue
+            child = self.tree.insert(item, index, text=name, values=[item_path])
+            if has_children:
+                self.tree.insert(child, 'end', text='', values=[''], tags=('placeholder',))
+
+    def rescan_snapshot_dir(self, path):
+        """文件或文件夹被新建、删除后，重新读取快照中的该目录"""
+        if self.model is not None:
+            self.model.rescan(path)
 
     def on_tree_select(self, event):
         """处理目录树选择事件"""
@@ -177,50 +482,216 @@ class DocMenu:
         item_path = self.tree.item(item_id, 'values')[0]
         
         # 检查是否为支持的文件类型
-        if os.path.isfile(item_path) and item_path.lower().endswith(('.txt', '.rtf', '.xlsx', '.bas')):
+        if self.model.is_file(item_path):
             self.current_file_path = item_path  # 保存当前文件路径
             self.show_file_content(item_path)
+            self.prefetch_neighbours(item_id)
         else:
             # 如果是目录，不显示内容
+            self.flush_autosave()
+            self.close_xlsx_preview()
+            self.highlighter.reset(False)
             self.text_edit.delete(1.0, tk.END)
             self.current_file_path = ""  # 清空当前文件路径
+            self.mark_editor_clean(None)
+
+    def prefetch_neighbours(self, item_id):
+        """在后台预取目录树中与选中项相邻的文件"""
+        neighbours = []
+        next_item = prev_item = item_id
+        for _ in range(self.PREFETCH_NEIGHBOURS):
+            next_item = self.tree.next(next_item) if next_item else ''
+            prev_item = self.tree.prev(prev_item) if prev_item else ''
+            neighbours.extend(i for i in (next_item, prev_item) if i)
+        for neighbour in neighbours:
+            path = self.tree.item(neighbour, 'values')[0]
+            if self.model.is_text_file(path):
+                self._prefetch_executor.submit(self.model.prefetch, path)
 
     def show_file_content(self, file_path):
         """显示文件内容，支持文本、RTF和Excel格式"""
+        self.flush_autosave()
+        # 该文件可能还在后台写入，先等写完，否则会读到旧内容并把它当作未修改的基准
+        self.writer.wait(file_path)
+        self.close_xlsx_preview()
+        self._xlsx_loaded = []
+        self.highlighter.reset(False)
         try:
             if file_path.lower().endswith('.rtf'):
                 # 对于RTF文件，使用普通文本方式显示
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    self.text_edit.delete(1.0, tk.END)
-                    self.text_edit.insert(tk.END, content)
-            elif file_path.lower().endswith('.xlsx'):  # 添加对Excel文件的支持
-                # 对于Excel文件，将其转换为文本表格显示
-                df = pd.read_excel(file_path, sheet_name=0)  # 读取第一个工作表
-                content = df.to_string(index=False)
+                content = self.model.read_text(file_path)
                 self.text_edit.delete(1.0, tk.END)
                 self.text_edit.insert(tk.END, content)
+            elif file_path.lower().endswith('.xlsx'):  # 添加对Excel文件的支持
+                # 对于Excel文件，按制表符分隔显示，先显示前若干行，滚动时再继续加载
+                self.text_edit.delete(1.0, tk.END)
+                self.open_xlsx_preview(file_path)
             elif file_path.lower().endswith('.bas'):  # 添加对bas文件的支持
                 # 对于bas文件，按文本方式显示
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    self.text_edit.delete(1.0, tk.END)
-                    self.text_edit.insert(tk.END, content)
+                content = self.model.read_text(file_path)
+                self.text_edit.delete(1.0, tk.END)
+                self.text_edit.insert(tk.END, content)
             else:
                 # 对于txt文件，普通文本显示
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    self.text_edit.delete(1.0, tk.END)
-                    self.text_edit.insert(tk.END, content)
+                content = self.model.read_text(file_path)
+                self.text_edit.delete(1.0, tk.END)
+                self.text_edit.insert(tk.END, content)
+            self.highlighter.reset(file_path.lower().endswith('.bas'))
+            self.mark_editor_clean(file_path)
         except Exception as e:
             self.text_edit.delete(1.0, tk.END)
             self.text_edit.insert(tk.END, f"无法读取文件: {str(e)}")
+            # 编辑器中是错误信息，不能被保存回文件
+            self.mark_editor_clean(None)
+
+    def open_xlsx_preview(self, file_path, skip_rows=0):
+        """打开Excel文件的流式预览，skip_rows 为编辑器中已有的行数"""
+        self._xlsx_reader = self.model.open_xlsx(file_path)
+        self._xlsx_rows = self._xlsx_reader.iter_rows(typed=True)
+        if skip_rows:
+            # 已经显示在编辑器中的行不再插入文本，只记下它们的单元格类型
+            self._xlsx_loaded = list(itertools.islice(self._xlsx_rows, skip_rows))
+        else:
+            self._xlsx_loaded = []
+            self._xlsx_editable = True
+            self.load_more_xlsx_rows(self.XLSX_PREVIEW_ROWS)
+
+    def load_more_xlsx_rows(self, count):
+        """从当前Excel文件再读取 count 行追加到编辑器末尾"""
+        if self._xlsx_rows is None:
+            return
+        rows = list(itertools.islice(self._xlsx_rows, count))
+        if rows:
+            self._xlsx_loaded.extend(rows)
+            if self._xlsx_editable and any(has_separator(row) for row in rows):
+                self._xlsx_editable = False
+                self.status_var.set("该Excel文件的单元格中包含制表符或换行，只能查看，不能在这里保存")
+            self.text_edit.insert(tk.END, rows_to_text(rows))
+        if len(rows) < count:
+            self.close_xlsx_preview()
+
+    def close_xlsx_preview(self):
+        """关闭正在预览的Excel文件"""
+        if self._xlsx_reader is not None:
+            self._xlsx_rows = None
+            self._xlsx_reader.close()
+            self._xlsx_reader = None
+
+    def on_text_scroll(self, first, last):
+        """文本区域滚动时更新滚动条和可见行的语法高亮，接近底部时继续加载Excel行"""
+        self.text_scrollbar.set(first, last)
+        self.highlighter.highlight_visible()
+        if self._xlsx_rows is not None and float(last) > 0.9:
+            self.root.after_idle(self.load_more_xlsx_rows, self.XLSX_CHUNK_ROWS)
+
+    def save_xlsx_file(self, file_path, content):
+        """把制表符分隔的文本保存为Excel文件，返回是否已保存
+
+        行数和列位置与编辑器中的文本一一对应，内容未修改的单元格按原来的类型写回；
+        尚未加载到编辑器中的行直接从原文件流式复制，生成的文件用 atomic_write_bytes 替换原文件。
+        单元格中本身有制表符或换行时无法区分，不保存。
+        """
+        if not self._xlsx_editable:
+            messagebox.showwarning("警告", "该Excel文件的单元格中包含制表符或换行，无法按文本保存")
+            return False
+        edited = text_to_rows(content, self._xlsx_loaded)
+        rows = edited
+        if self._xlsx_rows is not None:
+            rows = itertools.chain(edited, self._xlsx_rows)
+        buffer = io.BytesIO()
+        write_xlsx(buffer, rows)
+        data = buffer.getvalue()
+        self._record_history(file_path, data)
+        self.close_xlsx_preview()
+        atomic_write_bytes(file_path, data)
+        # 重新打开文件，使后续滚动可以继续加载剩余的行
+        self.open_xlsx_preview(file_path, skip_rows=len(edited))
+        return True
+
+    def content_hash(self, content):
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+    def editor_text(self):
+        """返回编辑器中的文本（不含Text组件自动追加的末尾换行）"""
+        return self.text_edit.get(1.0, 'end-1c')
+
+    def mark_editor_clean(self, path):
+        """记录编辑器当前内容对应的文件及其哈希，作为“未修改”的基准"""
+        self.editor_path = path
+        self._saved_hash = self.content_hash(self.editor_text()) if path else None
+        self.text_edit.edit_modified(False)
+
+    def on_text_modified(self, event):
+        """文本被修改时安排一次延迟的自动保存
+
+        Tk的修改标记每次都会被清除，只用来触发该事件；内容是否真正修改过以
+        _saved_hash（mark_editor_clean 和 save_text_file 中记录的哈希）为准。
+        """
+        if not self.text_edit.edit_modified():
+            return
+        # 清除修改标记，以便下一次修改时再次触发该事件
+        self.text_edit.edit_modified(False)
+        if self.editor_path and not self.model.read_only and self.model.is_text_file(self.editor_path):
+            self.cancel_autosave()
+            self._autosave_job = self.root.after(self.AUTOSAVE_DELAY_MS, self.autosave)
+
+    def cancel_autosave(self):
+        if self._autosave_job is not None:
+            self.root.after_cancel(self._autosave_job)
+            self._autosave_job = None
+
+    def autosave(self):
+        self._autosave_job = None
+        if self.editor_path:
+            self.save_text_file(self.editor_path)
+
+    def flush_autosave(self):
+        """如果有尚未执行的自动保存，立即提交"""
+        if self._autosave_job is not None:
+            self.cancel_autosave()
+            self.autosave()
+
+    def save_text_file(self, path):
+        """内容有变化时提交到后台写入线程，返回是否提交了写入"""
+        content = self.editor_text()
+        content_hash = self.content_hash(content)
+        if content_hash == self._saved_hash:
+            return False
+        self._saved_hash = content_hash
+        self.writer.submit(path, content)
+        return True
+
+    def _on_file_written(self, path, elapsed, error):
+        """后台写入完成后在主线程中调用"""
+        if error is not None:
+            if path == self.editor_path:
+                # 下次保存时重新写入
+                self._saved_hash = None
+            messagebox.showerror("错误", f"无法保存文件: {str(error)}")
+            return
+        self.status_var.set(f"已保存 {os.path.basename(path)}（{elapsed:.0f} 毫秒）")
+        if self.search_index is not None:
+            # 只重新索引刚保存的文件，不遍历文件夹
+            self.update_search_index([path])
+
+    def _write_file(self, path, content):
+        """在写入线程中保存文本文件"""
+        self.model.save_text(path, content)
+
+    def on_close(self):
+        """关闭窗口前保存未保存的修改"""
+        self.close_model()
+        # 写入线程是守护线程，退出前等待目录快照等写入完成
+        self.writer.flush()
+        self.root.destroy()
 
     def new_file(self):
         """新建文件，仅支持TXT格式"""
         if not self.current_folder:
             messagebox.showwarning("警告", "请先选择一个文件夹")
             return
+        if not self.check_writable():
+            return
 
         # 获取当前选中的目录
         selection = self.tree.selection()
@@ -228,7 +699,7 @@ class DocMenu:
             item_id = selection[0]
             selected_item_path = self.tree.item(item_id, 'values')[0]
             # 如果选中的是文件，则使用其父目录
-            if os.path.isfile(selected_item_path):
+            if self.model.is_file(selected_item_path):
                 parent_dir = os.path.dirname(selected_item_path)
             else:
                 parent_dir = selected_item_path
@@ -262,6 +733,8 @@ class DocMenu:
         if not self.current_folder:
             messagebox.showwarning("警告", "请先选择一个文件夹")
             return
+        if not self.check_writable():
+            return
 
         # 获取当前选中的目录
         selection = self.tree.selection()
@@ -269,7 +742,7 @@ class DocMenu:
             item_id = selection[0]
             selected_item_path = self.tree.item(item_id, 'values')[0]
             # 如果选中的是文件，则使用其父目录
-            if os.path.isfile(selected_item_path):
+            if self.model.is_file(selected_item_path):
                 parent_dir = os.path.dirname(selected_item_path)
             else:
                 parent_dir = selected_item_path
@@ -293,70 +766,63 @@ class DocMenu:
 
     def update_directory_tree(self, parent_path):
         """更新目录树中的特定父路径"""
+        self.rescan_snapshot_dir(parent_path)
         # 找到父路径对应的树形项目
         parent_item = self.find_tree_item_by_path(parent_path)
         if parent_item:
-            # 清除现有的子项
-            self.tree.delete(*self.tree.get_children(parent_item))
-            # 添加新的子项
-            self.add_directory_items(parent_item, parent_path)
+            # 按新的快照更新子项
+            self.populate_item(parent_item)
+            self.rerender_item(parent_item, parent_path)
             # 展开父项
             self.tree.item(parent_item, open=True)
         else:
             # 如果找不到父项，重新加载整个目录树
             self.load_directory_tree(self.current_folder)
 
-    def find_tree_item_by_path(self, path):
-        """根据路径查找树形项目"""
-        def search_item(parent, target_path):
-            for child in self.tree.get_children(parent):
-                item_path = self.tree.item(child, 'values')[0]
-                if item_path == target_path:
-                    return child
-                result = search_item(child, target_path)
-                if result:
-                    return result
-            return None
+    def find_tree_item_by_path(self, path, populate=True):
+        """根据路径查找树形项目
 
-        # 搜索所有顶级项目
+        沿路径逐级查找，populate 为 True 时会添加途经的尚未展开的目录内容。
+        """
         for item in self.tree.get_children():
-            item_path = self.tree.item(item, 'values')[0]
-            if item_path == path:
+            root_path = self.tree.item(item, 'values')[0]
+            if path == root_path:
                 return item
-            result = search_item(item, path)
-            if result:
-                return result
+            if not path.startswith(root_path + os.sep):
+                continue
+            for part in os.path.relpath(path, root_path).split(os.sep):
+                if populate:
+                    self.populate_item(item)
+                for child in self.tree.get_children(item):
+                    if self.tree.item(child, 'text') == part and not self.tree.tag_has('placeholder', child):
+                        item = child
+                        break
+                else:
+                    return None
+            return item
         return None
 
     def save_current_file(self):
         """保存当前编辑的文件"""
+        if self.current_file_path and not self.check_writable():
+            return
         if self.current_file_path:
+            if self.editor_path != self.current_file_path:
+                # 编辑器中是读取失败的错误信息，不能覆盖原文件
+                messagebox.showwarning("警告", "文件未能正确读取，无法保存")
+                return
             try:
-                if self.current_file_path.lower().endswith('.xlsx'):  # 添加对Excel文件的保存支持
-                    # 对于Excel文件，将文本内容转换回DataFrame并保存
-                    try:
-                        content = self.text_edit.get(1.0, tk.END)
-                        # 简单的文本到DataFrame转换
-                        lines = content.strip().split('\n')
-                        if lines:
-                            # 假设第一行是列名
-                            headers = lines[0].split('\t')  # 使用制表符分割
-                            data_rows = [line.split('\t') for line in lines[1:]]
-                            df = pd.DataFrame(data_rows, columns=headers)
-                            df.to_excel(self.current_file_path, index=False)
-                            messagebox.showinfo("保存成功", "Excel文件已保存成功！")
-                        else:
-                            # 如果没有内容，创建空的Excel文件
-                            df = pd.DataFrame()
-                            df.to_excel(self.current_file_path, index=False)
-                    except Exception as e:
-                        messagebox.showerror("保存错误", f"无法保存Excel文件: {str(e)}")
+                if self.current_file_path.lower().endswith('.xlsx'):
+                    # 对于Excel文件，按制表符把每行拆分为单元格并保存
+                    start = time.perf_counter()
+                    if self.save_xlsx_file(self.current_file_path, self.editor_text()):
+                        elapsed = (time.perf_counter() - start) * 1000
+                        self.status_var.set(f"已保存 {os.path.basename(self.current_file_path)}（{elapsed:.0f} 毫秒）")
                 else:
-                    # 对于txt文件，只保存纯文本内容
-                    content = self.text_edit.get(1.0, tk.END)
-                    with open(self.current_file_path, 'w', encoding='utf-8') as f:
-                        f.write(content)
-                messagebox.showinfo("保存成功", f"文件已保存: {self.current_file_path}")
+                    # 对于txt文件，只保存纯文本内容，在后台线程中写入
+                    self.cancel_autosave()
+                    if not self.save_text_file(self.current_file_path):
+                        self.status_var.set("文件未修改，无需保存")
             except Exception as e:
                 messagebox.showerror("错误", f"无法保存文件: {str(e)}")
         else:
@@ -369,24 +835,21 @@ class DocMenu:
         if not selection:
             messagebox.showwarning("警告", "请先选择要删除的文件")
             return
+        if not self.check_writable():
+            return
         
         item_id = selection[0]
         item_path = self.tree.item(item_id, 'values')[0]
         item_name = self.tree.item(item_id, 'text')
         
-        if os.path.isfile(item_path):
-            reply = messagebox.askquestion("确认删除", f"确定要删除文件 '{item_name}' 吗？\n此操作不可恢复！")
+        if self.model.is_file(item_path):
+            if self.USE_TRASH:
+                message = f"确定要删除文件 '{item_name}' 吗？\n删除后可以在“回收站”中恢复。"
+            else:
+                message = f"确定要删除文件 '{item_name}' 吗？\n此操作不可恢复！"
+            reply = messagebox.askquestion("确认删除", message)
             if reply == 'yes':
-                try:
-                    os.remove(item_path)
-                    # 从目录树中移除项目
-                    self.tree.delete(item_id)
-                    # 清空编辑区域
-                    if self.current_file_path == item_path:
-                        self.text_edit.delete(1.0, tk.END)
-                        self.current_file_path = ""
-                except Exception as e:
-                    messagebox.showerror("错误", f"删除文件失败: {str(e)}")
+                self.start_file_operation('trash' if self.USE_TRASH else 'delete', item_path)
         else:
             messagebox.showinfo("提示", "请选择一个文件进行删除")
 
@@ -396,60 +859,655 @@ class DocMenu:
         if not selection:
             messagebox.showwarning("警告", "请先选择要删除的文件夹")
             return
+        if not self.check_writable():
+            return
         
         item_id = selection[0]
         item_path = self.tree.item(item_id, 'values')[0]
         item_name = self.tree.item(item_id, 'text')
         
-        if os.path.isdir(item_path):
-            reply = messagebox.askquestion("确认删除", f"确定要删除文件夹 '{item_name}' 吗？\n此操作将删除文件夹内所有内容，且不可恢复！")
+        if item_path == self.current_folder:
+            messagebox.showinfo("提示", "不能删除当前打开的根文件夹")
+        elif self.model.is_dir(item_path):
+            if self.USE_TRASH:
+                message = f"确定要删除文件夹 '{item_name}' 吗？\n此操作将删除文件夹内所有内容，删除后可以在“回收站”中恢复。"
+            else:
+                message = f"确定要删除文件夹 '{item_name}' 吗？\n此操作将删除文件夹内所有内容，且不可恢复！"
+            reply = messagebox.askquestion("确认删除", message)
             if reply == 'yes':
-                try:
-                    import shutil
-                    shutil.rmtree(item_path)
-                    # 从目录树中移除项目
-                    self.tree.delete(item_id)
-                    # 清空编辑区域
-                    if self.current_file_path and self.current_file_path.startswith(item_path):
-                        self.text_edit.delete(1.0, tk.END)
-                        self.current_file_path = ""
-                except Exception as e:
-                    messagebox.showerror("错误", f"删除文件夹失败: {str(e)}")
+                self.start_file_operation('trash' if self.USE_TRASH else 'delete', item_path)
         else:
             messagebox.showinfo("提示", "请选择一个文件夹进行删除")
 
+    def copy_selected(self):
+        """把选中的文件或文件夹复制到另一个文件夹"""
+        self._copy_or_move_selected('copy', '复制到')
+
+    def move_selected(self):
+        """把选中的文件或文件夹移动到另一个文件夹"""
+        self._copy_or_move_selected('move', '移动到')
+
+    def _copy_or_move_selected(self, kind, title):
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("警告", "请先选择文件或文件夹")
+            return
+        if not self.check_writable():
+            return
+        item_path = self.tree.item(selection[0], 'values')[0]
+        if item_path == self.current_folder:
+            messagebox.showinfo("提示", "不能复制或移动当前打开的根文件夹")
+            return
+        target_dir = filedialog.askdirectory(title=title, initialdir=self.current_folder)
+        if target_dir:
+            self.start_file_operation(kind, item_path, os.path.normpath(target_dir))
+
+    # 以下是后台文件操作相关的功能
+    def start_file_operation(self, kind, path, target=None):
+        """把文件操作交给后台工作线程执行"""
+        if kind in ('delete', 'trash', 'move'):
+            # 编辑中的文件将被删除或移走，先保存再清空编辑区域
+            if self.editor_path and (self.editor_path == path or self.editor_path.startswith(path + os.sep)):
+                self.flush_autosave()
+                self.writer.flush()
+                self.close_xlsx_preview()
+                self.highlighter.reset(False)
+                self.text_edit.delete(1.0, tk.END)
+                self.current_file_path = ""
+                self.mark_editor_clean(None)
+        if kind == 'trash':
+            target = os.path.join(self.current_folder, TRASH_DIR_NAME)
+        operation = self.file_ops.submit(FileOperation(kind, path, target))
+        self.status_var.set(f"{operation.label}...")
+        self.cancel_ops_button.state(['!disabled'])
+        return operation
+
+    def cancel_file_operations(self):
+        self.file_ops.cancel_all()
+
+    def _on_file_operation_progress(self, operation):
+        if not operation.finished:
+            self.status_var.set(f"{operation.label}：{operation.done}/{operation.total}")
+
+    def _on_file_operation_done(self, operation):
+        """文件操作完成后只更新受影响的目录"""
+        source = operation.source
+        self.content_cache.invalidate(source)
+        self.content_cache.invalidate_prefix(source + os.sep)
+
+        changed_dirs = []
+        if operation.kind in ('delete', 'trash', 'move'):
+            changed_dirs.append(os.path.dirname(source))
+        if operation.kind in ('copy', 'move'):
+            changed_dirs.append(operation.target)
+        for path in changed_dirs:
+            self.rescan_snapshot_dir(path)
+            item = self.find_tree_item_by_path(path, populate=False)
+            if item:
+                self.rerender_item(item, path)
+        if self.search_index is not None:
+            self.update_search_index()
+
+        if operation.cancelled:
+            self.status_var.set(f"{operation.label} 已取消")
+        elif operation.errors:
+            self.status_var.set(f"{operation.label} 完成，{len(operation.errors)} 项失败")
+            details = "\n".join(f"{path}: {error}" for path, error in operation.errors[:10])
+            if len(operation.errors) > 10:
+                details += f"\n……共 {len(operation.errors)} 项"
+            messagebox.showerror("错误", f"{operation.label} 时部分项目失败:\n{details}")
+        else:
+            self.status_var.set(f"{operation.label} 已完成")
+        if not self.file_ops.active:
+            self.cancel_ops_button.state(['disabled'])
+        if self.trash_window is not None and self.trash_window.winfo_exists():
+            self.refresh_trash_list()
+
+    def open_trash_window(self):
+        """显示回收站，可以恢复或清空"""
+        if not self.current_folder:
+            messagebox.showwarning("警告", "请先选择一个文件夹")
+            return
+        if self.trash_window is not None and self.trash_window.winfo_exists():
+            self.trash_window.lift()
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title('回收站')
+        win.geometry('600x300')
+
+        columns = ('原位置', '删除时间')
+        self.trash_tree = ttk.Treeview(win, columns=columns, show='headings')
+        self.trash_tree.heading('原位置', text='原位置')
+        self.trash_tree.heading('删除时间', text='删除时间')
+        self.trash_tree.column('原位置', width=400, anchor='w')
+        self.trash_tree.column('删除时间', width=150, anchor='center')
+        self.trash_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        button_frame = ttk.Frame(win)
+        button_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        ttk.Button(button_frame, text='恢复', command=self.restore_trash_item).pack(side=tk.LEFT)
+        ttk.Button(button_frame, text='清空回收站', command=self.empty_trash).pack(side=tk.LEFT, padx=5)
+
+        self.trash_window = win
+        self.refresh_trash_list()
+
+    def refresh_trash_list(self):
+        self.trash_items = list_trash(os.path.join(self.current_folder, TRASH_DIR_NAME))
+        self.trash_tree.delete(*self.trash_tree.get_children())
+        for i, (entry_dir, original_path) in enumerate(self.trash_items):
+            stamp = os.path.basename(entry_dir).split('-')[0]
+            deleted_at = f"{stamp[:4]}-{stamp[4:6]}-{stamp[6:8]} {stamp[8:10]}:{stamp[10:12]}:{stamp[12:14]}"
+            rel_path = os.path.relpath(original_path, self.current_folder)
+            self.trash_tree.insert('', 'end', iid=str(i), values=(rel_path, deleted_at))
+
+    def restore_trash_item(self):
+        """把选中的项目恢复到原位置"""
+        selection = self.trash_tree.selection()
+        if not selection:
+            return
+        entry_dir, original_path = self.trash_items[int(selection[0])]
+        try:
+            restored = restore_from_trash(entry_dir, original_path)
+        except OSError as e:
+            messagebox.showerror("错误", f"恢复失败: {str(e)}")
+            return
+        self.update_directory_tree(os.path.dirname(restored))
+        self.select_item_by_path(restored)
+        self.refresh_trash_list()
+
+    def empty_trash(self):
+        trash_dir = os.path.join(self.current_folder, TRASH_DIR_NAME)
+        if not os.path.isdir(trash_dir):
+            return
+        reply = messagebox.askquestion("确认清空", "确定要永久删除回收站中的所有内容吗？\n此操作不可恢复！")
+        if reply == 'yes':
+            self.start_file_operation('delete', trash_dir)
+
     def select_item_by_path(self, path):
         """根据路径选中树形控件中的项目"""
-        def find_path(parent, target_path):
-            for child in self.tree.get_children(parent):
-                child_path = self.tree.item(child, 'values')[0]
-                
-                # 如果当前项目路径与目标路径匹配
-                if target_path == child_path:
-                    self.tree.selection_set(child)
-                    self.tree.see(child)  # 确保项目可见
-                    return child
-                # 如果目标路径在当前项目路径下，需要展开当前项目
-                elif target_path.startswith(child_path + os.sep):
-                    self.tree.item(parent, open=True)
-                    result = find_path(child, target_path)
-                    if result:
-                        return result
+        item = self.find_tree_item_by_path(path)
+        if item is None:
             return None
-
-        # 搜索所有顶级项目
-        for item in self.tree.get_children():
-            item_path = self.tree.item(item, 'values')[0]
-            # 只有当目标路径在根项目下时才展开根项目
-            if self.current_folder and (path == self.current_folder or path.startswith(self.current_folder + os.sep)):
-                self.tree.item(item, open=True)
-            result = find_path(item, path)
-            if result:
-                self.tree.selection_set(result)
-                self.tree.see(result)
-                return result
-        return None
+        # 展开所有上级目录
+        parent = self.tree.parent(item)
+        while parent:
+            self.tree.item(parent, open=True)
+            parent = self.tree.parent(parent)
+        self.tree.selection_set(item)
+        self.tree.see(item)  # 确保项目可见
+        return item
     
+    def _process_ui_queue(self):
+        """在主线程中执行后台线程提交的回调
+
+        某个回调出错时记录日志后继续执行其余的回调，轮询不会因此停止。
+        """
+        try:
+            while True:
+                try:
+                    func, args = self._ui_queue.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    func(*args)
+                except Exception:
+                    logger.exception('后台任务的回调 %r 执行出错', func)
+        finally:
+            self.root.after(50, self._process_ui_queue)
+
+    def run_in_ui(self, func, *args):
+        """供后台线程调用：请求在主线程中执行 func"""
+        self._ui_queue.put((func, args))
+
+    # 以下是历史版本相关的功能
+    def _record_history(self, path, content):
+        """保存文件前把新内容记入历史版本（在写入线程中调用）"""
+        history = self.history
+        if history is None or not path.startswith(history.folder_path + os.sep):
+            return
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        try:
+            history.record_save(path, data)
+        except OSError:
+            pass  # 历史版本保存失败不影响文件本身的保存
+
+    def open_history_window(self):
+        """显示当前文件的历史版本，可以与当前内容比较并恢复"""
+        path = self.editor_path or self.current_file_path
+        if self.model is not None and self.model.read_only:
+            messagebox.showinfo("提示", "打包文件是只读的，其中的文件没有历史版本")
+            return
+        if not path or self.history is None:
+            messagebox.showwarning("警告", "请先选择一个文件")
+            return
+        versions = self.history.versions(path)
+        if not versions:
+            messagebox.showinfo("提示", "该文件还没有历史版本")
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title(f'历史版本 - {os.path.basename(path)}')
+        win.geometry('900x500')
+
+        pane = ttk.PanedWindow(win, orient=tk.HORIZONTAL)
+        pane.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        left_frame = ttk.Frame(pane)
+        pane.add(left_frame, weight=1)
+        right_frame = ttk.Frame(pane)
+        pane.add(right_frame, weight=3)
+
+        version_list = tk.Listbox(left_frame, exportselection=False)
+        version_list.pack(fill=tk.BOTH, expand=True)
+        for version in versions:
+            saved_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(version.saved_at))
+            version_list.insert(tk.END, f'{saved_at}  {version.size:,} B')
+
+        diff_text = tk.Text(right_frame, wrap=tk.NONE)
+        diff_scrollbar = ttk.Scrollbar(right_frame, orient=tk.VERTICAL, command=diff_text.yview)
+        diff_text.configure(yscrollcommand=diff_scrollbar.set)
+        diff_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        diff_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        diff_text.tag_configure('added', foreground='#008000')
+        diff_text.tag_configure('removed', foreground='#c00000')
+        diff_text.tag_configure('hunk', foreground='#0000c0')
+
+        button_frame = ttk.Frame(left_frame)
+        button_frame.pack(fill=tk.X, pady=(5, 0))
+        usage_label = ttk.Label(win, text='')
+        usage_label.pack(anchor=tk.W, padx=5, pady=(0, 5))
+
+        def show_usage():
+            stored, logical = self.history.disk_usage()
+            usage_label.config(text=f'历史版本共占用 {stored:,} 字节（未去重、未压缩时为 {logical:,} 字节）')
+
+        def selected_version():
+            selection = version_list.curselection()
+            return versions[selection[0]] if selection else None
+
+        def on_select(event):
+            version = selected_version()
+            if version is None:
+                return
+            diff_text.delete(1.0, tk.END)
+            if path.lower().endswith('.xlsx'):
+                diff_text.insert(tk.END, 'Excel文件无法比较内容，可以直接恢复此版本。')
+                return
+            old_lines = self.history.read(version).decode('utf-8', errors='replace').splitlines(keepends=True)
+            if path == self.editor_path:
+                current = self.editor_text()
+            else:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    current = f.read()
+            diff = difflib.unified_diff(old_lines, current.splitlines(keepends=True),
+                                        fromfile='历史版本', tofile='当前内容')
+            has_diff = False
+            for line in diff:
+                has_diff = True
+                if not line.endswith('\n'):
+                    line += '\n'
+                tag = 'hunk' if line.startswith('@@') else 'added' if line.startswith('+') else \
+                    'removed' if line.startswith('-') else ''
+                diff_text.insert(tk.END, line, tag)
+            if not has_diff:
+                diff_text.insert(tk.END, '与当前内容相同')
+
+        def restore():
+            version = selected_version()
+            if version is None:
+                return
+            reply = messagebox.askquestion("确认恢复", "确定要恢复到此版本吗？\n当前内容会作为新的历史版本保留。", parent=win)
+            if reply != 'yes':
+                return
+            data = self.history.read(version)
+            if path.lower().endswith('.xlsx') or path != self.editor_path:
+                try:
+                    self._record_history(path, data)
+                    atomic_write_bytes(path, data)
+                except OSError as e:
+                    messagebox.showerror("错误", f"恢复失败: {str(e)}", parent=win)
+                    return
+                self.content_cache.invalidate(path)
+                if path == self.current_file_path:
+                    self.show_file_content(path)
+            else:
+                # 替换编辑器内容，由自动保存写回文件
+                self.text_edit.delete(1.0, tk.END)
+                self.text_edit.insert(tk.END, data.decode('utf-8', errors='replace'))
+            win.destroy()
+
+        def compact():
+            removed = self.history.compact()
+            show_usage()
+            self.status_var.set(f"历史版本整理完成，删除了 {removed} 个对象")
+
+        ttk.Button(button_frame, text='恢复此版本', command=restore).pack(side=tk.LEFT)
+        ttk.Button(button_frame, text='整理', command=compact).pack(side=tk.LEFT, padx=5)
+        version_list.bind('<<ListboxSelect>>', on_select)
+        version_list.selection_set(0)
+        on_select(None)
+        show_usage()
+
+    # 以下是查找重复文件相关的功能
+    def find_duplicate_files(self):
+        """在后台查找目录树中内容相同的文件"""
+        if not self.current_folder or self.model is None:
+            messagebox.showwarning("警告", "请先选择一个文件夹")
+            return
+        if self.model.read_only:
+            # 打包文件中的文件没有单独的磁盘路径，也不能删除
+            messagebox.showinfo("提示", "当前打开的是只读的打包文件，不能查找重复文件，请打开原文件夹")
+            return
+        if self._duplicates_running:
+            return
+        self._duplicates_running = True
+        paths = [os.path.join(self.current_folder, rel) for rel in self.model.iter_files()]
+        stages = {'size': '按大小分组后', 'partial': '比较部分哈希后', 'full': '比较完整哈希后'}
+
+        def progress(stage, remaining):
+            self.run_in_ui(self.status_var.set, f"查找重复文件：{stages[stage]}剩余 {remaining} 个候选文件")
+
+        def worker():
+            start = time.perf_counter()
+            try:
+                groups = find_duplicates(paths, progress=progress)
+                error = None
+            except Exception as e:
+                groups, error = [], e
+            elapsed = time.perf_counter() - start
+            self.run_in_ui(self._on_duplicates_found, groups, len(paths), elapsed, error)
+
+        self.status_var.set(f"查找重复文件：共 {len(paths)} 个文件")
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_duplicates_found(self, groups, total, elapsed, error):
+        self._duplicates_running = False
+        if error is not None:
+            messagebox.showerror("错误", f"查找重复文件失败: {str(error)}")
+            return
+        self.status_var.set(f"查找重复文件：{total} 个文件中找到 {len(groups)} 组重复（{elapsed:.2f} 秒）")
+
+        win = tk.Toplevel(self.root)
+        win.title('重复文件')
+        win.geometry('700x400')
+        result_tree = ttk.Treeview(win, columns=('size',), show='tree headings')
+        result_tree.heading('#0', text='文件')
+        result_tree.heading('size', text='大小')
+        result_tree.column('#0', width=550, anchor='w')
+        result_tree.column('size', width=100, anchor='e')
+        scrollbar = ttk.Scrollbar(win, orient=tk.VERTICAL, command=result_tree.yview)
+        result_tree.configure(yscrollcommand=scrollbar.set)
+        result_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(5, 0), pady=5)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=5)
+
+        for size, paths in groups:
+            group_item = result_tree.insert('', 'end', text=f'{len(paths)} 个相同的文件', values=[f'{size:,} B'], open=True)
+            for path in paths:
+                result_tree.insert(group_item, 'end', text=os.path.relpath(path, self.current_folder),
+                                   values=[''], tags=('file',))
+
+        def on_open(event):
+            selection = result_tree.selection()
+            if selection and result_tree.tag_has('file', selection[0]):
+                rel_path = result_tree.item(selection[0], 'text')
+                self.select_item_by_path(os.path.join(self.current_folder, rel_path))
+
+        result_tree.bind('<Double-Button-1>', on_open)
+        result_tree.bind('<Return>', on_open)
+
+    # 以下是快速打开（模糊查找文件）相关的功能
+    def open_quick_open(self):
+        """打开快速打开窗口，按输入的字符模糊匹配所有文件路径"""
+        if not self.current_folder or self.model is None:
+            messagebox.showwarning("警告", "请先选择一个文件夹")
+            return
+        if self.quick_open_window is not None and self.quick_open_window.winfo_exists():
+            self.quick_open_window.lift()
+            self.quick_open_entry.focus()
+            return
+
+        # 路径索引按目录快照建立，快照变化后才重新建立
+        if self._path_index_snapshot is not self.model.snapshot:
+            self.fuzzy_finder = FuzzyFinder(list(self.model.iter_files()))
+            self._path_index_snapshot = self.model.snapshot
+
+        win = tk.Toplevel(self.root)
+        win.title('快速打开')
+        win.geometry('600x350')
+        win.transient(self.root)
+
+        self.quick_open_var = tk.StringVar()
+        self.quick_open_entry = ttk.Entry(win, textvariable=self.quick_open_var)
+        self.quick_open_entry.pack(fill=tk.X, padx=5, pady=5)
+        self.quick_open_list = tk.Listbox(win, activestyle='none')
+        self.quick_open_list.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+
+        self.quick_open_var.trace_add('write', lambda *args: self.on_quick_open_query())
+        self.quick_open_entry.bind('<Return>', self.on_quick_open_choose)
+        self.quick_open_entry.bind('<Down>', lambda e: self._move_quick_open_selection(1))
+        self.quick_open_entry.bind('<Up>', lambda e: self._move_quick_open_selection(-1))
+        self.quick_open_entry.bind('<Escape>', lambda e: win.destroy())
+        self.quick_open_list.bind('<Double-Button-1>', self.on_quick_open_choose)
+
+        self.quick_open_results = []
+        self.quick_open_window = win
+        self.quick_open_entry.focus()
+
+    def on_quick_open_query(self):
+        """输入变化时重新开始匹配"""
+        self.fuzzy_finder.start(self.quick_open_var.get())
+        if self._quick_open_job is not None:
+            self.root.after_cancel(self._quick_open_job)
+        self._quick_open_step()
+
+    def _quick_open_step(self):
+        """每次只匹配一帧时间内能处理的路径，未完成时在下一帧继续"""
+        self._quick_open_job = None
+        if self.quick_open_window is None or not self.quick_open_window.winfo_exists():
+            return
+        done = self.fuzzy_finder.step()
+        results = self.fuzzy_finder.results()
+        if results != self.quick_open_results:
+            self.quick_open_results = results
+            self.quick_open_list.delete(0, tk.END)
+            for path in results:
+                self.quick_open_list.insert(tk.END, path)
+            if results:
+                self.quick_open_list.selection_set(0)
+        if not done:
+            self._quick_open_job = self.root.after(1, self._quick_open_step)
+
+    def _move_quick_open_selection(self, offset):
+        selection = self.quick_open_list.curselection()
+        if not self.quick_open_results:
+            return 'break'
+        index = (selection[0] if selection else 0) + offset
+        index = max(0, min(index, len(self.quick_open_results) - 1))
+        self.quick_open_list.selection_clear(0, tk.END)
+        self.quick_open_list.selection_set(index)
+        self.quick_open_list.see(index)
+        return 'break'
+
+    def on_quick_open_choose(self, event=None):
+        """在目录树中定位并打开选中的文件"""
+        if not self.quick_open_results:
+            return
+        selection = self.quick_open_list.curselection()
+        rel_path = self.quick_open_results[selection[0] if selection else 0]
+        self.quick_open_window.destroy()
+        self.select_item_by_path(os.path.join(self.current_folder, rel_path))
+
+    # 以下是全文搜索相关的功能
+    def open_search_window(self):
+        """打开“在文件夹中搜索”窗口"""
+        if not self.current_folder:
+            messagebox.showwarning("警告", "请先选择一个文件夹")
+            return
+        if self.search_window is not None and self.search_window.winfo_exists():
+            self.search_window.lift()
+            self.search_entry.focus()
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title('在文件夹中搜索')
+        win.geometry('700x400')
+
+        top_frame = ttk.Frame(win)
+        top_frame.pack(fill=tk.X, padx=5, pady=5)
+        self.search_entry = ttk.Entry(top_frame)
+        self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        ttk.Button(top_frame, text='搜索', command=self.run_search).pack(side=tk.LEFT, padx=(5, 0))
+
+        self.search_status = ttk.Label(win, text='')
+        self.search_status.pack(anchor=tk.W, padx=5)
+
+        result_frame = ttk.Frame(win)
+        result_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        columns = ('文件', '行号', '内容')
+        self.search_results_tree = ttk.Treeview(result_frame, columns=columns, show='headings')
+        self.search_results_tree.heading('文件', text='文件')
+        self.search_results_tree.heading('行号', text='行号')
+        self.search_results_tree.heading('内容', text='内容')
+        self.search_results_tree.column('文件', width=200, anchor='w')
+        self.search_results_tree.column('行号', width=60, anchor='center')
+        self.search_results_tree.column('内容', width=400, anchor='w')
+        result_scrollbar = ttk.Scrollbar(result_frame, orient=tk.VERTICAL, command=self.search_results_tree.yview)
+        self.search_results_tree.configure(yscrollcommand=result_scrollbar.set)
+        self.search_results_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        result_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.search_entry.bind('<Return>', lambda e: self.run_search())
+        self.search_results_tree.bind('<Double-Button-1>', self.on_search_result_open)
+        self.search_results_tree.bind('<Return>', self.on_search_result_open)
+
+        self.search_results = []
+        self._pending_search = False
+        self.search_window = win
+        self.search_entry.focus()
+        self.update_search_index()
+
+    def update_search_index(self, paths=None):
+        """在后台线程中增量更新全文索引，正在更新时在完成后再执行一次
+
+        paths 为刚保存的文件时只重新索引这些文件，不遍历文件夹。更新后的索引不立即写入缓存文件，
+        而是在 SEARCH_INDEX_SAVE_DELAY_MS 内合并为一次写入（见 schedule_search_index_save）。
+        """
+        if not self.current_folder or self.model is None:
+            return
+        if self._search_updating:
+            if paths is None:
+                self._search_update_pending = True
+            else:
+                self._search_pending_paths.update(paths)
+            return
+        load_first = False
+        if self.search_index is None or self.search_index.folder_path != self.current_folder:
+            self.search_index = self.model.create_search_index()
+            load_first = True
+            paths = None  # 刚加载的索引需要完整检查一次
+        index = self.search_index
+        self._search_updating = True
+        self._set_search_status('正在更新索引...')
+
+        def worker():
+            try:
+                if load_first:
+                    index.load()
+                if paths is None:
+                    index.update()
+                else:
+                    index.update_paths(paths)
+                message = f'索引中共有 {len(index.files)} 个文件'
+            except Exception as e:
+                message = f'更新索引失败: {str(e)}'
+            self.run_in_ui(self._on_search_index_updated, message)
+
+        self._search_executor.submit(worker)
+
+    def _on_search_index_updated(self, message):
+        self._search_updating = False
+        self._set_search_status(message)
+        if self.search_index is not None and self.search_index.dirty:
+            self.schedule_search_index_save()
+        if self._search_update_pending or self._search_pending_paths:
+            paths = None if self._search_update_pending else list(self._search_pending_paths)
+            self._search_update_pending = False
+            self._search_pending_paths = set()
+            # 等待中的搜索在这次更新完成后执行
+            self.update_search_index(paths)
+            return
+        if self.search_window is not None and self.search_window.winfo_exists() and self._pending_search:
+            self._pending_search = False
+            self.run_search()
+
+    def schedule_search_index_save(self):
+        """SEARCH_INDEX_SAVE_DELAY_MS 后写入索引缓存文件，期间的多次更新只写入一次"""
+        if self._search_save_job is None:
+            self._search_save_job = self.root.after(self.SEARCH_INDEX_SAVE_DELAY_MS, self.save_search_index)
+
+    def save_search_index(self):
+        """在索引线程中把有变化的索引写入缓存文件"""
+        if self._search_save_job is not None:
+            self.root.after_cancel(self._search_save_job)
+            self._search_save_job = None
+        index = self.search_index
+        if index is None:
+            return
+
+        def worker():
+            if not index.dirty:
+                return
+            try:
+                index.save()
+            except OSError as e:
+                self.run_in_ui(self._set_search_status, f'保存索引失败: {str(e)}')
+
+        self._search_executor.submit(worker)
+
+    def _set_search_status(self, message):
+        if self.search_window is not None and self.search_window.winfo_exists():
+            self.search_status.config(text=message)
+
+    def run_search(self):
+        """执行搜索并显示结果"""
+        query = self.search_entry.get().strip()
+        if not query:
+            return
+        if self._search_updating:
+            # 索引更新完成后自动执行
+            self._pending_search = True
+            self._set_search_status('正在更新索引，完成后将自动搜索...')
+            return
+
+        start = time.perf_counter()
+        self.search_results = self.search_index.search(query)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.search_results_tree.delete(*self.search_results_tree.get_children())
+        for i, result in enumerate(self.search_results):
+            rel_path = os.path.relpath(result.path, self.current_folder)
+            self.search_results_tree.insert('', 'end', iid=str(i), values=(rel_path, result.line_no, result.snippet))
+        self._set_search_status(f'找到 {len(self.search_results)} 条结果（{elapsed:.0f} 毫秒）')
+
+    def on_search_result_open(self, event):
+        """打开搜索结果对应的文件，并在目录树中定位"""
+        selection = self.search_results_tree.selection()
+        if not selection:
+            return
+        result = self.search_results[int(selection[0])]
+        self.current_file_path = result.path
+        self.show_file_content(result.path)
+        self.select_item_by_path(result.path)
+        self.root.after_idle(self.goto_line, result.line_no)
+
+    def goto_line(self, line_no):
+        """滚动到指定行并高亮显示"""
+        self.text_edit.tag_remove('search_hit', 1.0, tk.END)
+        self.text_edit.tag_add('search_hit', f'{line_no}.0', f'{line_no}.end')
+        self.text_edit.tag_config('search_hit', background='#ffff99')
+        self.text_edit.mark_set(tk.INSERT, f'{line_no}.0')
+        self.text_edit.see(f'{line_no}.0')
+
     def paste_image(self):
         """从剪贴板粘贴图片到编辑器 - tkinter版本不直接支持图片插入"""
         # tkinter的Text组件不直接支持图片插入，提示用户
@@ -476,6 +1534,8 @@ class DocMenu:
 
 
 def main():
+    # 打包为exe后，建立搜索索引的进程池需要该调用
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = DocMenu(root)
     
@@ -487,9 +1547,14 @@ def main():
     
     # 构建CodeBaseVBA目录路径
     code_base_vba_dir = os.path.join(app_dir, "CodeBaseVBA")
+    code_base_vba_pack = code_base_vba_dir + PACK_EXTENSION
     
+    # 打包后的exe旁边有CodeBaseVBA打包文件时优先使用，启动时只需打开一个文件
+    if getattr(sys, 'frozen', False) and os.path.isfile(code_base_vba_pack):
+        app.current_folder = code_base_vba_pack
+        app.load_directory_tree(code_base_vba_pack)
     # 检查CodeBaseVBA目录是否存在，如果存在则自动加载
-    if os.path.exists(code_base_vba_dir) and os.path.isdir(code_base_vba_dir):
+    elif os.path.exists(code_base_vba_dir) and os.path.isdir(code_base_vba_dir):
         app.current_folder = code_base_vba_dir
         app.load_directory_tree(code_base_vba_dir)
     
@@ -0,0 +1,43 @@
+"""doc_search 全文索引的测试（python -m pytest）"""
+import os
+
+from doc_search import SearchIndex
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def test_update_paths(tmp_path):
+    folder = str(tmp_path / 'docs')
+    a = os.path.join(folder, 'a.txt')
+    b = os.path.join(folder, 'sub', 'b.txt')
+    _write(a, 'alpha\n')
+    _write(b, 'beta\n')
+    index = SearchIndex(folder, str(tmp_path / 'search.idx'))
+    assert index.update() == (2, 0)
+    index.save()
+    assert not index.dirty
+
+    _write(a, 'alpha\ngamma\n')
+    os.remove(b)
+    c = os.path.join(folder, 'c.txt')
+    _write(c, 'gamma\n')
+    assert index.update_paths([a, b, c, os.path.join(folder, 'missing.txt')]) == (2, 1)
+    assert index.dirty
+    assert sorted(result.path for result in index.search('gamma')) == [a, c]
+    assert index.search('beta') == []
+    # 结果与完整更新一致
+    assert index.update() == (0, 0)
+
+    # 文件夹以外的路径和被忽略目录中的文件不会被索引
+    ignored = os.path.join(folder, '.git', 'd.txt')
+    _write(ignored, 'gamma\n')
+    assert index.update_paths([ignored, str(tmp_path / 'other.txt')]) == (0, 0)
+
+    # 保存过的索引加载后没有未写入的修改
+    loaded = SearchIndex(folder, str(tmp_path / 'search.idx'))
+    assert loaded.load() and not loaded.dirty
+    assert len(loaded.files) == 2
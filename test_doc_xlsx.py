@@ -0,0 +1,93 @@
+"""doc_xlsx 的读写测试（python -m pytest）"""
+import itertools
+import zipfile
+
+import doc_xlsx
+from doc_xlsx import (XlsxReader, write_xlsx, has_separator, rows_to_text, text_to_rows,
+                      NUMBER, STRING, BOOLEAN)
+
+
+def _read(path, typed=False):
+    with XlsxReader(path) as reader:
+        return list(reader.iter_rows(typed))
+
+
+def test_xlsx_round_trip(tmp_path):
+    rows = [['名称', '数量', ''], ['a & <b>', '12', '3.5'], [], ['', '', '末尾'], ['  空格  ', '-1e3', 'TRUE']]
+    path = str(tmp_path / 'test.xlsx')
+    write_xlsx(path, iter(rows))
+    # 末尾的空单元格不保存
+    assert _read(path) == [['名称', '数量'], ['a & <b>', '12', '3.5'], [], ['', '', '末尾'],
+                           ['  空格  ', '-1e3', 'TRUE']]
+
+
+def test_cell_types_kept(tmp_path):
+    rows = [[('1.50', STRING), ('007', STRING), ('12', NUMBER), ('TRUE', BOOLEAN), ('3', STRING)]]
+    path = str(tmp_path / 'types.xlsx')
+    write_xlsx(path, rows)
+    assert _read(path, typed=True) == rows
+    # 只有文本的单元格按内容判断类型，带前导零的仍是字符串
+    write_xlsx(path, [['1.50', '007', 'TRUE']])
+    assert _read(path, typed=True) == [[('1.50', NUMBER), ('007', STRING), ('TRUE', STRING)]]
+
+
+def _save_unchanged(source, target, loaded_rows):
+    """模拟编辑器：前 loaded_rows 行转换为文本后原样转换回来，其余行从原文件流式复制"""
+    with XlsxReader(source) as reader:
+        rows = reader.iter_rows(typed=True)
+        loaded = list(itertools.islice(rows, loaded_rows))
+        edited = text_to_rows(rows_to_text(loaded), loaded)
+        write_xlsx(target, itertools.chain(edited, rows))
+
+
+def test_unchanged_save_is_identical(tmp_path):
+    rows = [[('a', STRING), ('1.50', STRING)], [], [], [('', STRING), ('2', NUMBER)], [], [('末尾', STRING)], []]
+    source = str(tmp_path / 'source.xlsx')
+    write_xlsx(source, rows)
+    original = _read(source, typed=True)
+    for loaded_rows in range(len(original) + 1):
+        target = str(tmp_path / f'saved{loaded_rows}.xlsx')
+        _save_unchanged(source, target, loaded_rows)
+        assert _read(target, typed=True) == original
+
+
+def test_blank_rows_kept():
+    loaded = [[('a', STRING), ('b', STRING)], [], []]
+    assert rows_to_text(loaded) == 'a\tb\n\n\n'
+    assert len(text_to_rows('a\tb\n\n\n', loaded)) == 3
+    assert text_to_rows('') == []
+
+
+def test_edited_cells():
+    loaded = [[('007', STRING), ('5', NUMBER), ('', STRING)]]
+    rows = text_to_rows('1.50\t6\t7\tnew\n', loaded)
+    # 原字符串单元格改为数字样式的文本后仍是字符串，其余按内容判断
+    assert rows == [[('1.50', STRING), '6', '7', 'new']]
+
+
+def test_has_separator():
+    assert has_separator([('a\tb', STRING)])
+    assert has_separator(['x', 'line\nbreak'])
+    assert not has_separator([('a b', STRING), 'c'])
+
+
+def _write_shared_strings_xlsx(path, strings):
+    items = ''.join(f'<si><t>{s}</t></si>' for s in strings)
+    cells = ''.join(f'<row r="{i + 1}"><c r="A{i + 1}" t="s"><v>{i}</v></c></row>' for i in range(len(strings)))
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('xl/sharedStrings.xml', f'<sst xmlns="{doc_xlsx.NS_MAIN}">{items}</sst>')
+        zf.writestr('xl/worksheets/sheet1.xml',
+                    f'<worksheet xmlns="{doc_xlsx.NS_MAIN}"><sheetData>{cells}</sheetData></worksheet>')
+
+
+def test_shared_strings_spill(tmp_path, monkeypatch):
+    strings = [f'字符串{i}' for i in range(300)]
+    path = str(tmp_path / 'shared.xlsx')
+    _write_shared_strings_xlsx(path, strings)
+    assert _read(path) == [[s] for s in strings]
+    monkeypatch.setattr(doc_xlsx, 'SHARED_STRINGS_MEMORY', 100)
+    with XlsxReader(path) as reader:
+        assert reader.shared_strings._file is not None
+        assert len(reader.shared_strings) == len(strings)
+        assert list(reader.iter_rows()) == [[s] for s in strings]
+        assert reader.shared_strings[7] == '字符串7'
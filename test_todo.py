@@ -0,0 +1,175 @@
+"""待办事项的保存、归档分段和统计列的测试（python -m pytest）"""
+import os
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from todo_model import TodoItem, TodoModel, PRIORITIES
+from todo_stats import TaskColumns
+from todo_store import TodoStore, SegmentColumns
+
+
+def _random_items(rng, count):
+    items = []
+    for i in range(count):
+        start = date(2025, 1, 1) + timedelta(days=rng.randrange(500)) if rng.random() > 0.05 else None
+        due = start + timedelta(days=rng.randrange(-5, 30)) if start and rng.random() > 0.3 else None
+        completed = start + timedelta(days=rng.randrange(-3, 60)) if start and rng.random() > 0.4 else None
+        item = TodoItem(f'事项{i}', start, due, completed, rng.choice(PRIORITIES))
+        item.start_date = start  # TodoItem 会把空的开始日期改为今天
+        items.append(item)
+    return items
+
+
+def _open(path):
+    """按保存的数据打开模型，并加入统计用的列（包括已归档的事项）"""
+    model = TodoModel(TodoStore(path))
+    model.load()
+    columns = TaskColumns()
+    model.add_index(columns)
+    return model, columns
+
+
+def _column_rows(columns):
+    return sorted(zip(columns.ids, columns.start, columns.due, columns.completed, columns.priority))
+
+
+def _segment_counts(store):
+    return {summary.key: summary.count for summary in store.segments()}
+
+
+@pytest.fixture
+def archived(tmp_path):
+    """保存了一批事项并把较早完成的事项归档后的数据目录，返回 (目录, 归档前的所有事项)"""
+    model = TodoModel(TodoStore(str(tmp_path)))
+    with model.batch():
+        for month in range(1, 7):
+            for day in (3, 17):
+                model.add(TodoItem(f'{month}-{day}', date(2025, month, 1), date(2025, month, 10),
+                                   date(2025, month, day)))
+        model.add(TodoItem('未完成', date(2025, 6, 1), date(2025, 7, 1)))
+    items = list(model.todo_items + model.completed_items)
+    assert model.archive_completed(date(2025, 5, 1)) == 8
+    return str(tmp_path), items
+
+
+def test_archive_reload(archived):
+    path, items = archived
+    model, columns = _open(path)
+    assert _segment_counts(model.store) == {'2025-01': 2, '2025-02': 2, '2025-03': 2, '2025-04': 2}
+    assert len(model.todo_items) == 1
+    assert sorted(item.text for item in model.completed_items) == ['5-17', '5-3', '6-17', '6-3']
+    # 统计用的列包括已归档的事项
+    assert _column_rows(columns) == _column_rows(_fresh_columns(items))
+    assert [item.text for item in model.load_segment('2025-02')] == ['2-3', '2-17']
+    assert all(model.is_archived(item) for item in model.load_segment('2025-02'))
+
+
+def _fresh_columns(items):
+    columns = TaskColumns()
+    for item in items:
+        columns.add(item)
+    return columns
+
+
+def test_unarchive_round_trip(archived):
+    path, items = archived
+    model, columns = _open(path)
+    rows = _column_rows(columns)
+    segment = model.load_segment('2025-03')
+    model.uncomplete(segment[0])
+    model.update(model.load_segment('2025-01')[1], text='改过')
+    assert not model.is_archived(segment[0])
+    assert _segment_counts(model.store) == {'2025-01': 1, '2025-02': 2, '2025-03': 1, '2025-04': 2}
+    # 列中同一事项只保留一行，完成日期随之清除
+    assert len(columns) == len(items)
+    assert sorted(columns.ids) == [row[0] for row in rows]
+    assert columns.completed[columns.rows[segment[0].id]] == 0
+
+    model, columns = _open(path)
+    assert sorted(item.text for item in model.todo_items) == ['3-3', '未完成']
+    assert '改过' in [item.text for item in model.completed_items]
+    assert _segment_counts(model.store) == {'2025-01': 1, '2025-02': 2, '2025-03': 1, '2025-04': 2}
+    assert _column_rows(columns) == _column_rows(_fresh_columns(model.todo_items + model.completed_items + [
+        item for summary in model.store.segments() for item in model.store.load_segment(summary.key)]))
+
+
+def test_delete_archived(archived):
+    path, items = archived
+    model, columns = _open(path)
+    model.delete_many(model.load_segment('2025-04') + model.load_segment('2025-02')[:1])
+    assert _segment_counts(model.store) == {'2025-01': 2, '2025-02': 1, '2025-03': 2}
+    assert len(columns) == len(items) - 3
+
+    model, columns = _open(path)
+    assert _segment_counts(model.store) == {'2025-01': 2, '2025-02': 1, '2025-03': 2}
+    assert len(columns) == len(items) - 3
+    assert not os.path.exists(os.path.join(model.store.archive_path, '2025-04.json.gz'))
+
+
+def test_unarchive_with_writer(archived):
+    """有写入线程时，保存了包含移回事项的快照之后才从分段中移除"""
+    from doc_writer import BackgroundWriter
+    path, items = archived
+    store = TodoStore(path)
+    errors = []
+    writer = BackgroundWriter(lambda path, elapsed, error: errors.append(error), write=store.write_snapshot)
+    model = TodoModel(store, writer)
+    model.load()
+    with model.batch():
+        model.uncomplete_many(model.load_segment('2025-01'))
+        model.add(TodoItem('新事项'))
+    writer.flush()
+    assert errors == [None]
+    model, columns = _open(path)
+    assert '2025-01' not in _segment_counts(model.store)
+    assert sorted(item.text for item in model.todo_items) == ['1-17', '1-3', '新事项', '未完成']
+
+
+def test_save_keeps_order(tmp_path):
+    model = TodoModel(TodoStore(str(tmp_path)))
+    with model.batch():
+        for i in range(5):
+            model.add(TodoItem(f't{i}', date(2025, 1, 1)))
+        for i in range(3):
+            model.add(TodoItem(f'c{i}', date(2025, 1, 1), completed_date=date(2025, 1, 2)))
+    # 修改不改变位置，完成和移回的事项排到所在列表的末尾
+    model.update(model.todo_items[0], text='t0改过')
+    model.update(model.completed_items[1], priority='紧急')
+    model.complete(model.todo_items[2])
+    model.uncomplete(model.completed_items[0])
+    todo = [item.text for item in model.todo_items]
+    completed = [item.text for item in model.completed_items]
+    assert todo == ['t0改过', 't1', 't3', 't4', 'c0']
+    assert completed == ['c1', 'c2', 't2']
+
+    model, columns = _open(str(tmp_path))
+    assert [item.text for item in model.todo_items] == todo
+    assert [item.text for item in model.completed_items] == completed
+
+
+def test_segment_columns_bytes():
+    items = _random_items(random.Random(1), 50)
+    for item_id, item in enumerate(items, 1):
+        item.id = item_id
+    columns = SegmentColumns.from_items(items)
+    data = columns.to_bytes()
+    assert len(data) == len(items) * SegmentColumns.ROW_SIZE
+    loaded = SegmentColumns.from_bytes(data, len(items))
+    for name in ('ids', 'start', 'due', 'completed', 'priority'):
+        assert getattr(loaded, name) == getattr(columns, name)
+
+
+@pytest.mark.parametrize('damage', ['missing', 'short'])
+def test_segment_columns_rebuilt(archived, damage):
+    path, items = archived
+    cols_path = os.path.join(path, 'archive', '2025-02.cols')
+    if damage == 'missing':
+        os.remove(cols_path)
+    else:
+        with open(cols_path, 'r+b') as f:
+            f.truncate(SegmentColumns.ROW_SIZE + 3)
+    model, columns = _open(path)
+    assert _column_rows(columns) == _column_rows(_fresh_columns(items))
+    assert os.path.getsize(cols_path) == 2 * SegmentColumns.ROW_SIZE
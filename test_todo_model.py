@@ -0,0 +1,48 @@
+"""todo_model 中各个索引的测试（python -m pytest）"""
+import random
+from datetime import date, timedelta
+
+from todo_model import TodoItem, TodoModel, NextUpIndex, PRIORITIES, next_up_key
+
+
+def _random_items(rng, count):
+    items = []
+    for i in range(count):
+        start = date(2025, 1, 1) + timedelta(days=rng.randrange(500))
+        due = start + timedelta(days=rng.randrange(-5, 30)) if rng.random() > 0.3 else None
+        completed = start + timedelta(days=rng.randrange(-3, 60)) if rng.random() > 0.4 else None
+        items.append(TodoItem(f'事项{i}', start, due, completed, rng.choice(PRIORITIES)))
+    return items
+
+
+def test_next_up_order():
+    rng = random.Random(2)
+    model = TodoModel()
+    for item in _random_items(rng, 300):
+        model.add(item)
+    for _ in range(200):
+        item = rng.choice(model.todo_items + model.completed_items)
+        op = rng.randrange(4)
+        if op == 0:
+            model.update(item, priority=rng.choice(PRIORITIES))
+        elif op == 1:
+            model.shift_due_dates([item], rng.randint(-10, 10))
+        elif op == 2:
+            (model.uncomplete if item.completed_date else model.complete)(item)
+        else:
+            model.delete(item)
+    expected = sorted(model.todo_items, key=next_up_key)
+    assert model.next_up.top(len(expected) + 5) == expected
+    assert model.next_up.top(10) == expected[:10]
+    assert len(model.next_up) == len(model.todo_items)
+
+
+def test_next_up_index_remove_last():
+    index = NextUpIndex()
+    items = [TodoItem(str(i), date(2025, 1, 1), date(2025, 1, 10 - i)) for i in range(5)]
+    for item_id, item in enumerate(items, 1):
+        item.id = item_id
+        index.add(item)
+    index.remove(items[0])
+    index.remove(items[4])
+    assert index.top(5) == [items[3], items[2], items[1]]
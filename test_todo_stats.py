@@ -0,0 +1,73 @@
+"""todo_stats 的测试：NumPy 与纯Python实现的结果一致，增量计数与重新统计的结果一致（python -m pytest）"""
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from todo_model import TodoItem, TodoModel, PRIORITIES
+from todo_stats import TaskColumns, TaskStats
+
+TODAY = date(2026, 6, 1)
+
+
+def _random_items(rng, count):
+    items = []
+    for i in range(count):
+        start = date(2025, 1, 1) + timedelta(days=rng.randrange(500)) if rng.random() > 0.05 else None
+        due = start + timedelta(days=rng.randrange(-5, 30)) if start and rng.random() > 0.3 else None
+        completed = start + timedelta(days=rng.randrange(-3, 60)) if start and rng.random() > 0.4 else None
+        item = TodoItem(f'事项{i}', start, due, completed, rng.choice(PRIORITIES))
+        item.start_date = start  # TodoItem 会把空的开始日期改为今天
+        items.append(item)
+    return items
+
+
+def _fresh_columns(items):
+    columns = TaskColumns()
+    for item in items:
+        columns.add(item)
+    return columns
+
+
+def _report_key(report):
+    return (report.lead_count, report.lead_mean and round(report.lead_mean, 9),
+            {p: round(v, 9) for p, v in report.lead_percentiles.items()},
+            report.on_time, report.late, report.no_due,
+            [(w.week, w.started, w.completed, w.rate, w.backlog) for w in report.weeks])
+
+
+def test_stats_numpy_parity():
+    pytest.importorskip('numpy')
+    items = _random_items(random.Random(3), 2000)
+    model = TodoModel()
+    numpy_columns, python_columns = TaskColumns(), TaskColumns()
+    model.add_index(numpy_columns)
+    model.add_index(python_columns)
+    with model.batch():
+        for item in items:
+            model.add(item)
+    numpy_stats = TaskStats(numpy_columns)
+    python_stats = TaskStats(python_columns, use_numpy=False)
+    assert numpy_stats.use_numpy
+    assert _report_key(numpy_stats.report(TODAY)) == _report_key(python_stats.report(TODAY))
+    assert numpy_stats.report(TODAY).lead_count > 0
+
+
+def test_stats_incremental():
+    """修改事项后按增量计数生成的报表与重新统计的结果相同"""
+    rng = random.Random(4)
+    model = TodoModel()
+    columns = TaskColumns()
+    model.add_index(columns)
+    stats = TaskStats(columns, use_numpy=False)
+    for item in _random_items(rng, 500):
+        model.add(item)
+    stats.report(TODAY)
+    model.complete_many(model.todo_items[:50])
+    model.uncomplete_many(model.completed_items[:20])
+    model.delete_many(model.completed_items[:30])
+    model.update_many(model.todo_items[:40], priority='紧急')
+    model.shift_due_dates(model.todo_items[:60], 7)
+    fresh = TaskStats(_fresh_columns(model.todo_items + model.completed_items), use_numpy=False)
+    assert _report_key(stats.report(TODAY)) == _report_key(fresh.report(TODAY))
+    assert stats.report(TODAY) is stats.report(TODAY)
@@ -0,0 +1,506 @@
+import heapq
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+# 优先级，从低到高
+PRIORITIES = ("普通", "重要", "紧急", "重要紧急")
+
+
+class TodoItem:
+    def __init__(self, text, start_date=None, due_date=None, completed_date=None, priority="普通"):
+        self.id = None  # 加入 TodoModel 时分配
+        self.order = None  # 在所在列表中的先后序号，每次加入列表末尾时由 TodoModel 分配
+        self.text = text
+        self.start_date = start_date or date.today()
+        self.due_date = due_date
+        self.completed_date = completed_date
+        self.priority = priority  # "普通", "重要", "紧急", "重要紧急"
+
+    def mark_completed(self):
+        self.completed_date = date.today()
+
+    def mark_uncompleted(self):
+        self.completed_date = None
+
+
+# 快照中保存的事项记录（不可变）
+TodoRecord = namedtuple('TodoRecord', ('id', 'text', 'priority', 'start_date', 'due_date', 'completed_date'))
+
+
+def record_of(item):
+    return TodoRecord(item.id, item.text, item.priority, item.start_date, item.due_date, item.completed_date)
+
+
+class Snapshot:
+    """某一时刻所有未归档事项的只读快照
+
+    发布后不会再被修改，其他线程可以不加锁地遍历；同一快照中的记录总是来自同一个完整的修改之后。
+    遍历大量记录的工作线程可以用 iter_chunks() 分块处理，并在分块之间调用 time.sleep(0) 让出GIL，
+    避免界面线程等待。
+    """
+
+    def __init__(self, version, chunks, count):
+        self.version = version
+        self._chunks = chunks  # 分块号 -> {序号: TodoRecord}，按序号从小到大
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for chunk in self._chunks.values():
+            yield from chunk.values()
+
+    def iter_chunks(self):
+        """按分块返回记录，每块最多 SnapshotIndex.CHUNK_SIZE 项"""
+        for chunk in self._chunks.values():
+            yield chunk.values()
+
+    def todo(self):
+        return [record for record in self if record.completed_date is None]
+
+    def completed(self):
+        return [record for record in self if record.completed_date is not None]
+
+
+class SnapshotIndex:
+    """按事项的序号（TodoItem.order）分块保存不可变记录，写时复制
+
+    修改时只复制被修改的分块（发布过的分块不会再被修改），publish() 时把分块表复制一份作为新快照，
+    通过一次引用赋值发布，因此读取快照的线程不需要加锁，也不会阻塞修改事项的界面线程。
+
+    事项加入列表末尾时总是分配更大的序号，因此按分块遍历的顺序与 todo_items、completed_items 中的
+    顺序一致，保存后重新加载不会改变事项的先后。修改事项时先 remove 再 add，remove 只做标记，
+    同一序号再次 add 时原位替换记录，publish() 时才真正删除仍被标记的记录。
+    """
+    CHUNK_SIZE = 512
+
+    def __init__(self):
+        self._chunks = {}
+        self._private = set()  # 发布后已复制过、可以直接修改的分块
+        self._removed = set()  # 已移除、等待 publish() 删除的序号
+        self._count = 0
+        self.current = Snapshot(0, {}, 0)
+
+    def _writable(self, order):
+        number = order // self.CHUNK_SIZE
+        if number not in self._private:
+            self._chunks[number] = dict(self._chunks.get(number, ()))
+            self._private.add(number)
+        return self._chunks[number]
+
+    def add(self, item):
+        chunk = self._writable(item.order)
+        if item.order in self._removed:
+            self._removed.discard(item.order)
+            self._count += 1
+        elif item.order not in chunk:
+            self._count += 1
+        chunk[item.order] = record_of(item)
+
+    def remove(self, item):
+        chunk = self._writable(item.order)
+        if item.order in chunk and item.order not in self._removed:
+            self._removed.add(item.order)
+            self._count -= 1
+
+    def publish(self):
+        """发布当前状态为新快照（没有修改时返回原快照）"""
+        if self._private:
+            for order in self._removed:
+                del self._chunks[order // self.CHUNK_SIZE][order]
+            self._removed.clear()
+            for number in self._private:
+                if not self._chunks[number]:
+                    del self._chunks[number]
+            self._private.clear()
+            self.current = Snapshot(self.current.version + 1, dict(self._chunks), self._count)
+        return self.current
+
+
+class DueDateIndex:
+    """未完成事项按计划完成日期分桶的计数
+
+    由 TodoModel 在每次添加、修改、完成和删除时增量更新，显示一个月的日历只需查询当月的日期，
+    与事项总数无关。
+    """
+
+    def __init__(self):
+        self.counts = {}  # 日期 -> 该日到期的未完成事项数
+
+    def add(self, item):
+        if item.completed_date is None and item.due_date is not None:
+            self.counts[item.due_date] = self.counts.get(item.due_date, 0) + 1
+
+    def remove(self, item):
+        if item.completed_date is None and item.due_date is not None:
+            count = self.counts[item.due_date] - 1
+            if count:
+                self.counts[item.due_date] = count
+            else:
+                del self.counts[item.due_date]
+
+    def count(self, day):
+        return self.counts.get(day, 0)
+
+
+def segment_key(day):
+    """归档分段按完成日期的年月划分"""
+    return day.strftime('%Y-%m')
+
+
+def next_up_key(item):
+    """“下一步”排序键：优先级高的在前，然后按计划完成日期、开始日期（未设置的排在后面）"""
+    rank = PRIORITIES.index(item.priority) if item.priority in PRIORITIES else 0
+    return (-rank, item.due_date or date.max, item.start_date or date.max, item.id)
+
+
+class NextUpIndex:
+    """按 next_up_key 排列未完成事项的索引堆
+
+    pos 记录每个事项在堆数组中的位置，因此插入、删除和修改排序键（删除后重新插入）都是 O(log n)；
+    top(n) 不修改堆，用一个候选堆从根开始展开，代价为 O(n log n)。
+    """
+
+    def __init__(self):
+        self.heap = []  # [(排序键, 事项), ...]
+        self.pos = {}   # 事项id -> 在 heap 中的位置
+
+    def __len__(self):
+        return len(self.heap)
+
+    def add(self, item):
+        if item.completed_date is not None:
+            return
+        self.heap.append((next_up_key(item), item))
+        self.pos[item.id] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+
+    def remove(self, item):
+        index = self.pos.pop(item.id, None)
+        if index is None:
+            return
+        last = self.heap.pop()
+        if index == len(self.heap):
+            return
+        self.heap[index] = last
+        self.pos[last[1].id] = index
+        # 替换上来的元素可能需要上移或下移
+        self._sift_up(index)
+        self._sift_down(self.pos[last[1].id])
+
+    def _swap(self, i, j):
+        heap = self.heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self.pos[heap[i][1].id] = i
+        self.pos[heap[j][1].id] = j
+
+    def _sift_up(self, index):
+        heap = self.heap
+        while index > 0:
+            parent = (index - 1) // 2
+            if heap[index][0] >= heap[parent][0]:
+                break
+            self._swap(index, parent)
+            index = parent
+
+    def _sift_down(self, index):
+        heap = self.heap
+        size = len(heap)
+        while True:
+            smallest = index
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < size and heap[child][0] < heap[smallest][0]:
+                    smallest = child
+            if smallest == index:
+                return
+            self._swap(index, smallest)
+            index = smallest
+
+    def top(self, n):
+        """按顺序返回排在最前面的 n 个事项"""
+        heap = self.heap
+        result = []
+        candidates = [(heap[0][0], 0)] if heap else []
+        while candidates and len(result) < n:
+            key, index = heapq.heappop(candidates)
+            result.append(heap[index][1])
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(candidates, (heap[child][0], child))
+        return result
+
+
+def _without(items, removed, ids):
+    """返回去掉 removed 中事项后的列表
+
+    少量事项时原地逐个 list.remove（在C中查找，比重建列表快得多），否则按id集合重建一次，
+    保证批量操作的代价是线性的。
+    """
+    if len(removed) <= 8:
+        for item in removed:
+            items.remove(item)
+        return items
+    return [item for item in items if item.id not in ids]
+
+
+class TodoModel:
+    """待办事项数据
+
+    所有修改都通过该类的方法进行，以便同步更新各个索引：修改前从索引中移除事项，
+    修改后再加入，索引只需实现 add(item) 和 remove(item)。
+
+    传入 store（todo_store.TodoStore）时每次修改后都会保存，在 batch() 中的多次修改只在结束时保存一次；
+    批量方法（complete_many 等）按事项id集合重建列表，代价与选中的事项数和列表长度成线性关系。完成较早的事项可以归档到按月划分的
+    分段中，归档后不再占用内存，分段只在需要显示时才加载（load_segment）。归档时只从普通索引中
+    移除事项，include_archived 为真的索引（统计用的列）继续保留它们，启动时从分段的列文件加入。
+
+    只有界面线程修改事项。其他线程通过 snapshot() 读取最近一次完整修改后的只读快照；
+    传入 writer（doc_writer.BackgroundWriter）时，保存也在写入线程中按快照进行，不占用界面线程。
+    """
+
+    def __init__(self, store=None, writer=None):
+        self.store = store
+        self.writer = writer
+        self.todo_items = []
+        self.completed_items = []
+        self.segments = {}   # 已加载的归档分段 -> [事项, ...]
+        self._archived = {}  # 已加载的归档事项id -> 所在分段
+        self.indexes = []
+        self.due_index = DueDateIndex()
+        self.add_index(self.due_index)
+        self.next_up = NextUpIndex()
+        self.add_index(self.next_up)
+        self.snapshots = SnapshotIndex()
+        self.add_index(self.snapshots)
+        self._next_id = 1
+        self._next_order = 0
+        self._batch_depth = 0
+        self._dirty = False
+
+    def load(self):
+        """从 store 读取保存的事项，返回是否有保存过的数据"""
+        data = self.store.load()
+        if data is None:
+            return False
+        items, next_id = data
+        for item in items:
+            self._insert(item)
+        self._next_id = max(self._next_id, next_id)
+        self.snapshots.publish()
+        return True
+
+    def add_index(self, index):
+        """注册一个索引，并加入已有的所有事项"""
+        self.indexes.append(index)
+        for item in self.todo_items:
+            index.add(item)
+        for item in self.completed_items:
+            index.add(item)
+        if self.store is not None:
+            self._add_archived_rows(index)
+
+    def _add_archived_rows(self, index):
+        if getattr(index, 'include_archived', False):
+            for summary in self.store.segments():
+                index.add_rows(self.store.load_segment_columns(summary.key))
+
+    def _attach(self, item, archiving=False):
+        for index in self.indexes:
+            if not (archiving and getattr(index, 'include_archived', False)):
+                index.add(item)
+
+    def _detach(self, item, archiving=False):
+        for index in self.indexes:
+            if not (archiving and getattr(index, 'include_archived', False)):
+                index.remove(item)
+
+    def snapshot(self):
+        """最近一次完整修改后的只读快照（Snapshot），可以在其他线程中使用"""
+        return self.snapshots.current
+
+    def _save(self):
+        """一次修改完成：发布快照并保存，batch() 中推迟到结束时"""
+        if self._batch_depth:
+            self._dirty = True
+        else:
+            self._commit()
+
+    def _commit(self):
+        self._dirty = False
+        snapshot = self.snapshots.publish()
+        if self.store is None:
+            return
+        if self.writer is not None:
+            self.writer.submit(self.store.data_path, (snapshot, self._next_id))
+        else:
+            self.store.write_snapshot(self.store.data_path, (snapshot, self._next_id))
+
+    @contextmanager
+    def batch(self):
+        """合并多次修改：期间不保存，结束时只保存一次"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._dirty:
+                self._commit()
+
+    def _append_order(self, item):
+        """事项加入列表末尾：分配新的序号，使快照（以及保存的数据）中的顺序与列表一致"""
+        item.order = self._next_order
+        self._next_order += 1
+
+    def _insert(self, item):
+        if item.id is None:
+            item.id = self._next_id
+            self._next_id += 1
+        self._append_order(item)
+        if item.completed_date is None:
+            self.todo_items.append(item)
+        else:
+            self.completed_items.append(item)
+        self._attach(item)
+
+    def add(self, item):
+        """添加事项，已有完成日期的事项加入已完成列表"""
+        self._insert(item)
+        self._save()
+        return item
+
+    def update(self, item, **fields):
+        """修改事项的字段（text、priority、start_date、due_date、completed_date）"""
+        self.update_many([item], **fields)
+
+    def update_many(self, items, **fields):
+        """把多个事项的字段改为相同的值"""
+        self._unarchive_many(items)
+        for item in items:
+            self._detach(item)
+            for name, value in fields.items():
+                setattr(item, name, value)
+            self._attach(item)
+        self._save()
+
+    def shift_due_dates(self, items, days):
+        """把事项的计划完成日期推迟 days 天（负数为提前），没有计划完成日期的事项不变"""
+        items = [item for item in items if item.due_date is not None]
+        self._unarchive_many(items)
+        delta = timedelta(days=days)
+        for item in items:
+            self._detach(item)
+            item.due_date += delta
+            self._attach(item)
+        self._save()
+        return len(items)
+
+    def complete(self, item):
+        """把待办事项移到已完成事项"""
+        self.complete_many([item])
+
+    def complete_many(self, items):
+        items = [item for item in items if item.completed_date is None]
+        ids = {item.id for item in items}
+        for item in items:
+            self._detach(item)
+            item.mark_completed()
+            self._append_order(item)
+            self._attach(item)
+        self.todo_items = _without(self.todo_items, items, ids)
+        self.completed_items.extend(items)
+        self._save()
+
+    def uncomplete(self, item):
+        """把已完成事项（包括已加载的归档事项）移回待办事项"""
+        self.uncomplete_many([item])
+
+    def uncomplete_many(self, items):
+        items = [item for item in items if item.completed_date is not None]
+        self._unarchive_many(items)
+        ids = {item.id for item in items}
+        for item in items:
+            self._detach(item)
+            item.mark_uncompleted()
+            self._append_order(item)
+            self._attach(item)
+        self.completed_items = _without(self.completed_items, items, ids)
+        self.todo_items.extend(items)
+        self._save()
+
+    def delete(self, item):
+        self.delete_many([item])
+
+    def delete_many(self, items):
+        self._unarchive_many(items)
+        ids = {item.id for item in items}
+        for item in items:
+            self._detach(item)
+        removed_todo = [item for item in items if item.completed_date is None]
+        removed_completed = [item for item in items if item.completed_date is not None]
+        self.todo_items = _without(self.todo_items, removed_todo, ids)
+        self.completed_items = _without(self.completed_items, removed_completed, ids)
+        self._save()
+
+    # 归档
+    def is_archived(self, item):
+        return item.id in self._archived
+
+    def archive_summaries(self):
+        """所有归档分段的摘要（todo_store.SegmentSummary），按时间从新到旧"""
+        return self.store.segments() if self.store is not None else []
+
+    def archive_completed(self, before):
+        """把完成日期早于 before 的已完成事项归档，返回归档的事项数"""
+        if self.store is None:
+            return 0
+        groups = {}
+        for item in self.completed_items:
+            if item.completed_date < before:
+                groups.setdefault(segment_key(item.completed_date), []).append(item)
+        if not groups:
+            return 0
+        archived = set()
+        for key, items in groups.items():
+            # 先写分段再保存未归档的事项，中途失败时事项不会丢失（分段按id去重）
+            self.store.add_to_segment(key, items)
+            for item in items:
+                self._detach(item, archiving=True)
+                archived.add(item.id)
+                if key in self.segments:
+                    self.segments[key].append(item)
+                    self._archived[item.id] = key
+        self.completed_items = [item for item in self.completed_items if item.id not in archived]
+        self._save()
+        return len(archived)
+
+    def load_segment(self, key):
+        """加载一个归档分段，返回其中的事项（已加载过时直接返回）"""
+        items = self.segments.get(key)
+        if items is None:
+            items = self.segments[key] = self.store.load_segment(key)
+            for item in items:
+                self._archived[item.id] = key
+        return items
+
+    def _unarchive_many(self, items):
+        """把已加载的归档事项移回已完成列表，每个涉及的分段只重写一次"""
+        groups = {}
+        for item in items:
+            key = self._archived.pop(item.id, None)
+            if key is not None:
+                groups.setdefault(key, []).append(item)
+        if not groups:
+            return
+        for key, group in groups.items():
+            ids = {item.id for item in group}
+            self.segments[key] = [item for item in self.segments[key] if item.id not in ids]
+            self.completed_items.extend(group)
+            for item in group:
+                self._append_order(item)
+                self._attach(item, archiving=True)
+        # 下一个发布的快照包含这些事项，保存它之后再从分段中移除（在写入线程中进行）
+        version = self.snapshots.current.version + 1
+        for key, group in groups.items():
+            self.store.remove_from_segment_after(version, key, [item.id for item in group])
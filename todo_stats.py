@@ -0,0 +1,272 @@
+from array import array
+from datetime import date
+
+from todo_model import PRIORITIES
+
+try:
+    import numpy as np
+except ImportError:  # 没有NumPy时使用纯Python实现
+    np = None
+
+# 没有日期时列中存放的值（date.toordinal() 从1开始）
+NO_DATE = 0
+
+# 耗时统计的百分位数
+PERCENTILES = (50, 90, 95)
+
+
+def week_of(ordinal):
+    """日期序号所在的周（date(1, 1, 1) 是星期一，每周从星期一开始）"""
+    return (ordinal - 1) // 7
+
+
+def week_start(week):
+    return date.fromordinal(week * 7 + 1)
+
+
+class TaskColumns:
+    """按列保存所有事项的日期序号和优先级，供统计使用
+
+    作为 TodoModel 的索引增量维护：添加时追加一行，删除时用最后一行填补空位，都是 O(1)。
+    version 在每次变化时递增，用于判断统计缓存是否过期。
+    归档的事项仍然保留在列中（include_archived），启动时按分段的列文件批量加入。
+    counters（StatCounters）由 TaskStats 第一次统计时建立，之后随每行的增删同步更新。
+    """
+
+    include_archived = True
+
+    def __init__(self):
+        self.start = array('i')
+        self.due = array('i')
+        self.completed = array('i')
+        self.priority = array('b')
+        self.ids = []   # 行 -> 事项id
+        self.rows = {}  # 事项id -> 行
+        self.version = 0
+        self.counters = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, item):
+        start = item.start_date.toordinal() if item.start_date else NO_DATE
+        due = item.due_date.toordinal() if item.due_date else NO_DATE
+        completed = item.completed_date.toordinal() if item.completed_date else NO_DATE
+        priority = PRIORITIES.index(item.priority) if item.priority in PRIORITIES else 0
+        self.rows[item.id] = len(self.ids)
+        self.ids.append(item.id)
+        self.start.append(start)
+        self.due.append(due)
+        self.completed.append(completed)
+        self.priority.append(priority)
+        if self.counters is not None:
+            self.counters.update(start, due, completed, priority, 1)
+        self.version += 1
+
+    def add_rows(self, columns):
+        """批量加入一个归档分段的列（todo_store.SegmentColumns）"""
+        first = len(self.ids)
+        self.ids.extend(columns.ids)
+        self.rows.update(zip(columns.ids, range(first, len(self.ids))))
+        self.start.extend(columns.start)
+        self.due.extend(columns.due)
+        self.completed.extend(columns.completed)
+        self.priority.extend(columns.priority)
+        if self.counters is not None:
+            for row in zip(columns.start, columns.due, columns.completed, columns.priority):
+                self.counters.update(*row, 1)
+        self.version += 1
+
+    def remove(self, item):
+        row = self.rows.pop(item.id, None)
+        if row is None:
+            return
+        if self.counters is not None:
+            self.counters.update(self.start[row], self.due[row], self.completed[row], self.priority[row], -1)
+        last = len(self.ids) - 1
+        for column in (self.start, self.due, self.completed, self.priority):
+            column[row] = column[last]
+            column.pop()
+        last_id = self.ids.pop()
+        if row != last:
+            self.ids[row] = last_id
+            self.rows[last_id] = row
+        self.version += 1
+
+
+class WeekStats:
+    def __init__(self, week, started, completed, rate, backlog):
+        self.week = week            # 周序号，用 week_start() 转为日期
+        self.started = started      # 当周开始的事项数
+        self.completed = completed  # 当周完成的事项数
+        self.rate = rate            # 完成率：当周完成数 / (周初未完成数 + 当周开始数)，无事项时为 None
+        self.backlog = backlog      # 周末各优先级的未完成事项数（按 PRIORITIES 顺序）
+
+
+class Report:
+    def __init__(self):
+        self.weeks = []          # [WeekStats, ...]，从早到晚
+        self.lead_count = 0      # 有开始日期的已完成事项数
+        self.lead_mean = None    # 平均耗时（天）
+        self.lead_percentiles = {}
+        self.on_time = 0         # 在计划完成日期当天或之前完成
+        self.late = 0
+        self.no_due = 0          # 已完成但没有计划完成日期
+
+
+def _bump(counts, key, delta):
+    count = counts.get(key, 0) + delta
+    if count:
+        counts[key] = count
+    else:
+        del counts[key]
+
+
+class StatCounters:
+    """统计报表所需的计数，可以按行增量更新
+
+    按 (优先级, 周) 统计开始和完成的事项数，按天数统计完成耗时的分布，生成报表的代价只与
+    周数和不同的耗时天数有关，与事项数无关。
+    """
+
+    def __init__(self):
+        self.started = {}   # (优先级, 周) -> 当周开始的事项数
+        self.finished = {}  # (优先级, 周) -> 当周完成的事项数（完成日期早于开始日期时按开始的那一周计）
+        self.leads = {}     # 耗时天数 -> 事项数
+        self.lead_sum = 0
+        self.on_time = 0
+        self.late = 0
+        self.no_due = 0
+
+    def update(self, start, due, completed, priority, delta):
+        """加入（delta 为1）或移除（delta 为-1）一行的日期序号和优先级"""
+        if completed != NO_DATE:
+            if due == NO_DATE:
+                self.no_due += delta
+            elif completed <= due:
+                self.on_time += delta
+            else:
+                self.late += delta
+        if start == NO_DATE:
+            return
+        _bump(self.started, (priority, week_of(start)), delta)
+        if completed != NO_DATE:
+            _bump(self.leads, completed - start, delta)
+            self.lead_sum += (completed - start) * delta
+            _bump(self.finished, (priority, max(week_of(completed), week_of(start))), delta)
+
+    def report(self, today):
+        report = Report()
+        report.on_time = self.on_time
+        report.late = self.late
+        report.no_due = self.no_due
+        report.lead_count = sum(self.leads.values())
+        if report.lead_count:
+            report.lead_mean = self.lead_sum / report.lead_count
+            leads = sorted(self.leads.items())
+            report.lead_percentiles = {p: _percentile(leads, report.lead_count, p) for p in PERCENTILES}
+        if not self.started:
+            return report
+
+        first = min(week for _, week in self.started)
+        last = max([week_of(today.toordinal())] + [week for _, week in self.finished])
+        backlog = [0] * len(PRIORITIES)
+        open_count = 0
+        for week in range(first, last + 1):
+            week_started = week_completed = 0
+            for p in range(len(PRIORITIES)):
+                s = self.started.get((p, week), 0)
+                c = self.finished.get((p, week), 0)
+                week_started += s
+                week_completed += c
+                backlog[p] += s - c
+            denominator = open_count + week_started
+            rate = week_completed / denominator if denominator else None
+            report.weeks.append(WeekStats(week, week_started, week_completed, rate, list(backlog)))
+            open_count += week_started - week_completed
+        return report
+
+
+class TaskStats:
+    """统计报表，结果按 TaskColumns.version 缓存
+
+    第一次统计时按列批量建立计数（StatCounters）：有NumPy时用 unique 等向量运算，否则逐行统计，
+    两者结果相同。之后计数随 TaskColumns 的增删同步更新，修改事项后重新生成报表不再遍历所有行。
+    """
+
+    def __init__(self, columns, use_numpy=True):
+        self.columns = columns
+        self.use_numpy = use_numpy and np is not None
+        self._cache_key = None
+        self._report = None
+
+    def report(self, today=None):
+        today = today or date.today()
+        if self.columns.counters is None:
+            self.columns.counters = self._count_numpy() if self.use_numpy else self._count_python()
+        key = (self.columns.version, today)
+        if key != self._cache_key:
+            self._report = self.columns.counters.report(today)
+            self._cache_key = key
+        return self._report
+
+    def _count_numpy(self):
+        cols = self.columns
+        counters = StatCounters()
+        if not len(cols):
+            return counters
+        # astype 会复制一份，避免NumPy持有 array 的缓冲区导致之后无法追加
+        start = np.frombuffer(cols.start, dtype=np.int32).astype(np.int64)
+        due = np.frombuffer(cols.due, dtype=np.int32).astype(np.int64)
+        completed = np.frombuffer(cols.completed, dtype=np.int32).astype(np.int64)
+        priority = np.frombuffer(cols.priority, dtype=np.int8).astype(np.int64)
+
+        done = completed != NO_DATE
+        has_start = start != NO_DATE
+        with_due = done & (due != NO_DATE)
+        counters.on_time = int(np.count_nonzero(completed[with_due] <= due[with_due]))
+        counters.late = int(np.count_nonzero(with_due)) - counters.on_time
+        counters.no_due = int(np.count_nonzero(done)) - int(np.count_nonzero(with_due))
+
+        finished = done & has_start
+        lead = (completed - start)[finished]
+        values, counts = np.unique(lead, return_counts=True)
+        counters.leads = dict(zip(values.tolist(), counts.tolist()))
+        counters.lead_sum = int(lead.sum())
+
+        start_weeks = (start - 1) // 7
+        done_weeks = np.maximum((completed - 1) // 7, start_weeks)
+        counters.started = _count_pairs(priority[has_start], start_weeks[has_start])
+        counters.finished = _count_pairs(priority[finished], done_weeks[finished])
+        return counters
+
+    def _count_python(self):
+        cols = self.columns
+        counters = StatCounters()
+        for row in zip(cols.start, cols.due, cols.completed, cols.priority):
+            counters.update(*row, 1)
+        return counters
+
+
+def _count_pairs(priority, weeks):
+    """按 (优先级, 周) 计数，返回字典"""
+    levels = len(PRIORITIES)
+    keys, counts = np.unique(weeks * levels + priority, return_counts=True)
+    return {(key % levels, key // levels): count for key, count in zip(keys.tolist(), counts.tolist())}
+
+
+def _percentile(sorted_counts, total, percent):
+    """按 [(值, 个数), ...] 计算线性插值的百分位数（与 numpy.percentile 的默认方法相同）"""
+    position = (total - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, total - 1)
+    lower_value = upper_value = None
+    seen = 0
+    for value, count in sorted_counts:
+        seen += count
+        if lower_value is None and seen > lower:
+            lower_value = value
+        if seen > upper:
+            upper_value = value
+            break
+    return lower_value + (upper_value - lower_value) * (position - lower)
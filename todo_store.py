@@ -0,0 +1,254 @@
+import os
+import json
+import gzip
+import time
+import threading
+from array import array
+from datetime import date
+
+from doc_writer import atomic_write_bytes
+from todo_model import TodoItem, PRIORITIES
+
+# 数据文件格式版本
+DATA_VERSION = 1
+
+DATA_FILE_NAME = 'tasks.json'
+ARCHIVE_DIR_NAME = 'archive'
+ARCHIVE_INDEX_NAME = 'index.json'
+
+# 保存时每编码多少项让出一次GIL
+YIELD_EVERY = 512
+
+
+def data_dir():
+    """返回保存待办事项的目录（不存在时自动创建），环境变量 TODOLIST_DATA_DIR 可以指定其他位置"""
+    path = os.environ.get('TODOLIST_DATA_DIR') or os.path.join(os.path.expanduser('~'), '.todolist')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _date_str(value):
+    return value.isoformat() if value else None
+
+
+def _parse_date(value):
+    return date.fromisoformat(value) if value else None
+
+
+def item_to_dict(item):
+    return {
+        'id': item.id,
+        'text': item.text,
+        'priority': item.priority,
+        'start': _date_str(item.start_date),
+        'due': _date_str(item.due_date),
+        'completed': _date_str(item.completed_date),
+    }
+
+
+def item_from_dict(data):
+    item = TodoItem(data['text'], _parse_date(data['start']), _parse_date(data['due']),
+                    _parse_date(data['completed']), data['priority'])
+    item.id = data['id']
+    return item
+
+
+class SegmentSummary:
+    """归档分段的摘要：事项数和完成日期范围"""
+
+    def __init__(self, key, count, first, last):
+        self.key = key
+        self.count = count
+        self.first = first
+        self.last = last
+
+
+class SegmentColumns:
+    """归档分段中所有事项的日期序号和优先级（供统计使用，无需加载分段本身）"""
+
+    # 每项在列文件中占用的字节数
+    ROW_SIZE = sum(array(code).itemsize for code in 'qiiib')
+
+    def __init__(self, ids=None, start=None, due=None, completed=None, priority=None):
+        self.ids = ids if ids is not None else array('q')
+        self.start = start if start is not None else array('i')
+        self.due = due if due is not None else array('i')
+        self.completed = completed if completed is not None else array('i')
+        self.priority = priority if priority is not None else array('b')
+
+    @classmethod
+    def from_items(cls, items):
+        columns = cls()
+        for item in items:
+            columns.ids.append(item.id)
+            columns.start.append(item.start_date.toordinal() if item.start_date else 0)
+            columns.due.append(item.due_date.toordinal() if item.due_date else 0)
+            columns.completed.append(item.completed_date.toordinal() if item.completed_date else 0)
+            columns.priority.append(PRIORITIES.index(item.priority) if item.priority in PRIORITIES else 0)
+        return columns
+
+    def to_bytes(self):
+        return b''.join(column.tobytes() for column in (self.ids, self.start, self.due, self.completed, self.priority))
+
+    @classmethod
+    def from_bytes(cls, data, count):
+        columns = cls()
+        offset = 0
+        for column in (columns.ids, columns.start, columns.due, columns.completed, columns.priority):
+            size = count * column.itemsize
+            column.frombytes(data[offset:offset + size])
+            offset += size
+        return columns
+
+
+class TodoStore:
+    """待办事项的本地存储
+
+    未归档的事项保存在一个JSON文件中；归档的已完成事项按完成月份保存为gzip压缩的分段，
+    每个分段另有一个按列保存日期的小文件，所有分段的摘要保存在归档索引中。
+    修改某个归档事项只需重写它所在的分段。
+
+    分段可能同时在界面线程和写入线程中修改，重写分段时持有 _segment_lock；
+    摘要表在修改时整体替换，读取的线程不需要加锁。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or data_dir()
+        self.data_path = os.path.join(self.path, DATA_FILE_NAME)
+        self.archive_path = os.path.join(self.path, ARCHIVE_DIR_NAME)
+        os.makedirs(self.archive_path, exist_ok=True)
+        self._summaries = self._load_index()
+        self._segment_lock = threading.RLock()
+        self._removals = []  # 等待快照保存后再进行的分段移除 [(快照版本, 分段, 事项id列表)]
+
+    # 未归档的事项
+    def load(self):
+        """返回 (事项列表, 下一个事项id)，还没有保存过时返回 None"""
+        try:
+            with open(self.data_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        if data.get('version') != DATA_VERSION:
+            raise ValueError(f"不支持的数据文件版本: {data.get('version')}")
+        return [item_from_dict(d) for d in data['items']], data['next_id']
+
+    def save(self, items, next_id):
+        """保存事项，items 可以是 TodoItem 或 todo_model.Snapshot 中的记录
+
+        逐项编码（每行一项），每编码 YIELD_EVERY 项让出一次GIL，在写入线程中保存时不会卡住界面线程。
+        """
+        lines = []
+        for index, item in enumerate(items, 1):
+            lines.append(json.dumps(item_to_dict(item), ensure_ascii=False))
+            if not index % YIELD_EVERY:
+                time.sleep(0)
+        text = f'{{"version": {DATA_VERSION}, "next_id": {next_id}, "items": [\n' + ',\n'.join(lines) + '\n]}\n'
+        atomic_write_bytes(self.data_path, text.encode('utf-8'))
+
+    def write_snapshot(self, path, content):
+        """保存 (快照, 下一个事项id)，然后进行该快照版本之前登记的分段移除
+
+        供 doc_writer.BackgroundWriter 在写入线程中调用，也可以直接调用。保存失败时登记的移除保留到下一次保存。
+        """
+        snapshot, next_id = content
+        self.save(snapshot, next_id)
+        self._apply_removals(snapshot.version)
+
+    # 归档分段
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.archive_path, ARCHIVE_INDEX_NAME), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        return {key: SegmentSummary(key, s['count'], _parse_date(s['first']), _parse_date(s['last']))
+                for key, s in data.items()}
+
+    def _save_index(self):
+        data = {key: {'count': s.count, 'first': _date_str(s.first), 'last': _date_str(s.last)}
+                for key, s in sorted(self._summaries.items())}
+        atomic_write_bytes(os.path.join(self.archive_path, ARCHIVE_INDEX_NAME),
+                           json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+    def _segment_path(self, key, suffix):
+        return os.path.join(self.archive_path, key + suffix)
+
+    def segments(self):
+        """所有归档分段的摘要，按时间从新到旧"""
+        summaries = self._summaries
+        return [summaries[key] for key in sorted(summaries, reverse=True)]
+
+    def load_segment(self, key):
+        try:
+            with gzip.open(self._segment_path(key, '.json.gz'), 'rt', encoding='utf-8') as f:
+                return [item_from_dict(d) for d in json.load(f)]
+        except FileNotFoundError:
+            return []
+
+    def load_segment_columns(self, key):
+        """读取分段的列文件；列文件缺失或长度与摘要不符时从分段重建（同时修正摘要）"""
+        summary = self._summaries[key]
+        try:
+            with open(self._segment_path(key, '.cols'), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b''
+        if len(data) == summary.count * SegmentColumns.ROW_SIZE:
+            return SegmentColumns.from_bytes(data, summary.count)
+        with self._segment_lock:
+            items = self.load_segment(key)
+            self._write_segment(key, items)
+        return SegmentColumns.from_items(items)
+
+    def _write_segment(self, key, items):
+        summaries = dict(self._summaries)
+        if not items:
+            for suffix in ('.json.gz', '.cols'):
+                try:
+                    os.remove(self._segment_path(key, suffix))
+                except FileNotFoundError:
+                    pass
+            summaries.pop(key, None)
+        else:
+            data = json.dumps([item_to_dict(item) for item in items], ensure_ascii=False).encode('utf-8')
+            atomic_write_bytes(self._segment_path(key, '.json.gz'), gzip.compress(data))
+            atomic_write_bytes(self._segment_path(key, '.cols'), SegmentColumns.from_items(items).to_bytes())
+            dates = [item.completed_date for item in items]
+            summaries[key] = SegmentSummary(key, len(items), min(dates), max(dates))
+        self._summaries = summaries
+        self._save_index()
+
+    def add_to_segment(self, key, items):
+        """把事项加入分段中（分段不存在时新建，已在分段中的同id事项被替换）"""
+        items = list(items)
+        item_ids = {item.id for item in items}
+        with self._segment_lock:
+            existing = self.load_segment(key) if key in self._summaries else []
+            self._write_segment(key, [item for item in existing if item.id not in item_ids] + items)
+
+    def remove_from_segment(self, key, item_ids):
+        """从分段中移除事项，只重写这一个分段"""
+        item_ids = set(item_ids)
+        with self._segment_lock:
+            self._write_segment(key, [item for item in self.load_segment(key) if item.id not in item_ids])
+
+    def remove_from_segment_after(self, version, key, item_ids):
+        """登记一次分段移除，在版本不低于 version 的快照保存之后进行（见 write_snapshot）
+
+        移回未归档列表的事项要等包含它们的快照写入数据文件后才从分段中移除，中途失败时事项不会丢失。
+        """
+        with self._segment_lock:
+            self._removals.append((version, key, list(item_ids)))
+
+    def _apply_removals(self, version):
+        with self._segment_lock:
+            due = [removal for removal in self._removals if removal[0] <= version]
+            if not due:
+                return
+            self._removals = [removal for removal in self._removals if removal[0] > version]
+            groups = {}
+            for _, key, item_ids in due:
+                groups.setdefault(key, []).extend(item_ids)
+            for key, item_ids in groups.items():
+                self.remove_from_segment(key, item_ids)
@@ -0,0 +1,187 @@
+"""待办事项模型的并发压力测试
+
+界面线程（这里是主线程）每隔 --interval 毫秒以事务方式修改一组事项（模拟事件循环，间隔中不占用GIL），
+同时若干读线程反复读取 TodoModel.snapshot() 并检查一致性：每组事项总是在同一个事务中一起修改，
+快照中同组事项的状态必须相同，事项总数不变，快照版本只增不减。默认还在后台线程中按快照保存到临时目录。
+记录每个事务的耗时，以及每次定时唤醒比预定时间晚了多少（读线程和写入线程占用GIL时，
+主线程在 sleep 结束后也要等待，界面事件会同样推迟）；两者之一超过 STALL_MS 视为界面卡顿。例如：
+
+    python todo_stress.py --items 20000 --readers 4 --seconds 10
+
+有不一致的读取或卡顿时退出码为1。
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+from datetime import date, timedelta
+
+from doc_writer import BackgroundWriter
+from todo_model import TodoItem, TodoModel, PRIORITIES
+from todo_store import TodoStore
+
+# 每组事项数，同组事项总是一起修改
+GROUP_SIZE = 4
+# 单个事务或一次唤醒的延迟超过多少毫秒视为界面卡顿
+STALL_MS = 50
+
+
+def _add_group(model, group, due_date):
+    for member in range(GROUP_SIZE):
+        model.add(TodoItem(f'{group}:{member}', date(2026, 1, 1), due_date))
+
+
+def check_snapshot(snapshot, expected_count):
+    """检查快照的一致性，返回发现的问题列表"""
+    problems = []
+    if len(snapshot) != expected_count:
+        problems.append(f'版本 {snapshot.version}：len() 为 {len(snapshot)}，应为 {expected_count}')
+    groups = {}
+    count = 0
+    for chunk in snapshot.iter_chunks():
+        for record in chunk:
+            count += 1
+            group = record.text.split(':', 1)[0]
+            groups.setdefault(group, set()).add((record.priority, record.completed_date is None, record.due_date))
+        time.sleep(0)  # 分块之间让出GIL
+    if count != expected_count:
+        problems.append(f'版本 {snapshot.version}：遍历到 {count} 项，应为 {expected_count}')
+    for group, states in groups.items():
+        if len(states) != 1:
+            problems.append(f'版本 {snapshot.version}：第 {group} 组的事项状态不一致 {sorted(map(str, states))}')
+    return problems
+
+
+def _reader(model, expected_count, stop, result):
+    last_version = -1
+    while not stop.is_set():
+        snapshot = model.snapshot()
+        if snapshot.version < last_version:
+            result['problems'].append(f'快照版本从 {last_version} 回退到 {snapshot.version}')
+        last_version = snapshot.version
+        result['problems'].extend(check_snapshot(snapshot, expected_count))
+        result['reads'] += 1
+
+
+def _transaction(model, groups, rng, next_group):
+    """随机修改一组事项（在一个 batch 中），返回新的下一个组号"""
+    group = rng.choice(list(groups))
+    items = groups[group]
+    op = rng.randrange(5)
+    with model.batch():
+        if op == 0:
+            model.update_many(items, priority=rng.choice(PRIORITIES))
+        elif op == 1:
+            model.complete_many(items)
+        elif op == 2:
+            model.uncomplete_many(items)
+        elif op == 3:
+            model.shift_due_dates(items, rng.randint(-3, 3))
+        else:
+            # 删除一组再添加一组，总数不变
+            model.delete_many(items)
+            del groups[group]
+            _add_group(model, next_group, date(2026, 2, 1))
+            groups[next_group] = model.todo_items[-GROUP_SIZE:]
+            next_group += 1
+    return next_group
+
+
+def run_stress(items=20000, readers=4, seconds=5.0, seed=0, folder=None, interval_ms=10.0):
+    """运行压力测试，返回结果字典（problems 为空且 stalls 为0表示通过）"""
+    rng = random.Random(seed)
+    writer = None
+    store = None
+    if folder is not None:
+        store = TodoStore(folder)
+        writer = BackgroundWriter(lambda *args: None, write=store.write_snapshot)
+    model = TodoModel(store, writer)
+    groups = {}
+    with model.batch():
+        for group in range(items // GROUP_SIZE):
+            _add_group(model, group, date(2026, 1, 1) + timedelta(days=group % 60))
+            groups[group] = model.todo_items[-GROUP_SIZE:]
+    expected_count = len(groups) * GROUP_SIZE
+
+    stop = threading.Event()
+    results = [{'problems': [], 'reads': 0} for _ in range(readers)]
+    threads = [threading.Thread(target=_reader, args=(model, expected_count, stop, result), daemon=True)
+               for result in results]
+    for thread in threads:
+        thread.start()
+
+    latencies = []
+    lateness = []
+    next_group = len(groups)
+    deadline = time.perf_counter() + seconds
+    try:
+        while time.perf_counter() < deadline:
+            planned = time.perf_counter() + interval_ms / 1000
+            time.sleep(interval_ms / 1000)
+            start = time.perf_counter()
+            lateness.append(max(0.0, (start - planned) * 1000))
+            next_group = _transaction(model, groups, rng, next_group)
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        if writer is not None:
+            writer.flush()
+
+    stalls = sum(1 for late, latency in zip(lateness, latencies) if late > STALL_MS or latency > STALL_MS)
+    latencies.sort()
+    lateness.sort()
+    problems = [problem for result in results for problem in result['problems']]
+    return {
+        'items': expected_count,
+        'readers': readers,
+        'transactions': len(latencies),
+        'reads': sum(result['reads'] for result in results),
+        'versions': model.snapshot().version,
+        'max_ms': latencies[-1] if latencies else 0.0,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] if latencies else 0.0,
+        'late_max_ms': lateness[-1] if lateness else 0.0,
+        'late_p99_ms': lateness[int(len(lateness) * 0.99)] if lateness else 0.0,
+        'stalls': stalls,
+        'problems': problems,
+    }
+
+
+def format_result(result):
+    lines = [f"{result['items']} 项，{result['readers']} 个读线程：{result['transactions']} 个事务，"
+             f"{result['reads']} 次快照读取，发布 {result['versions']} 个版本",
+             f"事务耗时 P99 {result['p99_ms']:.2f} 毫秒，最大 {result['max_ms']:.2f} 毫秒",
+             f"定时唤醒推迟 P99 {result['late_p99_ms']:.2f} 毫秒，最大 {result['late_max_ms']:.2f} 毫秒",
+             f"事务耗时或唤醒推迟超过 {STALL_MS} 毫秒 {result['stalls']} 次",
+             f"不一致的读取：{len(result['problems'])} 次"]
+    lines.extend('  ' + problem for problem in result['problems'][:10])
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='待办事项模型的并发压力测试')
+    parser.add_argument('--items', type=int, default=20000, help='事项数')
+    parser.add_argument('--readers', type=int, default=4, help='读线程数')
+    parser.add_argument('--seconds', type=float, default=5.0, help='测试时长（秒）')
+    parser.add_argument('--seed', type=int, default=0, help='随机数种子')
+    parser.add_argument('--interval', type=float, default=10.0, help='事务之间的间隔（毫秒）')
+    parser.add_argument('--no-save', action='store_true', help='不在后台线程中保存到磁盘')
+    args = parser.parse_args(argv)
+
+    folder = None if args.no_save else tempfile.mkdtemp(prefix='todolist-stress-')
+    try:
+        result = run_stress(args.items, args.readers, args.seconds, args.seed, folder, args.interval)
+    finally:
+        if folder is not None:
+            shutil.rmtree(folder, ignore_errors=True)
+    print(format_result(result))
+    return 1 if result['problems'] or result['stalls'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())